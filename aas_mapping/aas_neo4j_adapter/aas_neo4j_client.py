@@ -1,11 +1,20 @@
 import logging
+import math
 import re
-from typing import Dict, List, Optional, Set, Tuple, Any
+from contextlib import nullcontext
+from datetime import datetime, timezone
+from typing import ContextManager, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple, Any
 import json
 
 from aas_mapping.aas_neo4j_adapter.base import Neo4jModelConfig
 from aas_mapping.aas_neo4j_adapter.jsonification.neo4j_export import JsonFromNeo4jExporter
 from aas_mapping.aas_neo4j_adapter.jsonification.neo4j_import import JsonToNeo4jImporter
+from aas_mapping.aas_neo4j_adapter.querification.aasql_executor import AASQLExecutor
+from aas_mapping.aas_neo4j_adapter.querification.ast_to_cypher import FULLTEXT_INDEX_NAME, \
+    FULLTEXT_INDEX_PROPERTIES, SEMANTIC_ID_PROPERTY, RESOLVES_TO
+from aas_mapping.aas_neo4j_adapter.querification.query_cache import CACHE_VERSION_LABEL
+from aas_mapping.aas_neo4j_adapter.tracing import trace_query, traced
+from aas_mapping.aas_neo4j_adapter.utils import UploadStats
 
 # Configure logging
 logging.basicConfig(level=logging.WARNING)
@@ -37,15 +46,48 @@ AAS_CLS_PARENTS: dict[str, tuple[str]] = {
     'DataSpecificationIec61360': ('DataSpecificationContent',),
 }
 
+# XSD value types, whose values are additionally saved as typed shadow properties, e.g. `value_num`
+XSD_NUMERIC_TYPES = {
+    "xs:decimal", "xs:double", "xs:float", "xs:integer", "xs:int", "xs:long", "xs:short", "xs:byte",
+    "xs:nonNegativeInteger", "xs:positiveInteger", "xs:nonPositiveInteger", "xs:negativeInteger",
+    "xs:unsignedLong", "xs:unsignedInt", "xs:unsignedShort", "xs:unsignedByte",
+}
+XSD_DATETIME_TYPES = {"xs:dateTime", "xs:date"}
+XSD_BOOLEAN_TYPES = {"xs:boolean"}
+# xs:date with an optional timezone, e.g. 2024-01-01+01:00, which `datetime.fromisoformat` would read as a time
+XSD_DATE_PATTERN = re.compile(r'(-?\d{4,}-\d{2}-\d{2})(Z|[+-]\d{2}:\d{2})?')
+# Attributes of Property and Range elements holding a value of their valueType
+TYPED_VALUE_ATTRIBUTES = ("value", "min", "max")
+# Returns the labels of the Identifiable with the `id` parameter
+IDENTIFIABLE_LABELS_CLAUSE = "MATCH (n:Identifiable {id: $id}) RETURN labels(n) AS labels"
+# Property of ModelReference nodes with the id of the Identifiable they point to (their first key value)
+TARGET_ID_PROPERTY = "targetId"
+
 
 AAS_NEO4J_MODEL_CONFIG = Neo4jModelConfig(
     keys_to_ignore=(),
-    virtual_relationships=("child", "references"),
+    virtual_relationships=("child", "references", RESOLVES_TO),
 
     default_optimization_clauses=[
         "CREATE INDEX FOR (r:Identifiable) ON (r.id);",
         "CREATE INDEX FOR (r:Referable) ON (r.idShort);",
-        "CREATE INDEX rel_list_index FOR () - [r:value]-() ON (r.list_index);"
+        "CREATE INDEX rel_list_index FOR () - [r:value]-() ON (r.list_index);",
+        # Lookups by idShortPath need the materialized paths, see `refresh_id_short_paths` for existing databases
+        "CREATE INDEX FOR (r:Referable) ON (r.identifiableId, r.idShortPath);",
+        "CREATE INDEX FOR (r:SubmodelElement) ON (r.value_num);",
+        "CREATE INDEX FOR (r:SubmodelElement) ON (r.value_datetime);",
+        "CREATE INDEX FOR (r:SubmodelElement) ON (r.value_bool);",
+        "CREATE INDEX FOR (r:SubmodelElement) ON (r.min_num);",
+        "CREATE INDEX FOR (r:SubmodelElement) ON (r.max_num);",
+        f"CREATE INDEX FOR (r:SubmodelElement) ON (r.{SEMANTIC_ID_PROPERTY});",
+        f"CREATE INDEX FOR (r:Submodel) ON (r.{SEMANTIC_ID_PROPERTY});",
+        f"CREATE INDEX FOR (r:Reference) ON (r.{TARGET_ID_PROPERTY});",
+        # Text indexes serve CONTAINS, STARTS WITH and ENDS WITH, the full-text index searches in LangString texts
+        "CREATE TEXT INDEX FOR (r:SubmodelElement) ON (r.value);",
+        "CREATE TEXT INDEX FOR (r:Referable) ON (r.idShort);",
+        f"CREATE FULLTEXT INDEX {FULLTEXT_INDEX_NAME} FOR (r:Referable) "
+        f"ON EACH [{', '.join(f'r.{prop}' for prop in FULLTEXT_INDEX_PROPERTIES)}];",
+        f"CREATE CONSTRAINT FOR (v:{CACHE_VERSION_LABEL}) REQUIRE (v.label, v.shard) IS UNIQUE;",
     ],
     # In AAS, multiple references may point to the same target. By deduplicating
     # these references, we ensure that only one canonical instance is created
@@ -82,12 +124,32 @@ AAS_NEO4J_MODEL_CONFIG = Neo4jModelConfig(
         "SubmodelElementList": ["value"],
         "AssetInformation": ["specificAssetIds"],
         "HasSemantics": ["supplementalSemanticIds"],
-    }
+    },
+    # Materialized path of every Referable: id of the Identifiable it belongs to and its canonical idShortPath
+    # Typed copies of the string values of Property and Range elements, which can be compared using range indexes
+    # First key value of the semanticId, so semantic lookups do not have to expand the shared Reference nodes
+    # Id of the Identifiable a ModelReference points to, which is used to resolve it
+    shadow_properties=(
+        "identifiableId", "idShortPath", SEMANTIC_ID_PROPERTY, TARGET_ID_PROPERTY,
+        *(f"{attr}_{suffix}" for attr in TYPED_VALUE_ATTRIBUTES for suffix in ("num", "datetime", "bool")),
+    ),
+    # Texts of MultiLanguageProperties and descriptions per language, e.g. value_text__en
+    lang_string_props_per_language={
+        "MultiLanguageProperty": ["value"],
+        "Referable": ["description"],
+    },
+    indexed_languages=("en", "de"),
 )
 
 
-class AASNeo4JClient(JsonToNeo4jImporter, JsonFromNeo4jExporter):
-    node_names: Set[str] = set()
+class AASNeo4JClient(JsonToNeo4jImporter, JsonFromNeo4jExporter, AASQLExecutor):
+    # Add `resolvesTo` edges from ModelReferences to their targets after every upload
+    resolve_model_references_on_upload: bool = True
+    # Relationships which are not followed when the subgraph of a Referable is fetched or removed,
+    # because they lead to other Referables
+    subgraph_excluded_relationships: Tuple[str, ...] = (RESOLVES_TO,)
+    # Bump the write versions of the written Identifiable labels, which invalidate cached query results
+    track_cache_versions: bool = True
 
     def _process_json_data(self, json_data: Dict[str, Any]) -> Tuple[List[Dict], Dict[str, List]]:
         """
@@ -101,13 +163,18 @@ class AASNeo4JClient(JsonToNeo4jImporter, JsonFromNeo4jExporter):
         for key, label in IDENTIFIABLE_KEYS.items():
             try:
                 for obj in json_data[key]:
-                    child_nodes, child_rels = self._process_dict(obj)
+                    child_nodes, child_rels = self._process_identifiable(obj)
                     nodes.extend(child_nodes)
                     self._merge_relationships(relationships, child_rels)
             except KeyError:
                 logger.info(f"Key '{key}' not found in the JSON file")
         return nodes, relationships
 
+    def _split_json_data(self, json_data: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """Split an AAS Environment into environments with a single Identifiable each."""
+        for key in IDENTIFIABLE_KEYS:
+            for obj in json_data.get(key, ()):
+                yield {key: [obj]}
 
     @staticmethod
     def identify_labels(obj: Dict) -> Tuple[str]:
@@ -136,12 +203,252 @@ class AASNeo4JClient(JsonToNeo4jImporter, JsonFromNeo4jExporter):
         else:
             return JsonToNeo4jImporter.identify_labels(obj)
 
+    def _add_shadow_properties(self, obj: Dict, node_labels: Tuple[str], node_properties: Dict[str, Any]):
+        """Add typed copies of the values of Property and Range elements and the first key value of semanticIds."""
+        if "valueType" in obj and ("Property" in node_labels or "Range" in node_labels):
+            node_properties.update(self.typed_shadow_properties(obj))
+        semantic_id = obj.get("semanticId")
+        if isinstance(semantic_id, dict) and semantic_id.get("keys"):
+            node_properties[SEMANTIC_ID_PROPERTY] = semantic_id["keys"][0].get("value")
+        if "Reference" in node_labels and obj.get("type") == "ModelReference" and obj.get("keys"):
+            node_properties[TARGET_ID_PROPERTY] = obj["keys"][0].get("value")
+
+    def refresh_semantic_id_values(self, batch_size: int = 10000):
+        """
+        Set the denormalized semanticId key of all nodes from their semanticId References.
+
+        New nodes get it on upload, this is needed for databases which were filled before
+        or were changed without the client.
+        """
+        self.execute_clause(
+            "MATCH (n) "
+            f"WHERE n.{SEMANTIC_ID_PROPERTY} IS NOT NULL AND NOT (n)-[:semanticId]->(:Reference) "
+            "CALL { WITH n "
+            f"REMOVE n.{SEMANTIC_ID_PROPERTY} "
+            "}" + self._in_transactions(batch_size)
+        )
+        self.execute_clause(
+            "MATCH (n)-[:semanticId]->(r:Reference) "
+            "CALL { WITH n, r "
+            f"SET n.{SEMANTIC_ID_PROPERTY} = r.keys_value[0] "
+            "}" + self._in_transactions(batch_size)
+        )
+
+    def refresh_id_short_paths(self, batch_size: int = 100):
+        """
+        Set the materialized `identifiableId` and `idShortPath` of all Referables from the graph.
+
+        New nodes get them on upload, this is needed for databases which were filled before, as all lookups of
+        Referables by idShortPath use them (see `_find_node_clause`). The paths are built like in
+        `_set_id_short_paths`: each Referable extends the path of its closest ancestor by its idShort, or by its
+        list index below a SubmodelElementList.
+
+        Args:
+            batch_size: number of Identifiables, whose Referables are updated in one transaction
+        """
+        self.execute_clause(
+            "MATCH (i:Identifiable) "
+            "CALL { WITH i "
+            "SET i.identifiableId = i.id, i.idShortPath = '' "
+            "WITH i "
+            "MATCH p = (i)-[rels*]->(r:Referable) "
+            "WHERE NONE(rel IN rels WHERE type(rel) IN $virtual_relationships) "
+            "AND NONE(n IN nodes(p)[1..] WHERE n:Identifiable) "
+            "SET r.identifiableId = i.id, r.idShortPath = reduce(path = '', rel IN rels | CASE "
+            "WHEN NOT 'Referable' IN labels(endNode(rel)) THEN path "
+            "WHEN 'SubmodelElementList' IN labels(startNode(rel)) AND type(rel) = 'value' "
+            "THEN path + '[' + toString(rel.list_index) + ']' "
+            "WHEN path = '' THEN endNode(rel).idShort "
+            "ELSE path + '.' + endNode(rel).idShort END) "
+            "}" + self._in_transactions(batch_size),
+            parameters={"virtual_relationships": list(self.model_config.virtual_relationships)},
+        )
+
+    def refresh_typed_values(self, batch_size: int = 10000):
+        """
+        Set the typed shadow properties (e.g. `value_num`) of all Property and Range elements from their values.
+
+        New nodes get them on upload, this is needed for databases which were filled before or were changed without
+        the client, as comparisons of values without an explicit cast use them. The values are converted like on
+        upload, by `typed_shadow_properties`.
+
+        Args:
+            batch_size: number of elements, which are updated in one transaction
+        """
+        typed_properties = [f"n.{attr}_{suffix}" for attr in TYPED_VALUE_ATTRIBUTES
+                            for suffix in ("num", "datetime", "bool")]
+        update_clause = (
+            "UNWIND $nodes AS node "
+            "MATCH (n) WHERE elementId(n) = node.id "
+            f"REMOVE {', '.join(typed_properties)} "
+            "SET n += node.properties"
+        )
+        records = self.stream_clause(
+            "MATCH (n:SubmodelElement) WHERE (n:Property OR n:Range) AND n.valueType IS NOT NULL "
+            "RETURN elementId(n) AS id, n.valueType AS valueType, "
+            f"{', '.join(f'n.{attr} AS {attr}' for attr in TYPED_VALUE_ATTRIBUTES)}"
+        )
+        nodes = []
+        for record in records:
+            nodes.append({"id": record["id"], "properties": self.typed_shadow_properties(record)})
+            if len(nodes) >= batch_size:
+                self.execute_clause(update_clause, parameters={"nodes": nodes})
+                nodes = []
+        if nodes:
+            self.execute_clause(update_clause, parameters={"nodes": nodes})
+
+    @classmethod
+    def typed_shadow_properties(cls, obj: Mapping[str, Any]) -> Dict[str, Any]:
+        """Return the typed shadow properties of all values of a Property or Range element with a `valueType`."""
+        properties = {}
+        for attr in TYPED_VALUE_ATTRIBUTES:
+            if obj.get(attr) is not None:
+                properties.update(cls.typed_value_properties(attr, obj["valueType"], obj[attr]))
+        return properties
+
+    @staticmethod
+    def typed_value_properties(attr: str, value_type: str, value: str) -> Dict[str, Any]:
+        """
+        Convert a value saved as string to a typed shadow property according to its XSD value type.
+
+        Example: ("value", "xs:int", "80") -> {"value_num": 80}
+
+        Dates are converted to datetimes at midnight of their timezone, datetimes and dates without timezone are
+        treated as UTC, so all of them can be compared with each other. Values which cannot be converted are skipped,
+        as are NaN and infinite numbers, which cannot be compared by range.
+        """
+        try:
+            if value_type in XSD_NUMERIC_TYPES:
+                try:
+                    number = int(value)
+                except ValueError:
+                    number = float(value)
+                if not math.isfinite(number):
+                    return {}
+                return {f"{attr}_num": number}
+            elif value_type == "xs:date":
+                match = XSD_DATE_PATTERN.fullmatch(value)
+                if match is None:
+                    raise ValueError(f"Invalid xs:date {value}")
+                date, offset = match.groups()
+                date_time = datetime.fromisoformat(f"{date}T00:00{'+00:00' if offset in (None, 'Z') else offset}")
+                return {f"{attr}_datetime": date_time}
+            elif value_type in XSD_DATETIME_TYPES:
+                date_time = datetime.fromisoformat(value)
+                if date_time.tzinfo is None:
+                    date_time = date_time.replace(tzinfo=timezone.utc)
+                return {f"{attr}_datetime": date_time}
+            elif value_type in XSD_BOOLEAN_TYPES and value.lower() in ("true", "false", "1", "0"):
+                return {f"{attr}_bool": value.lower() in ("true", "1")}
+        except (ValueError, TypeError, AttributeError):
+            logger.debug(f"Could not convert {attr} '{value}' of type {value_type}")
+        return {}
+
+    def _upload_nodes_and_relationships(self, nodes: List[Dict], relationships: Dict[str, List],
+                                        *args, **kwargs) -> UploadStats:
+        """
+        Upload nodes and relationships, resolve the ModelReferences from and to the uploaded Identifiables
+        and bump the cache versions of the written Identifiables.
+
+        In a transaction, e.g. of `_versioned_write`, the versions are bumped in it. Bulk uploads outside of a
+        transaction commit their relationships in batches and bump the versions after the last batch, so until
+        then readers may be served cached results from before the upload.
+        """
+        stats = super()._upload_nodes_and_relationships(nodes, relationships, *args, **kwargs)
+        for clause, parameters in self._upload_follow_up_clauses(nodes):
+            self.execute_clause(clause, parameters=parameters)
+        return stats
+
+    def _upload_follow_up_clauses(self, nodes: List[Dict]) -> List[Tuple[str, Dict]]:
+        """Return the clauses resolving the ModelReferences and bumping the cache versions after an upload."""
+        clauses = []
+        if self.resolve_model_references_on_upload:
+            identifiable_ids = {node[key] for node in nodes for key in ("identifiableId", TARGET_ID_PROPERTY)
+                                if node.get(key) is not None}
+            if identifiable_ids:
+                clauses.extend(self._resolve_model_references_clauses(identifiable_ids))
+        if self.track_cache_versions:
+            bump = self._bump_cache_versions_clause(
+                identifiable_ids={node["identifiableId"] for node in nodes if node.get("identifiableId") is not None})
+            if bump is not None:
+                clauses.append(bump)
+        return clauses
+
+    def _versioned_write(self) -> ContextManager:
+        """
+        Return the context of a write of the client, which runs the write and the bump of the cache versions in one
+        transaction, if the versions are tracked. A write in a transaction joins it.
+        """
+        return self.transaction() if self.track_cache_versions else nullcontext()
+
+    @traced()
+    def resolve_model_references(self, identifiable_ids: Optional[Iterable[str]] = None, refresh: bool = False,
+                                 batch_size: int = 10000):
+        """
+        Add `resolvesTo` edges from ModelReferences to the Referables they point to.
+
+        The keys of a ModelReference are followed down the idShort chain: the first key is the id of an Identifiable,
+        the next keys are idShorts or, below a SubmodelElementList, list indexes. The target is found by its
+        materialized `identifiableId` and `idShortPath`. References whose target does not exist yet stay
+        unresolved and are resolved when the target is uploaded.
+
+        Args:
+            identifiable_ids: only resolve the references pointing into these Identifiables, all if None
+            refresh: remove the existing `resolvesTo` edges of these references first, e.g. after paths changed
+            batch_size: number of references resolved per transaction
+        """
+        result = None
+        for clause, parameters in self._resolve_model_references_clauses(identifiable_ids, refresh, batch_size):
+            result = self.execute_clause(clause, parameters=parameters)
+        return result
+
+    def _resolve_model_references_clauses(self, identifiable_ids: Optional[Iterable[str]] = None,
+                                          refresh: bool = False, batch_size: int = 10000) -> List[Tuple[str, Dict]]:
+        """Return the clauses of `resolve_model_references` with their parameters."""
+        clauses = []
+        parameters = {}
+        condition = f"ref.{TARGET_ID_PROPERTY} IS NOT NULL"
+        if identifiable_ids is not None:
+            parameters["identifiable_ids"] = list(identifiable_ids)
+            condition = f"ref.{TARGET_ID_PROPERTY} IN $identifiable_ids"
+        if refresh:
+            clauses.append((f"MATCH (ref:Reference)-[r:{RESOLVES_TO}]->() WHERE {condition} DELETE r", parameters))
+        clause = (
+            f"MATCH (ref:Reference) WHERE {condition} AND NOT (ref)-[:{RESOLVES_TO}]->() "
+            "CALL { WITH ref "
+            "  WITH ref, reduce(path = '', i IN range(1, size(ref.keys_value) - 1) | path + CASE "
+            "    WHEN ref.keys_type[i - 1] = 'SubmodelElementList' THEN '[' + ref.keys_value[i] + ']' "
+            "    WHEN path = '' THEN ref.keys_value[i] "
+            "    ELSE '.' + ref.keys_value[i] END) AS id_short_path "
+            f"  MATCH (target:Referable {{identifiableId: ref.{TARGET_ID_PROPERTY}, idShortPath: id_short_path}}) "
+            f"  MERGE (ref)-[:{RESOLVES_TO}]->(target) "
+            "}" + self._in_transactions(batch_size)
+        )
+        clauses.append((clause, parameters))
+        return clauses
+
+    def _subgraph_clause(self, node: str, yielded: str) -> str:
+        """
+        Return a clause collecting the subgraph of the node, which follows all outgoing relationships
+        except of `subgraph_excluded_relationships`.
+        """
+        return (
+            "CALL db.relationshipTypes() YIELD relationshipType "
+            f"WITH {node}, [rel_type IN collect(relationshipType) "
+            "     WHERE NOT rel_type IN $excluded_relationships | rel_type + '>'] AS relationship_filters "
+            f"CALL apoc.path.subgraphAll({node}, {{relationshipFilter: apoc.text.join(relationship_filters, '|')}}) "
+            f"YIELD {yielded} "
+        )
+
+    @traced()
     def add_identifiable(self, obj: Dict):
-        if self.identifiable_exists(obj['id']):
-            raise KeyError(f"Identifiable with id {obj['id']} already exists in the database.")
-        nodes, relationships = self._process_dict(obj)
-        return self._upload_nodes_and_relationships(nodes, relationships)
+        with self._versioned_write():
+            if self.identifiable_exists(obj['id']):
+                raise KeyError(f"Identifiable with id {obj['id']} already exists in the database.")
+            nodes, relationships = self._process_identifiable(obj)
+            return self._upload_nodes_and_relationships(nodes, relationships)
 
+    @traced()
     def add_referable(self, obj: Dict, parent_id: Optional[str] = None, id_short_path: Optional[str] = None):
         node_labels = self.identify_labels(obj)
         if "Identifiable" in node_labels:
@@ -153,16 +460,100 @@ class AASNeo4JClient(JsonToNeo4jImporter, JsonFromNeo4jExporter):
                 raise ValueError("Parent ID and ID short path should be provided for Referable objects")
             return self.add_submodel_element(obj, parent_id, id_short_path)
 
+    @traced()
     def add_submodel_element(self, obj: Dict, parent_id: str, id_short_path: str):
-        parent_node_internal_id = self._find_node(parent_id, id_short_path)
+        with self._versioned_write():
+            parent_node = self._find_node(parent_id, id_short_path)
+            nodes, relationships = self._process_submodel_element(obj, parent_id, id_short_path, *parent_node)
+            return self._upload_nodes_and_relationships(nodes, relationships,
+                                                        exist_uid_to_internal_id={parent_node[0]: parent_node[0]})
+
+    def _process_submodel_element(self, obj: Dict, parent_id: str, id_short_path: str, parent_node_internal_id: str,
+                                  parent_labels: List[str], parent_list_size: int) \
+            -> Tuple[List[Dict], Dict[str, List]]:
+        """Process a SubmodelElement into nodes and relationships, which connect it to the found parent node."""
         nodes, relationships = self._process_dict(obj)
 
+        parent_path = self.canonical_id_short_path(id_short_path) if id_short_path else ""
+        if "SubmodelElementList" in parent_labels:
+            # New list items are appended to the end of the list
+            root_path = f"{parent_path}[{parent_list_size}]"
+            value_rel_props = {"list_index": parent_list_size}
+        else:
+            root_path = f"{parent_path}.{obj['idShort']}" if parent_path else obj['idShort']
+            value_rel_props = None
+        self._set_id_short_paths(nodes, relationships, parent_id, root_path)
+
         self._add_relationship(relationships, "child", parent_node_internal_id, nodes[-1]['uid'])
-        self._add_relationship(relationships, "value", parent_node_internal_id, nodes[-1]['uid'])
-        stats = self._upload_nodes_and_relationships(nodes, relationships,
-                                                     exist_uid_to_internal_id={
-                                                         parent_node_internal_id: parent_node_internal_id})
-        return stats
+        self._add_relationship(relationships, "value", parent_node_internal_id, nodes[-1]['uid'],
+                               rel_props=value_rel_props)
+        return nodes, relationships
+
+    @traced()
+    def add_submodel_elements(self, elements: Mapping[Tuple[str, Optional[str]], List[Dict]]) -> UploadStats:
+        """
+        Add SubmodelElements below several parents with one lookup of all parents and one upload.
+
+        Items added to a SubmodelElementList are appended in the given order.
+
+        Args:
+            elements: the SubmodelElements to add by the id and the idShortPath of their parent, the idShortPath
+                is None for elements of a Submodel
+        """
+        if not elements:
+            return UploadStats()
+        with self._versioned_write():
+            parents = self._find_nodes(elements)
+            nodes, relationships, exist_uid_to_internal_id = [], {}, {}
+            for (parent_id, id_short_path), objs in elements.items():
+                parent_node_internal_id, parent_labels, parent_list_size = parents[(parent_id, id_short_path)]
+                exist_uid_to_internal_id[parent_node_internal_id] = parent_node_internal_id
+                for i, obj in enumerate(objs):
+                    child_nodes, child_rels = self._process_submodel_element(
+                        obj, parent_id, id_short_path, parent_node_internal_id, parent_labels, parent_list_size + i)
+                    nodes.extend(child_nodes)
+                    self._merge_relationships(relationships, child_rels)
+            return self._upload_nodes_and_relationships(nodes, relationships,
+                                                        exist_uid_to_internal_id=exist_uid_to_internal_id)
+
+    @traced()
+    def update_property_values(self, values: Mapping[Tuple[str, str], Optional[str]]) -> int:
+        """
+        Set the values of several Property elements with one write and return the number of updated Properties.
+
+        The typed shadow properties of the values are updated according to the valueTypes of the Properties.
+
+        Args:
+            values: the new values by the id of the Identifiable and the idShortPath of the Property
+        """
+        if not values:
+            return 0
+        updates = []
+        for (parent_id, id_short_path), value in values.items():
+            update = {"parent_id": parent_id, "id_short_path": self.canonical_id_short_path(id_short_path),
+                      "value": value}
+            if value is not None:
+                # The valueType is only known to the database, so the value is converted to all kinds of types
+                date_type = "xs:date" if XSD_DATE_PATTERN.fullmatch(value) else "xs:dateTime"
+                for value_type in ("xs:double", date_type, "xs:boolean"):
+                    update.update(self.typed_value_properties("value", value_type, value))
+            updates.append(update)
+        clause = (
+            "UNWIND $updates AS update "
+            "MATCH (n:Property {identifiableId: update.parent_id, idShortPath: update.id_short_path}) "
+            "SET n.value = update.value, "
+            "    n.value_num = CASE WHEN n.valueType IN $numeric_types THEN update.value_num END, "
+            "    n.value_datetime = CASE WHEN n.valueType IN $datetime_types THEN update.value_datetime END, "
+            "    n.value_bool = CASE WHEN n.valueType IN $boolean_types THEN update.value_bool END "
+            "RETURN count(n) AS updated"
+        )
+        with self._versioned_write():
+            result = self.execute_clause(clause, single=True, parameters={
+                "updates": updates, "numeric_types": sorted(XSD_NUMERIC_TYPES),
+                "datetime_types": sorted(XSD_DATETIME_TYPES), "boolean_types": sorted(XSD_BOOLEAN_TYPES)})
+            if self.track_cache_versions:
+                self.bump_cache_versions(identifiable_ids={parent_id for parent_id, _ in values})
+        return result["updated"] if result else 0
 
     def identifiable_exists(self, identifier: str) -> bool:
         """Check if an Identifiable node with the given ID exists in the Neo4j database."""
@@ -170,27 +561,128 @@ class AASNeo4JClient(JsonToNeo4jImporter, JsonFromNeo4jExporter):
         result = self.execute_clause(clause, single=True)
         return result[0]
 
+    @traced()
     def remove_referable(self, parent_id: str, id_short_path: str = None):
-        clauses, referable_node = self._find_node_clause(parent_id, id_short_path)
+        # The removal, the shift of the following list items and the bump of the cache versions happen together
+        with self.transaction():
+            # The labels of the Identifiable have to be read before it is removed
+            labels = self._identifiable_labels(parent_id) if self.track_cache_versions else []
+            clause, parameters = self._remove_referable_clause(parent_id, id_short_path)
+            result = self.execute_clause(clause, parameters=parameters)
+            if id_short_path and result and result[0]["deletedNodes"]:
+                self._shift_list_items_after_removal(parent_id, id_short_path)
+            if labels:
+                self.bump_cache_versions(labels=labels)
+            return result
+
+    def _remove_referable_clause(self, parent_id: str, id_short_path: Optional[str] = None) -> Tuple[str, Dict]:
+        """Return the clause deleting the subgraph of the Referable, which returns the `deletedNodes`."""
+        clauses, referable_node, parameters = self._find_node_clause(parent_id, id_short_path)
+        parameters["excluded_relationships"] = list(self.subgraph_excluded_relationships)
         delete_clause = (
-            f"CALL apoc.path.subgraphAll({referable_node}, {{relationshipFilter: '>'}}) YIELD nodes "
+            self._subgraph_clause(referable_node, "nodes") +
             "WHERE NOT EXISTS { MATCH (node)-[:references]-() } "
             "UNWIND nodes AS node "
             "DETACH DELETE node "
             "RETURN count(node) AS deletedNodes; "
         )
-        return self.execute_clause(clauses + delete_clause)
+        return clauses + delete_clause, parameters
+
+    def _identifiable_labels(self, identifier: str) -> List[str]:
+        result = self.execute_clause(IDENTIFIABLE_LABELS_CLAUSE, single=True, parameters={"id": identifier})
+        return result["labels"] if result else []
+
+    def _shift_list_items_after_removal(self, parent_id: str, id_short_path: str):
+        """
+        Keep the list indexes and idShortPaths of SubmodelElementList items consistent after removing an item.
+
+        All items behind the removed one move one position to the front, so their `list_index` and the
+        idShortPaths of them and all their descendants are decremented. Renames are applied in ascending order,
+        so a renamed path never collides with a path which is still to be renamed. Has to run in the transaction
+        of the removal, so the list never has a gap.
+        """
+        shift = self._shift_list_items_clause(parent_id, id_short_path)
+        if shift is None:
+            return None
+        result = self.execute_clause(shift[0], single=True, parameters=shift[1])
+        if self.resolve_model_references_on_upload and result and result["renamedNodes"]:
+            # References to the moved items point to other items now
+            self.resolve_model_references([parent_id], refresh=True)
+        return result
+
+    def _shift_list_items_clause(self, parent_id: str, id_short_path: str) -> Optional[Tuple[str, Dict]]:
+        """
+        Return the clause of `_shift_list_items_after_removal` returning the `renamedNodes`, None if the removed
+        Referable was no list item.
+        """
+        id_shorts = self.itemize_id_short_path(id_short_path)
+        if not id_shorts or not isinstance(id_shorts[-1], int):
+            return None
+        canonical_path = self.canonical_id_short_path(id_short_path)
+        list_path = canonical_path[:canonical_path.rindex("[")]
+        clause = (
+            "MATCH (list:SubmodelElementList {identifiableId: $parent_id, idShortPath: $list_path})-[r:value]->() "
+            "WHERE r.list_index > $removed_index "
+            "WITH r ORDER BY r.list_index "
+            "WITH r, $list_path + '[' + toString(r.list_index) + ']' AS old_path, "
+            "     $list_path + '[' + toString(r.list_index - 1) + ']' AS new_path "
+            "SET r.list_index = r.list_index - 1 "
+            "WITH collect({old_path: old_path, new_path: new_path}) AS renames "
+            "UNWIND renames AS rename "
+            "MATCH (n:Referable {identifiableId: $parent_id}) "
+            "WHERE n.idShortPath = rename.old_path "
+            "   OR n.idShortPath STARTS WITH rename.old_path + '.' "
+            "   OR n.idShortPath STARTS WITH rename.old_path + '[' "
+            "SET n.idShortPath = rename.new_path + substring(n.idShortPath, size(rename.old_path)) "
+            "RETURN count(n) AS renamedNodes"
+        )
+        return clause, {"parent_id": parent_id, "list_path": list_path, "removed_index": id_shorts[-1]}
 
+    @traced()
     def remove_identifiable(self, identifier: str):
         return self.remove_referable(identifier)
 
+    @traced()
     def get_referable(self, parent_id: str, id_short_path: str = None) -> Dict:
         subgraph_json = self._get_subgraph_of_referable(parent_id, id_short_path)
         return self.convert_subgraph_to_data_dict(subgraph_json)
 
+    @traced()
     def get_identifiable(self, identifier: str) -> Dict:
         return self.get_referable(identifier)
 
+    def iter_identifiables(self, label: str = "Identifiable", fetch_size: Optional[int] = None) -> Iterator[Dict]:
+        """
+        Yield all Identifiables with the label one at a time.
+
+        The ids are streamed in batches of `fetch_size`, so memory use does not grow with the number of
+        Identifiables. Identifiables which are removed while iterating are skipped.
+        """
+        for record in self.stream_clause(f"MATCH (n:{label}) RETURN n.id AS id", fetch_size=fetch_size):
+            try:
+                yield self.get_identifiable(record["id"])
+            except KeyError:
+                logger.debug(f"Identifiable {record['id']} was removed while iterating")
+
+    @traced()
+    def export_json_file(self, file_path: str, fetch_size: Optional[int] = None) -> int:
+        """
+        Write all Identifiables into an AAS Environment JSON file and return their number.
+
+        The Identifiables are fetched and written one at a time, so the export runs in constant memory.
+        """
+        count = 0
+        with open(file_path, "w", encoding="utf-8") as f:
+            f.write("{")
+            for i, (key, label) in enumerate(IDENTIFIABLE_KEYS.items()):
+                f.write(f'{", " if i else ""}{json.dumps(key)}: [')
+                for j, obj in enumerate(self.iter_identifiables(label, fetch_size)):
+                    f.write((", " if j else "") + json.dumps(obj))
+                    count += 1
+                f.write("]")
+            f.write("}")
+        return count
+
     def count_nodes_with_label(self, label: str) -> int:
         """Count the number of nodes with a specific label."""
         clause = f"MATCH (n:{label}) RETURN COUNT(n) AS count"
@@ -203,34 +695,91 @@ class AASNeo4JClient(JsonToNeo4jImporter, JsonFromNeo4jExporter):
     def count_identifiables(self) -> int:
         return self.count_nodes_with_label("Identifiable")
 
-    def _find_node(self, parent_id: str, id_short_path: Optional[str] = None) -> int:
+    def _find_node(self, parent_id: str, id_short_path: Optional[str] = None) -> Tuple[str, List[str], int]:
         """
         Find a node in the Neo4j database based on the parent ID and optional idShortPath.
+
+        Returns the internal id and the labels of the node, and the number of its list items
+        (outgoing `value` relationships), which is needed to append items to a SubmodelElementList.
+        """
+        clause, parameters = self._find_node_with_list_size_clause(parent_id, id_short_path)
+        with trace_query(self.tracer, "neo4j.find_node", clause, parameters) as trace, \
+                self._session() as session:
+            result = session.run(clause, parameters).single()
+            trace.record(result is not None)
+            return self._found_node(result, parent_id, id_short_path)
+
+    def _find_node_with_list_size_clause(self, parent_id: str, id_short_path: Optional[str] = None) \
+            -> Tuple[str, Dict]:
+        clause, found_node, parameters = self._find_node_clause(parent_id, id_short_path)
+        clause += (
+            f"OPTIONAL MATCH ({found_node})-[item:value]->() "
+            f"WITH {found_node}, count(item) AS list_size "
+            f"RETURN collect([elementId({found_node}), labels({found_node}), list_size]) AS found_nodes"
+        )
+        return clause, parameters
+
+    @staticmethod
+    def _found_node(result: Optional[Dict], parent_id: str, id_short_path: Optional[str]) \
+            -> Tuple[str, List[str], int]:
+        """Return the internal id, the labels and the list size of the node found by `_find_node`."""
+        if result is None or not result["found_nodes"]:
+            raise KeyError(f"No node found with parent_id={parent_id} and id_short_path={id_short_path}")
+        elif len(result["found_nodes"]) != 1:
+            raise ValueError(f"Multiple nodes found with parent_id={parent_id} and id_short_path={id_short_path}")
+        node_id, labels, list_size = result["found_nodes"][0]
+        return node_id, labels, list_size
+
+    def _find_nodes(self, keys: Iterable[Tuple[str, Optional[str]]]) \
+            -> Dict[Tuple[str, Optional[str]], Tuple[str, List[str], int]]:
+        """
+        Find several nodes like `_find_node` with one clause.
+
+        Args:
+            keys: the parent IDs and the optional idShortPaths of the nodes
+
+        Returns:
+            The internal id, the labels and the list size of the node by its key.
+        """
+        keys = list(keys)
+        clause = (
+            "UNWIND range(0, size($keys) - 1) AS i "
+            "WITH i, $keys[i] AS key "
+            "CALL { "
+            "  WITH key "
+            "  MATCH (the_node:Identifiable {id: key.parent_id}) WHERE key.id_short_path IS NULL "
+            "  RETURN the_node "
+            "  UNION "
+            "  WITH key "
+            "  MATCH (the_node:Referable {identifiableId: key.parent_id, idShortPath: key.id_short_path}) "
+            "  RETURN the_node "
+            "} "
+            "OPTIONAL MATCH (the_node)-[item:value]->() "
+            "WITH i, the_node, count(item) AS list_size "
+            "RETURN i, collect([elementId(the_node), labels(the_node), list_size]) AS found_nodes"
+        )
+        parameters = {"keys": [
+            {"parent_id": parent_id,
+             "id_short_path": self.canonical_id_short_path(id_short_path) if id_short_path else None}
+            for parent_id, id_short_path in keys]}
+        records = {record["i"]: record for record in self.execute_clause(clause, parameters=parameters)}
+        return {key: self._found_node(records.get(i), *key) for i, key in enumerate(keys)}
+
+    def _find_node_clause(self, parent_id: str, id_short_path: Optional[str] = None) -> Tuple[str, str, Dict]:
+        """
+        Return a MATCH clause which finds a Referable, the variable name of the found node and the clause parameters.
+
+        Referables below an Identifiable are found by their materialized `identifiableId` and `idShortPath`,
+        so the lookup is a single seek of the composite index regardless of the path depth.
         """
-        clause, found_node = self._find_node_clause(parent_id, id_short_path)
-        clause += f"RETURN ID({found_node}) AS node_id"
-        with self.driver.session() as session:
-            result = session.run(clause).single()
-            if result is None:
-                raise KeyError(f"No node found with parent_id={parent_id} and id_short_path={id_short_path}")
-            elif len(result["node_id"]) != 1:
-                raise ValueError(f"Multiple nodes found with parent_id={parent_id} and id_short_path={id_short_path}")
-            return result["node_id"][0]
-
-    def _find_node_clause(self, parent_id: str, id_short_path: Optional[str] = None) -> (str, str):
         found_node = "the_node"
 
         if not id_short_path:
-            return f"MATCH ({found_node}:Identifiable {{id: '{parent_id}'}})\n", found_node
+            return f"MATCH ({found_node}:Identifiable {{id: $parent_id}})\n", found_node, {"parent_id": parent_id}
 
-        clause = f"MATCH (parent:Identifiable {{id: '{parent_id}'}})"
-        id_shorts = self.itemize_id_short_path(id_short_path)
-        for i, idShort in enumerate(id_shorts):
-            if not i == len(id_shorts) - 1:
-                clause += f"-[:child]->(child_{i} {{idShort: '{idShort}'}})\n"
-            else:
-                clause += f"-[:child]->({found_node} {{idShort: '{idShort}'}})\n"
-        return clause, found_node
+        clause = f"MATCH ({found_node}:Referable {{identifiableId: $parent_id, idShortPath: $id_short_path}})\n"
+        parameters = {"parent_id": parent_id, "id_short_path": self.canonical_id_short_path(id_short_path)}
+        return clause, found_node, parameters
 
     def _get_subgraph_of_referable(self, parent_id: str, id_short_path: Optional[str] = None):
         """
@@ -238,33 +787,109 @@ class AASNeo4JClient(JsonToNeo4jImporter, JsonFromNeo4jExporter):
 
         It includes the object node itself and all its children being attributes of the object.
         """
-        find_node_clause, found_parent_node = self._find_node_clause(parent_id, id_short_path)
+        clause, parameters = self._subgraph_of_referable_clause(parent_id, id_short_path)
+        result = self.execute_clause(clause, single=True, parameters=parameters)
+        if result is None:
+            raise KeyError(f"No Referable found with: id={parent_id}, id_short_path={id_short_path}")
+        subgraph_json = json.loads(result["json"])
+        return subgraph_json
+
+    def _subgraph_of_referable_clause(self, parent_id: str, id_short_path: Optional[str] = None) \
+            -> Tuple[str, Dict]:
+        """Return the clause of `_get_subgraph_of_referable`, which returns the subgraph as `json`."""
+        find_node_clause, found_parent_node, parameters = self._find_node_clause(parent_id, id_short_path)
+        parameters["excluded_relationships"] = list(self.subgraph_excluded_relationships)
         get_subgraph_clause = (
-            f"CALL apoc.path.subgraphAll({found_parent_node}, {{relationshipFilter: '>'}}) YIELD nodes, relationships "
+            self._subgraph_clause(found_parent_node, "nodes, relationships") +
             # FIXME: refactor cypher here and use model_config.virtual_relationships
             "WHERE NOT EXISTS { MATCH (node)-[:references]-() } "
             "RETURN apoc.convert.toJson({nodes: nodes, relationships: relationships}) AS json;"
         )
-        result = self.execute_clause(find_node_clause + get_subgraph_clause, single=True)
-        if result is None:
-            raise KeyError(f"No Referable found with: id={parent_id}, id_short_path={id_short_path}")
-        subgraph_json = json.loads(result["json"])
-        return subgraph_json
+        return find_node_clause + get_subgraph_clause, parameters
 
     @staticmethod
     def itemize_id_short_path(id_short_path: str) -> List[str]:
         """
         Split the idShortPath into a list of idShorts. Dot separated or brackets with index.
 
+        The idShorts are kept as they are, including hyphens, which are allowed since AAS v3. Whitespace between
+        the parts is ignored.
+
         Example Input: "MySubmodelElementCollection.MySubSubmodelElementList2[0][0].MySubTestValue3"
         Example Result: ["MySubmodelElementCollection", "MySubSubmodelElementList2", 0, 0, "MySubTestValue3"]
         :param idShortPath: The path to the idShort attribute.
         """
-        pattern = r'([a-zA-Z_]\w*)|\[(\d+)\]'
+        pattern = r'([^.\[\]\s]+)|\[\s*(\d+)\s*\]'
         matches = re.findall(pattern, id_short_path)
         result = [match[0] if match[0] else int(match[1]) for match in matches]
         return result
 
+    @classmethod
+    def canonical_id_short_path(cls, id_short_path: str) -> str:
+        """
+        Return the canonical form of the idShortPath, as it is saved in the `idShortPath` property of Referables.
+
+        Example Input: "MySubmodelElementCollection.MySubSubmodelElementList2 [0][0].MySubTestValue3"
+        Example Result: "MySubmodelElementCollection.MySubSubmodelElementList2[0][0].MySubTestValue3"
+        """
+        path = ""
+        for id_short in cls.itemize_id_short_path(id_short_path):
+            if isinstance(id_short, int):
+                path += f"[{id_short}]"
+            else:
+                path += f".{id_short}" if path else id_short
+        return path
+
+    def _process_identifiable(self, obj: Dict) -> Tuple[List[Dict], Dict[str, List]]:
+        """Process an Identifiable into nodes and relationships and materialize the idShortPaths of its Referables."""
+        nodes, relationships = self._process_dict(obj)
+        self._set_id_short_paths(nodes, relationships, obj['id'])
+        return nodes, relationships
+
+    def _set_id_short_paths(self, nodes: List[Dict], relationships: Dict[str, List], identifiable_id: str,
+                            root_path: str = ""):
+        """
+        Save `identifiableId` and canonical `idShortPath` on every Referable node of a processed object.
+
+        The last node in `nodes` is the root of the processed object and gets the `root_path`. Every other Referable
+        extends the path of its closest ancestor by its idShort, or by its index if the ancestor is a
+        SubmodelElementList.
+        """
+        nodes_by_uid = {node['uid']: node for node in nodes}
+        children: Dict[int, List[Tuple[str, int, Dict]]] = {}
+        for rel_type, rel_list in relationships.items():
+            if rel_type in self.model_config.virtual_relationships:
+                continue
+            for rel in rel_list:
+                children.setdefault(rel['from_uid'], []).append((rel_type, rel['to_uid'], rel['rel_props']))
+
+        root_node = nodes[-1]
+        if "Referable" in root_node['labels']:
+            root_node['identifiableId'] = identifiable_id
+            root_node['idShortPath'] = root_path
+
+        stack = [(root_node['uid'], root_path)]
+        while stack:
+            uid, path = stack.pop()
+            node = nodes_by_uid[uid]
+            is_list = "SubmodelElementList" in node['labels']
+            list_item_index = 0
+            for rel_type, child_uid, rel_props in children.get(uid, ()):
+                child_node = nodes_by_uid.get(child_uid)
+                if child_node is None:
+                    continue
+                child_path = path
+                if "Referable" in child_node['labels']:
+                    if is_list and rel_type == "value":
+                        child_path = f"{path}[{rel_props.get('list_index', list_item_index)}]"
+                        list_item_index += 1
+                    else:
+                        id_short = child_node.get('idShort', '')
+                        child_path = f"{path}.{id_short}" if path else id_short
+                    child_node['identifiableId'] = identifiable_id
+                    child_node['idShortPath'] = child_path
+                stack.append((child_uid, child_path))
+
 
 def main():
     def optimized_upload_all_submodels(submodels_folder="../examples/aas/test_dataset/"):
@@ -0,0 +1,301 @@
+"""
+Asynchronous client on the async Neo4j driver, for servers built on asyncio.
+
+The clauses and the mapping of the data are shared with the synchronous client: `AsyncAASNeo4JClient` builds its
+clauses with an `AASNeo4JClient` without a driver, its `mapper`, and runs them on a `neo4j.AsyncDriver`. CPU-heavy
+work, the flattening of added objects, their deduplication and the reconstruction of fetched subgraphs, runs in an
+executor, so it does not block the event loop.
+"""
+import asyncio
+import collections
+import functools
+import json
+import logging
+import time
+from concurrent.futures import Executor
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+import neo4j
+from neo4j.exceptions import TransientError
+
+from aas_mapping.aas_neo4j_adapter.aas_neo4j_client import AASNeo4JClient, IDENTIFIABLE_LABELS_CLAUSE
+from aas_mapping.aas_neo4j_adapter.base import CypherClause, Neo4jModelConfig
+from aas_mapping.aas_neo4j_adapter.jsonification.neo4j_import import CREATE_NODES_QUERY
+from aas_mapping.aas_neo4j_adapter.tracing import NO_OP_TRACER, Tracer, trace_query, traced
+from aas_mapping.aas_neo4j_adapter.utils import UploadStats
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncAASNeo4JClient:
+    """
+    Asynchronous AAS client with awaitable reads and writes of Referables.
+
+    One client serves all tasks of an event loop: the driver pools the connections and every operation runs in its
+    own session. The deduplication state of the uploads is shared with the `mapper`, which is thread-safe.
+
+    Uploads commit in batches like the bulk uploads of `AASNeo4JClient` and bump the cache versions afterwards, so
+    until then clients caching query results may serve results from before the upload.
+    """
+    # Tracer of the database calls and the high-level operations, see `enable_tracing`
+    tracer: Tracer = NO_OP_TRACER
+
+    def __init__(self, uri: str, user: str, password: Optional[str] = None, model_config: Neo4jModelConfig = None,
+                 executor: Optional[Executor] = None):
+        """
+        Args:
+            uri: the URI of the Neo4j database
+            user: the user of the database
+            password: the password of the user
+            model_config: the model config of the mapping
+            executor: the executor of the CPU-heavy work, by default the default executor of the event loop
+        """
+        self.driver: Optional[neo4j.AsyncDriver] = \
+            neo4j.AsyncGraphDatabase.driver(uri, auth=(user, password)) if uri else None
+        # Builds the clauses and maps the data, it has no driver of its own
+        self.mapper = AASNeo4JClient(uri=None, user=None, model_config=model_config)
+        self.executor = executor
+
+    @property
+    def model_config(self) -> Neo4jModelConfig:
+        return self.mapper.model_config
+
+    def enable_tracing(self, tracer: Optional[Tracer] = None) -> Tracer:
+        """
+        Trace all database calls and high-level operations, by default with OpenTelemetry.
+
+        Pass `NO_OP_TRACER` to disable tracing again.
+        """
+        self.tracer = self.mapper.enable_tracing(tracer)
+        return self.tracer
+
+    async def close(self):
+        if self.driver is not None:
+            await self.driver.close()
+
+    async def __aenter__(self) -> "AsyncAASNeo4JClient":
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def offload(self, func: Callable, *args) -> Any:
+        """Run the CPU-heavy function in the executor and return its result."""
+        return await asyncio.get_running_loop().run_in_executor(self.executor, functools.partial(func, *args))
+
+    async def execute_clause(self, clause: CypherClause, single: bool = False, parameters: Optional[Dict] = None):
+        """Execute a Cypher clause and return its single record or the list of all its records."""
+        with trace_query(self.tracer, "neo4j.execute_clause", clause, parameters) as trace:
+            async with self.driver.session() as session:
+                result = await session.run(clause, parameters)
+                if single:
+                    record = await result.single()
+                    trace.record(record is not None)
+                    return record
+                records = []
+                async for record in result:
+                    trace.record()
+                    records.append(record)
+                return records
+
+    async def stream_clause(self, clause: CypherClause, parameters: Optional[Dict] = None,
+                            fetch_size: Optional[int] = None) -> AsyncIterator[neo4j.Record]:
+        """
+        Execute a Cypher clause and yield its records lazily, like `BaseNeo4JClient.stream_clause`.
+
+        If the consumer stops early, i.e. closes the generator, the transaction of the clause is rolled back.
+        """
+        with trace_query(self.tracer, "neo4j.stream_clause", clause, parameters) as trace:
+            async with self.driver.session(fetch_size=fetch_size or self.mapper.default_fetch_size) as session:
+                transaction = await session.begin_transaction()
+                try:
+                    async for record in await transaction.run(clause, parameters):
+                        trace.record()
+                        yield record
+                    await transaction.commit()
+                finally:
+                    # Rolls the transaction back if it was not committed
+                    await transaction.close()
+
+    async def _run_in_transaction(self, transaction: neo4j.AsyncTransaction, clause: CypherClause,
+                                  parameters: Optional[Dict] = None) -> List[neo4j.Record]:
+        """Run a Cypher clause in the transaction and return the list of all its records."""
+        with trace_query(self.tracer, "neo4j.execute_clause", clause, parameters) as trace:
+            records = []
+            async for record in await transaction.run(clause, parameters):
+                trace.record()
+                records.append(record)
+            return records
+
+    async def _execute_clauses(self, clauses: List[Tuple[str, Dict]]):
+        for clause, parameters in clauses:
+            await self.execute_clause(clause, parameters=parameters)
+
+    async def identifiable_exists(self, identifier: str) -> bool:
+        """Check if an Identifiable node with the given ID exists in the Neo4j database."""
+        record = await self.execute_clause("MATCH (n:Identifiable {id: $id}) RETURN count(n) > 0 AS found",
+                                           single=True, parameters={"id": identifier})
+        return record["found"]
+
+    async def count_identifiables(self) -> int:
+        record = await self.execute_clause("MATCH (n:Identifiable) RETURN count(n) AS count", single=True)
+        return record["count"] if record else 0
+
+    @traced()
+    async def get_referable(self, parent_id: str, id_short_path: Optional[str] = None) -> Dict:
+        clause, parameters = self.mapper._subgraph_of_referable_clause(parent_id, id_short_path)
+        result = await self.execute_clause(clause, single=True, parameters=parameters)
+        if result is None:
+            raise KeyError(f"No Referable found with: id={parent_id}, id_short_path={id_short_path}")
+        return await self.offload(self._convert_subgraph, result["json"])
+
+    def _convert_subgraph(self, subgraph_json: str) -> Dict:
+        return self.mapper.convert_subgraph_to_data_dict(json.loads(subgraph_json))
+
+    @traced()
+    async def get_identifiable(self, identifier: str) -> Dict:
+        return await self.get_referable(identifier)
+
+    @traced()
+    async def iter_identifiables(self, prefetch: int = 8) -> AsyncIterator[Dict]:
+        """
+        Yield all Identifiables ordered by their ids, fetching up to `prefetch` of them ahead of the consumer.
+
+        Identifiables which are removed while iterating are skipped.
+        """
+        if prefetch < 1:
+            raise ValueError(f"Prefetch must be positive, got {prefetch}")
+        pending = collections.deque()
+        try:
+            async for record in self.stream_clause("MATCH (n:Identifiable) RETURN n.id AS id ORDER BY id"):
+                if len(pending) >= prefetch:
+                    try:
+                        yield await pending.popleft()
+                    except KeyError:
+                        pass
+                pending.append(asyncio.ensure_future(self.get_identifiable(record["id"])))
+            while pending:
+                try:
+                    yield await pending.popleft()
+                except KeyError:
+                    pass
+        finally:
+            for task in pending:
+                task.cancel()
+
+    @traced()
+    async def add_identifiable(self, obj: Dict) -> UploadStats:
+        if await self.identifiable_exists(obj['id']):
+            raise KeyError(f"Identifiable with id {obj['id']} already exists in the database.")
+        nodes, relationships = await self.offload(self.mapper._process_identifiable, obj)
+        return await self._upload_nodes_and_relationships(nodes, relationships)
+
+    @traced()
+    async def add_submodel_element(self, obj: Dict, parent_id: str, id_short_path: str) -> UploadStats:
+        clause, parameters = self.mapper._find_node_with_list_size_clause(parent_id, id_short_path)
+        record = await self.execute_clause(clause, single=True, parameters=parameters)
+        parent_node = self.mapper._found_node(record, parent_id, id_short_path)
+        nodes, relationships = await self.offload(self.mapper._process_submodel_element, obj, parent_id,
+                                                  id_short_path, *parent_node)
+        return await self._upload_nodes_and_relationships(nodes, relationships,
+                                                          exist_uid_to_internal_id={parent_node[0]: parent_node[0]})
+
+    @traced()
+    async def remove_referable(self, parent_id: str, id_short_path: Optional[str] = None) -> List[neo4j.Record]:
+        labels = []
+        if self.mapper.track_cache_versions:
+            # The labels of the Identifiable have to be read before it is removed
+            record = await self.execute_clause(IDENTIFIABLE_LABELS_CLAUSE, single=True, parameters={"id": parent_id})
+            labels = record["labels"] if record else []
+        clause, parameters = self.mapper._remove_referable_clause(parent_id, id_short_path)
+        renamed = None
+        async with self.driver.session() as session:
+            # The removal, the shift of the following list items and the bump of the cache versions happen together
+            transaction = await session.begin_transaction()
+            try:
+                result = await self._run_in_transaction(transaction, clause, parameters)
+                if id_short_path and result and result[0]["deletedNodes"]:
+                    shift = self.mapper._shift_list_items_clause(parent_id, id_short_path)
+                    if shift is not None:
+                        renamed = (await self._run_in_transaction(transaction, *shift))[0]
+                bump = self.mapper._bump_cache_versions_clause(labels=labels)
+                if bump is not None:
+                    await self._run_in_transaction(transaction, *bump)
+                await transaction.commit()
+            finally:
+                # Rolls the transaction back if it was not committed
+                await transaction.close()
+        if self.mapper.resolve_model_references_on_upload and renamed and renamed["renamedNodes"]:
+            # References to the moved items point to other items now
+            await self._execute_clauses(self.mapper._resolve_model_references_clauses([parent_id], refresh=True))
+        return result
+
+    @traced()
+    async def remove_identifiable(self, identifier: str) -> List[neo4j.Record]:
+        return await self.remove_referable(identifier)
+
+    async def _create_nodes(self, session: neo4j.AsyncSession, grouped_nodes: Dict[Tuple[str], List[Dict]],
+                            stats: UploadStats, exist_uid_to_internal_id: Optional[Dict[int, int]] = None):
+        """Create the nodes and release the deduplicated ones, like `JsonToNeo4jImporter._create_nodes`."""
+        mapper = self.mapper
+        node_start_time = time.time()
+        created_uid_to_internal_id = None
+        try:
+            for clause in mapper._uid_index_clauses(grouped_nodes):
+                await (await session.run(clause)).consume()
+            data_for_query = mapper._create_nodes_data(grouped_nodes)
+            uid_to_internal_id = {}
+            with trace_query(self.tracer, "neo4j.create_nodes", CREATE_NODES_QUERY,
+                             {"data": data_for_query}) as trace:
+                result = await session.run(CREATE_NODES_QUERY, data=data_for_query)
+                async for record in result:
+                    trace.record()
+                    uid_to_internal_id[record['uid']] = record['internal_id']
+            if exist_uid_to_internal_id:
+                uid_to_internal_id.update(exist_uid_to_internal_id)
+            created_uid_to_internal_id = uid_to_internal_id
+        finally:
+            mapper._release_pending_nodes(grouped_nodes, created_uid_to_internal_id)
+        mapper._record_created_nodes(stats, grouped_nodes, time.time() - node_start_time)
+
+    @traced()
+    async def _upload_nodes_and_relationships(self, nodes: List[Dict], relationships: Dict[str, List],
+                                              stats: Optional[UploadStats] = None,
+                                              exist_uid_to_internal_id: Optional[Dict[int, int]] = None,
+                                              db_batch_size: int = 1000) -> UploadStats:
+        """Upload nodes and relationships like `JsonToNeo4jImporter._upload_nodes_and_relationships`."""
+        mapper = self.mapper
+        stats = stats or UploadStats()
+        grouped_nodes, relationships = await self.offload(mapper._prepare_upload, nodes, relationships, stats)
+
+        async with self.driver.session() as session:
+            await self._create_nodes(session, grouped_nodes, stats, exist_uid_to_internal_id)
+            if mapper._pending_uids or mapper._unclaimed_nodes:
+                claimed_nodes = await self.offload(mapper._wait_for_pending_nodes, relationships)
+                if claimed_nodes:
+                    await self._create_nodes(session, claimed_nodes, stats)
+
+            rel_start_time = time.time()
+            relationship_count = 0
+            for rel_type, create_rels_query, prepared_rels in mapper._create_relationships_batches(
+                    relationships, mapper.uid_to_internal_id, db_batch_size):
+                try:
+                    transaction_start_time = time.perf_counter()
+                    with trace_query(self.tracer, "neo4j.create_relationships", create_rels_query,
+                                     {"relationships": prepared_rels}) as trace:
+                        result = await session.run(create_rels_query, relationships=prepared_rels)
+                        created = (await result.single())['created']
+                        trace.record()
+                    relationship_count += created
+                    stats.observe_phase("rel_write", time.perf_counter() - transaction_start_time)
+                    stats.count_relationships(rel_type, created)
+                except TransientError as e:
+                    logger.error(f"Transient error during relationship creation batch: {e}")
+            relationship_creation_time = time.time() - rel_start_time
+            stats.total_relationship_creation_time += relationship_creation_time
+            stats.total_relationships_created += relationship_count
+            logger.info(f"Created {relationship_count} relationships in {relationship_creation_time:.2f} seconds")
+
+        await self._execute_clauses(mapper._upload_follow_up_clauses(nodes))
+        stats.record_batch_peak_rss()
+        return stats
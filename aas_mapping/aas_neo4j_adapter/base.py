@@ -1,16 +1,42 @@
 import logging
-from dataclasses import dataclass
-from typing import List, Iterable, Dict, Optional
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field, fields
+from types import MappingProxyType
+from typing import Any, Callable, ContextManager, List, Iterable, Iterator, Dict, Optional, TypeVar, Union
 
 import neo4j
 from neo4j import Driver
 
+from aas_mapping.aas_neo4j_adapter.tracing import NO_OP_TRACER, Tracer, trace_query
+
 logger = logging.getLogger(__name__)
 
 CypherClause = str
+T = TypeVar("T")
 
-@dataclass
+# Separates the name of a LangString list property from the language, e.g. "value_text__en"
+LANGUAGE_PROP_SEPARATOR = "__"
+
+def _freeze(value: Any) -> Any:
+    """Return an immutable copy of the sets, lists and dicts of a config value."""
+    if isinstance(value, (set, frozenset)):
+        return frozenset(value)
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple, Iterator)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+@dataclass(frozen=True)
 class Neo4jModelConfig:
+    """
+    Configuration of the mapping of the model to Neo4j.
+
+    The config is immutable, its sets, lists and dicts are frozen on creation, so one config can be shared by
+    clients in multiple threads. Use `dataclasses.replace` to derive a changed config.
+    """
     default_optimization_clauses: Iterable[str]
     deduplicated_object_types: Iterable[str]
     list_of_dicts_prop_as_multiple_list_props: Dict[str, List[str]]
@@ -25,6 +51,22 @@ class Neo4jModelConfig:
     all_list_item_relationships_have_index: bool
     list_item_relationships_with_index: Dict[str, List[str]]
 
+    # Properties which are only written to speed up lookups (e.g. materialized paths or typed copies of values).
+    # They are not part of the original data and are dropped while exporting nodes back to dicts.
+    shadow_properties: Iterable[str] = ()
+
+    # Attributes of objects that are lists of LangStrings and should also be saved as one property per language
+    # BEFORE: value = [{"language": "en", "text": "Motor"}, {"language": "de", "text": "Motor"}]
+    # AFTER:  value_text__en = "Motor"
+    #         value_text__de = "Motor"
+    # These properties are shadow properties, indexes are created for the languages in `indexed_languages`
+    lang_string_props_per_language: Dict[str, List[str]] = field(default_factory=dict)
+    indexed_languages: Iterable[str] = ()
+
+    def __post_init__(self):
+        for config_field in fields(self):
+            object.__setattr__(self, config_field.name, _freeze(getattr(self, config_field.name)))
+
 EMPTY_NEO4J_MODEL_CONFIG = Neo4jModelConfig(
     default_optimization_clauses=[],
     deduplicated_object_types=[],
@@ -37,24 +79,246 @@ EMPTY_NEO4J_MODEL_CONFIG = Neo4jModelConfig(
 )
 
 
+@contextmanager
+def _yield(value: T) -> Iterator[T]:
+    yield value
+
+
+def _clause_text(clause: Union[CypherClause, neo4j.Query]) -> CypherClause:
+    """Return the text of the clause, transactions only run plain text. Their timeout is set on begin."""
+    return clause.text if isinstance(clause, neo4j.Query) else clause
+
+
+@dataclass
+class ActiveTransaction:
+    """
+    Transaction which all operations of a client in the current thread or task run in.
+
+    Attributes:
+        transaction (neo4j.Transaction): The transaction, or the managed transaction of `execute_in_transaction`.
+        uid_to_internal_id (Dict[int, str]): The internal ids of the nodes created in the transaction, which are
+            only visible to the other operations of the client after the commit.
+        on_commit (List[Callable[[], None]]): Called after the transaction was committed.
+        on_rollback (List[Callable[[], None]]): Called after the transaction was rolled back.
+    """
+    transaction: Any
+    uid_to_internal_id: Dict[int, str] = field(default_factory=dict)
+    on_commit: List[Callable[[], None]] = field(default_factory=list)
+    on_rollback: List[Callable[[], None]] = field(default_factory=list)
+
+    def finish(self, committed: bool):
+        for callback in self.on_commit if committed else self.on_rollback:
+            callback()
+
+
 class BaseNeo4JClient:
+    """
+    Base of the clients, which can be shared between threads.
+
+    The driver holds the connection pool and is thread-safe, every operation runs in its own session, unless it runs
+    in a transaction of `transaction` or `execute_in_transaction`.
+    """
     driver: Driver
     model_config: Neo4jModelConfig
+    # Tracer of the database calls and the high-level operations, see `enable_tracing`
+    tracer: Tracer = NO_OP_TRACER
+    # Number of records the driver fetches per round trip while streaming results
+    default_fetch_size: int = 1000
 
     def __init__(self, uri: str, user: str , password: Optional[str] = None, model_config: Neo4jModelConfig = None):
         self.driver = neo4j.GraphDatabase.driver(uri, auth=(user, password)) if uri else None
         self.model_config = model_config or EMPTY_NEO4J_MODEL_CONFIG
+        # A context variable, so every thread and asyncio task has its own active transaction
+        self._active_transaction: ContextVar[Optional[ActiveTransaction]] = \
+            ContextVar(f"active_transaction_{id(self)}", default=None)
 
-    def execute_clause(self, clause: CypherClause, single: bool = False):
-        """Execute the generated Cypher clauses in the Neo4j database. After execution, the clauses are cleared."""
+    @property
+    def in_transaction(self) -> bool:
+        """If the operations of the current thread or task run in a transaction."""
+        return self._active_transaction.get() is not None
+
+    def _in_transactions(self, batch_size: int) -> str:
+        """
+        Return the suffix running a CALL subquery in transactions of `batch_size` rows.
+
+        Subqueries cannot run in transactions within an explicit transaction, there they run in the active one.
+        """
+        return "" if self.in_transaction else f" IN TRANSACTIONS OF {int(batch_size)} ROWS"
+
+    def _session(self, **kwargs) -> ContextManager[Union[neo4j.Session, neo4j.Transaction]]:
+        """
+        Return a context manager yielding what clauses are run with: the active transaction, or else a new session.
+
+        Args:
+            kwargs: the config of the new session, e.g. its `fetch_size`
+        """
+        active = self._active_transaction.get()
+        if active is not None:
+            return _yield(active.transaction)
+        return self.driver.session(**kwargs)
+
+    def after_transaction(self, on_commit: Callable[[], None], on_rollback: Callable[[], None]) -> bool:
+        """
+        Call `on_commit` after the active transaction committed, or `on_rollback` after it was rolled back.
+
+        Returns:
+            False if no transaction is active, then no callback is registered.
+        """
+        active = self._active_transaction.get()
+        if active is None:
+            return False
+        active.on_commit.append(on_commit)
+        active.on_rollback.append(on_rollback)
+        return True
+
+    @contextmanager
+    def transaction(self, timeout: Optional[float] = None,
+                    metadata: Optional[Dict[str, Any]] = None) -> Iterator[neo4j.Transaction]:
+        """
+        Run all operations of the client in the block in one transaction, which uses a single connection.
+
+        The transaction is committed at the end of the block and rolled back if the block raises. Operations of other
+        threads or asyncio tasks are not part of it. A transaction in a transaction joins the outer one. The block is
+        not retried on transient errors, use `execute_in_transaction` for that.
+
+            with client.transaction():
+                if not client.identifiable_exists(submodel_id):
+                    ...
+                client.add_submodel_element(element, submodel_id, "Collection")
+
+        Args:
+            timeout: the transaction timeout in seconds enforced by the server
+            metadata: the metadata of the transaction, which is shown by `SHOW TRANSACTIONS`
+        """
+        active = self._active_transaction.get()
+        if active is not None:
+            yield active.transaction
+            return
         with self.driver.session() as session:
-            if single:
-                result = session.run(clause).single()
-            else:
-                result = session.run(clause)
-                if result:
-                    result = [record for record in result]
-            return result
+            active = ActiveTransaction(session.begin_transaction(metadata=metadata, timeout=timeout))
+            token = self._active_transaction.set(active)
+            committed = False
+            try:
+                yield active.transaction
+                active.transaction.commit()
+                committed = True
+            finally:
+                self._active_transaction.reset(token)
+                # Rolls the transaction back if it was not committed
+                active.transaction.close()
+                active.finish(committed)
+
+    def execute_in_transaction(self, work: Callable[..., T], *args, **kwargs) -> T:
+        """
+        Call `work(*args, **kwargs)` with all operations of the client in one managed write transaction.
+
+        The driver retries the whole call on transient errors, e.g. deadlocks, so `work` must have no side effects
+        besides the operations of the client. In a transaction, `work` joins it and is not retried.
+
+        Returns:
+            The return value of `work`.
+        """
+        if self._active_transaction.get() is not None:
+            return work(*args, **kwargs)
+        attempts: List[ActiveTransaction] = []
+
+        def run(transaction: neo4j.ManagedTransaction) -> T:
+            if attempts:
+                # The driver only retries after the previous attempt was rolled back
+                attempts.pop().finish(committed=False)
+            attempts.append(ActiveTransaction(transaction))
+            token = self._active_transaction.set(attempts[-1])
+            try:
+                return work(*args, **kwargs)
+            finally:
+                self._active_transaction.reset(token)
+
+        try:
+            with self.driver.session() as session:
+                result = session.execute_write(run)
+        except BaseException:
+            if attempts:
+                attempts.pop().finish(committed=False)
+            raise
+        attempts.pop().finish(committed=True)
+        return result
+
+    def enable_tracing(self, tracer: Optional[Tracer] = None) -> Tracer:
+        """
+        Trace all database calls and high-level operations, by default with OpenTelemetry.
+
+        Pass `NO_OP_TRACER` to disable tracing again.
+        """
+        if tracer is None:
+            from aas_mapping.aas_neo4j_adapter.tracing import OpenTelemetryTracer
+            tracer = OpenTelemetryTracer()
+        self.tracer = tracer
+        return tracer
+
+    def execute_clause(self, clause: CypherClause, single: bool = False, parameters: Optional[Dict] = None):
+        """Execute the generated Cypher clauses in the Neo4j database. After execution, the clauses are cleared."""
+        with trace_query(self.tracer, "neo4j.execute_clause", clause, parameters) as trace:
+            with self._session() as session:
+                if single:
+                    result = session.run(clause, parameters).single()
+                    trace.record(result is not None)
+                else:
+                    result = session.run(clause, parameters)
+                    if result:
+                        records = []
+                        for record in result:
+                            trace.record()
+                            records.append(record)
+                        result = records
+                return result
+
+    def stream_clause(self, clause: Union[CypherClause, neo4j.Query], parameters: Optional[Dict] = None,
+                      fetch_size: Optional[int] = None,
+                      on_summary: Optional[Callable[[neo4j.ResultSummary], None]] = None) -> Iterator[neo4j.Record]:
+        """
+        Execute a Cypher clause and yield its records lazily, so memory use does not grow with the result size.
+
+        The session stays open while the records are consumed and the driver fetches them in batches of `fetch_size`,
+        by default `default_fetch_size`. The clause runs in an explicit transaction, which is committed when all
+        records are consumed. If the consumer stops early, i.e. closes or drops the generator, the transaction is
+        rolled back, so the server discards the remaining records instead of streaming them. In a transaction of
+        `transaction`, the clause runs in that transaction instead, which is bound to the timeout of the transaction.
+        The timeout of a `neo4j.Query` cannot be applied there, so a warning is logged.
+
+        `on_summary` is called with the summary of the result after all records were consumed, it is not called
+        if the consumer stops early.
+        """
+        active = self._active_transaction.get()
+        if active is not None:
+            if isinstance(clause, neo4j.Query) and clause.timeout is not None:
+                logger.warning(f"The timeout of {clause.timeout} s cannot be applied to a clause in a transaction, "
+                               f"it is bound to the timeout of the transaction instead")
+            with trace_query(self.tracer, "neo4j.stream_clause", clause, parameters) as trace:
+                result = active.transaction.run(_clause_text(clause), parameters)
+                for record in result:
+                    trace.record()
+                    yield record
+                if on_summary is not None:
+                    on_summary(result.consume())
+            return
+        with trace_query(self.tracer, "neo4j.stream_clause", clause, parameters) as trace:
+            with self.driver.session(fetch_size=fetch_size or self.default_fetch_size) as session:
+                if isinstance(clause, neo4j.Query):
+                    transaction = session.begin_transaction(metadata=clause.metadata, timeout=clause.timeout)
+                    clause = clause.text
+                else:
+                    transaction = session.begin_transaction()
+                try:
+                    result = transaction.run(clause, parameters)
+                    for record in result:
+                        trace.record()
+                        yield record
+                    if on_summary is not None:
+                        on_summary(result.consume())
+                    transaction.commit()
+                finally:
+                    # Rolls the transaction back if it was not committed
+                    transaction.close()
 
     def get_props_to_model_as_multiple_lists(self, node_labels: Iterable[str]) -> List[str]:
         """Return list-of-dicts properties to model as multiple lists."""
@@ -65,6 +329,20 @@ class BaseNeo4JClient:
             for prop in self.model_config.list_of_dicts_prop_as_multiple_list_props[label]
         ]
 
+    def get_lang_string_props_to_model_per_language(self, node_labels: Iterable[str]) -> List[str]:
+        """Return LangString list properties to model additionally as one property per language."""
+        return [
+            prop
+            for label in node_labels
+            if label in self.model_config.lang_string_props_per_language
+            for prop in self.model_config.lang_string_props_per_language[label]
+        ]
+
+    def is_shadow_property(self, key: str) -> bool:
+        """Return True if the node property is only saved to speed up queries and is not part of the data."""
+        return key in self.model_config.shadow_properties or (
+                bool(self.model_config.lang_string_props_per_language) and LANGUAGE_PROP_SEPARATOR in key)
+
     def get_complex_props_to_model_as_multiple_simple_props(self, node_labels: Iterable[str]) -> List[str]:
         """Return dict properties to model as multiple simple properties."""
         return [
@@ -74,9 +352,24 @@ class BaseNeo4JClient:
             for prop in self.model_config.dict_prop_as_multiple_props[label]
         ]
 
-    def optimize_database(self):
-        """Optimize the Neo4j database by creating all necessary indexes."""
-        for clause in self.model_config.default_optimization_clauses:
+    def get_per_language_index_clauses(self) -> List[str]:
+        """Return clauses creating indexes on the per-language properties of the indexed languages."""
+        return [
+            f"CREATE INDEX FOR (r:{label}) ON (r.`{prop}_text{LANGUAGE_PROP_SEPARATOR}{language}`);"
+            for label, props in self.model_config.lang_string_props_per_language.items()
+            for prop in props
+            for language in self.model_config.indexed_languages
+        ]
+
+    def optimize_database(self, extra_clauses: Iterable[str] = ()):
+        """
+        Optimize the Neo4j database by creating all necessary indexes.
+
+        Args:
+            extra_clauses: further index clauses, e.g. the ones recommended by an IndexAdvisor
+        """
+        for clause in [*self.model_config.default_optimization_clauses, *self.get_per_language_index_clauses(),
+                       *extra_clauses]:
             try:
                 self.execute_clause(clause, single=True)
             except neo4j.exceptions.ClientError as e:
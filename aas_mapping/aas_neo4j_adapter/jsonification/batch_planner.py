@@ -0,0 +1,106 @@
+"""
+Planning of the file batches of an upload under a node and memory budget.
+
+The number of nodes a file is flattened into is estimated from its size. The ratio of nodes per byte is calibrated
+with every processed file, so later batches are packed with the ratio of the actual data.
+"""
+from dataclasses import dataclass
+from typing import Iterable, Iterator, List, Tuple
+
+MiB = 2 ** 20
+
+
+@dataclass
+class FileBatch:
+    """
+    Files uploaded together.
+
+    Attributes:
+        files (List[str]): The names of the files.
+        estimated_nodes (int): The estimated number of nodes the files are flattened into.
+        estimated_memory (int): The estimated peak memory in bytes to process the batch.
+        split (bool): If True, the batch is a single file exceeding the budget, which is uploaded in sub-batches
+            of its Identifiables.
+    """
+    files: List[str]
+    estimated_nodes: int
+    estimated_memory: int
+    split: bool = False
+
+
+class BatchPlanner:
+    """
+    Pack files into batches under a node and memory budget.
+
+    The memory of a batch is estimated as its flattened nodes times `bytes_per_node` plus the parsed JSON of its
+    largest file, which is `parsed_bytes_per_byte` times the file size. Files whose estimate alone exceeds the
+    budget are planned as split batches.
+    """
+
+    def __init__(self, max_batch_nodes: int = 200_000, max_batch_memory: int = 1024 * MiB,
+                 max_batch_files: int = 1000, nodes_per_byte: float = 1 / 150, bytes_per_node: int = 1024,
+                 parsed_bytes_per_byte: float = 8.0):
+        """
+        Args:
+            max_batch_nodes: the maximum number of flattened nodes per batch
+            max_batch_memory: the maximum estimated memory per batch in bytes
+            max_batch_files: the maximum number of files per batch
+            nodes_per_byte: the initial ratio of flattened nodes per byte of JSON, calibrated with `observe`
+            bytes_per_node: the memory of a flattened node with its relationships
+            parsed_bytes_per_byte: the memory of parsed JSON per byte of the file
+        """
+        if max_batch_nodes < 1 or max_batch_memory < 1 or max_batch_files < 1:
+            raise ValueError("Batch budgets must be positive")
+        self.max_batch_nodes = max_batch_nodes
+        self.max_batch_memory = max_batch_memory
+        self.max_batch_files = max_batch_files
+        self.nodes_per_byte = nodes_per_byte
+        self.bytes_per_node = bytes_per_node
+        self.parsed_bytes_per_byte = parsed_bytes_per_byte
+        self.observed_bytes = 0
+        self.observed_nodes = 0
+
+    @property
+    def max_sub_batch_nodes(self) -> int:
+        """The maximum number of nodes of a sub-batch of a split file."""
+        return max(1, min(self.max_batch_nodes, self.max_batch_memory // self.bytes_per_node))
+
+    def estimate_nodes(self, file_size: int) -> int:
+        return max(1, round(file_size * self.nodes_per_byte))
+
+    def estimate_memory(self, nodes: int, largest_file_size: int) -> int:
+        return nodes * self.bytes_per_node + round(largest_file_size * self.parsed_bytes_per_byte)
+
+    def observe(self, file_size: int, nodes: int):
+        """Calibrate the ratio of nodes per byte with a processed file."""
+        self.observed_bytes += file_size
+        self.observed_nodes += nodes
+        if self.observed_bytes:
+            self.nodes_per_byte = self.observed_nodes / self.observed_bytes
+
+    def plan(self, files: Iterable[Tuple[str, int]]) -> Iterator[FileBatch]:
+        """
+        Yield the batches of the files, given as (name, size in bytes), in their order.
+
+        Batches are planned lazily, so files processed before the next batch is requested calibrate its estimates.
+        """
+        batch: List[str] = []
+        nodes = largest_file_size = 0
+        for name, size in files:
+            file_nodes = self.estimate_nodes(size)
+            if file_nodes > self.max_batch_nodes or self.estimate_memory(file_nodes, size) > self.max_batch_memory:
+                if batch:
+                    yield FileBatch(batch, nodes, self.estimate_memory(nodes, largest_file_size))
+                    batch, nodes, largest_file_size = [], 0, 0
+                yield FileBatch([name], file_nodes, self.estimate_memory(self.max_sub_batch_nodes, size), split=True)
+                continue
+            if batch and (len(batch) >= self.max_batch_files or nodes + file_nodes > self.max_batch_nodes or
+                          self.estimate_memory(nodes + file_nodes, max(largest_file_size, size)) >
+                          self.max_batch_memory):
+                yield FileBatch(batch, nodes, self.estimate_memory(nodes, largest_file_size))
+                batch, nodes, largest_file_size = [], 0, 0
+            batch.append(name)
+            nodes += file_nodes
+            largest_file_size = max(largest_file_size, size)
+        if batch:
+            yield FileBatch(batch, nodes, self.estimate_memory(nodes, largest_file_size))
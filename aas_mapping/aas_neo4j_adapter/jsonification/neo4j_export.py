@@ -7,7 +7,7 @@ logger = logging.getLogger(__name__)
 
 class JsonFromNeo4jExporter(BaseNeo4JClient):
     def _get_node_properties(self, node: Dict) -> Dict:
-        return {key: value for key, value in node['properties'].items()}
+        return {key: value for key, value in node['properties'].items() if not self.is_shadow_property(key)}
 
     def _create_list_of_dicts(self, *lists: List[List[any]], keys: List[str]) -> List[Dict]:
         if len(keys) != len(lists):
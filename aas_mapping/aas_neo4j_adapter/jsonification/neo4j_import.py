@@ -1,34 +1,69 @@
 import hashlib
+import itertools
 import json
 import logging
 import os
+import threading
 import time
+from collections import ChainMap
 from copy import deepcopy
 from os.path import join, isfile
-from typing import Optional, List, Dict, Tuple, Any
+from typing import Optional, List, Dict, Tuple, Any, Iterator, Mapping
 
 from neo4j import Session
 from neo4j.exceptions import TransientError, ClientError
 
-from aas_mapping.aas_neo4j_adapter.base import BaseNeo4JClient, Neo4jModelConfig
-from aas_mapping.utils import UploadStats
+from aas_mapping.aas_neo4j_adapter.base import BaseNeo4JClient, Neo4jModelConfig, LANGUAGE_PROP_SEPARATOR
+from aas_mapping.aas_neo4j_adapter.jsonification.batch_planner import BatchPlanner, MiB
+from aas_mapping.aas_neo4j_adapter.tracing import trace_query, traced
+from aas_mapping.aas_neo4j_adapter.utils import UploadStats
 
 logger = logging.getLogger(__name__)
 
+CREATE_NODES_QUERY = """
+UNWIND keys($data) AS labelsString
+
+WITH split(labelsString, ",") AS labels, $data[labelsString] AS nodesProperties
+
+UNWIND nodesProperties AS nodeProperties
+CALL apoc.create.node(labels, nodeProperties) YIELD node AS n
+SET n = nodeProperties
+
+RETURN elementId(n) AS internal_id, nodeProperties.uid AS uid
+"""
+
+
 class JsonToNeo4jImporter(BaseNeo4JClient):
+    """
+    Import of JSON data into Neo4j.
+
+    One importer can upload from multiple threads: the flattening only uses the state of the call and uids from a
+    thread-safe counter, and the deduplication maps shared between the uploads are guarded by `_dedup_lock`.
+    """
+    # Seconds an upload waits for the nodes it was deduplicated against, which another upload is still creating
+    dedup_wait_timeout: float = 60.0
+
     def __init__(self, uri: str, user: str , password: Optional[str] = None, model_config: Neo4jModelConfig = None):
         super().__init__(uri, user, password, model_config)
-        self.uid_counter = 0
+        # next() of itertools.count is atomic, so concurrent flattening never generates the same uid
+        self._uid_counter = itertools.count(1)
 
         # e.g. {HASH: uid}
         self.deduplicated_nodes: dict[str: int] = {}
         self.deduplicated_to_existing_uid_map: dict[int: int] = {}
         self.deduplicated_rels: set[str] = set()
         self.uid_to_internal_id: dict[str: int] = {}
+        # uids of deduplicated nodes which were kept by an upload, but are not created in the database yet
+        self._pending_uids: set[int] = set()
+        # Labels and properties by uid of deduplicated nodes, whose upload failed before they were created.
+        # Other nodes may already be mapped to them, so the next upload which needs one of them creates it.
+        self._unclaimed_nodes: dict[int, tuple[tuple[str], dict]] = {}
+        self._uid_indexed_labels: set[str] = set()
+        # Guards the maps above and is notified when an upload created its nodes
+        self._dedup_lock = threading.Condition(threading.RLock())
 
     def _gen_unique_node_name(self) -> int:
-        self.uid_counter += 1
-        return self.uid_counter
+        return next(self._uid_counter)
 
     def _group_nodes_by_label(self, nodes: List[Dict]) -> Dict[Tuple[str], List[Dict]]:
         grouped = {}
@@ -57,42 +92,47 @@ class JsonToNeo4jImporter(BaseNeo4JClient):
         for key, value in source.items():
             target.setdefault(key, []).extend(value)
 
-    def _create_nodes(self, session: Session, grouped_nodes: Dict[Tuple[str], List[Dict]]) -> Dict[int, int]:
-        """Create nodes in Neo4j and return uid to internal_id mapping."""
-        create_nodes_query = """
-        UNWIND keys($data) AS labelsString
-        
-        WITH split(labelsString, ",") AS labels, $data[labelsString] AS nodesProperties
-        
-        UNWIND nodesProperties AS nodeProperties
-        CALL apoc.create.node(labels, nodeProperties) YIELD node AS n
-        SET n = nodeProperties
-        
-        RETURN elementId(n) AS internal_id, nodeProperties.uid AS uid
-        """
+    def _uid_index_clauses(self, grouped_nodes: Dict[Tuple[str], List[Dict]]) -> List[str]:
+        """Return the clauses creating the uid indexes of the labels, which were not created by this client yet."""
+        labels = {label for labels in grouped_nodes.keys() for label in labels} - self._uid_indexed_labels
+        self._uid_indexed_labels.update(labels)
+        return [f"CREATE INDEX IF NOT EXISTS FOR (n:{label}) ON (n.uid)" for label in labels]
 
+    def _create_nodes_data(self, grouped_nodes: Dict[Tuple[str], List[Dict]]) -> Dict[str, List[Dict]]:
+        """Return the `data` parameter of CREATE_NODES_QUERY."""
         # Convert tuple keys to strings for Neo4j compatibility
-        data_for_query = {
+        return {
             ",".join(label_tuple): node_list
             for label_tuple, node_list in grouped_nodes.items()
         }
 
-        for labels in grouped_nodes.keys():
-            for label in labels:
-                session.run(f"CREATE INDEX IF NOT EXISTS FOR (n:{label}) ON (n.uid)")
+    def _create_nodes(self, session: Session, grouped_nodes: Dict[Tuple[str], List[Dict]]) -> Dict[int, int]:
+        """Create nodes in Neo4j and return uid to internal_id mapping."""
+        data_for_query = self._create_nodes_data(grouped_nodes)
+        index_clauses = self._uid_index_clauses(grouped_nodes)
+        if index_clauses:
+            # Schema changes cannot be mixed with writes in one transaction, so they get their own session
+            with self.driver.session() as index_session:
+                for clause in index_clauses:
+                    index_session.run(clause)
 
         uid_to_internal_id = {}
         # Create nodes
-        result = session.run(create_nodes_query, data=data_for_query)
-        for record in result:
-            uid_to_internal_id[record['uid']] = record['internal_id']
+        with trace_query(self.tracer, "neo4j.create_nodes", CREATE_NODES_QUERY, {"data": data_for_query}) as trace:
+            result = session.run(CREATE_NODES_QUERY, data=data_for_query)
+            for record in result:
+                trace.record()
+                uid_to_internal_id[record['uid']] = record['internal_id']
 
         return uid_to_internal_id
 
-    def _create_relationships(self, session: Session, relationships: Dict[str, List],
-                              uid_to_internal_id: Dict[int, int], db_batch_size: int = 10000):
-        """Create relationships in Neo4j."""
-        created_rels = 0
+    def _create_relationships_batches(self, relationships: Dict[str, List], uid_to_internal_id: Dict[int, int],
+                                      db_batch_size: int = 10000) -> Iterator[Tuple[str, str, List[Dict]]]:
+        """
+        Yield the relationship type, the query and its `relationships` parameter of every batch of relationships.
+
+        Relationships whose nodes have no internal id are skipped.
+        """
         for rel_type, rel_list in relationships.items():
             for i in range(0, len(rel_list), db_batch_size):
                 batch_rels = rel_list[i:i + db_batch_size]
@@ -119,17 +159,37 @@ class JsonToNeo4jImporter(BaseNeo4JClient):
                     SET r = rel.rel_props
                     RETURN count(*) as created
                     """
+                    yield rel_type, create_rels_query, prepared_rels
 
-                    try:
-                        result = session.run(create_rels_query, relationships=prepared_rels)
-                        created = result.single()['created']
-                        created_rels += created
-                    except TransientError as e:
-                        logger.error(f"Transient error during relationship creation batch: {e}")
+    def _create_relationships(self, session: Session, relationships: Dict[str, List],
+                              uid_to_internal_id: Dict[int, int], db_batch_size: int = 10000,
+                              stats: Optional[UploadStats] = None):
+        """Create relationships in Neo4j. The transactions are recorded in the rel_write phase of the `stats`."""
+        created_rels = 0
+        for rel_type, create_rels_query, prepared_rels in self._create_relationships_batches(
+                relationships, uid_to_internal_id, db_batch_size):
+            try:
+                transaction_start_time = time.perf_counter()
+                with trace_query(self.tracer, "neo4j.create_relationships", create_rels_query,
+                                 {"relationships": prepared_rels}) as trace:
+                    result = session.run(create_rels_query, relationships=prepared_rels)
+                    created = result.single()['created']
+                    trace.record()
+                created_rels += created
+                if stats is not None:
+                    stats.observe_phase("rel_write", time.perf_counter() - transaction_start_time)
+                    stats.count_relationships(rel_type, created)
+            except TransientError as e:
+                logger.error(f"Transient error during relationship creation batch: {e}")
 
         return created_rels
 
     def _deduplicate_nodes(self, grouped_nodes: dict[tuple[str], list[dict]]):
+        with self._dedup_lock:
+            return self._deduplicate_nodes_locked(grouped_nodes)
+
+    def _deduplicate_nodes_locked(self, grouped_nodes: dict[tuple[str], list[dict]]):
+        claimed_nodes = {}
         for label_tuple, nodes in grouped_nodes.items():
             # Check if any of the labels in this tuple should be deduplicated
             if not any(lbl in self.model_config.deduplicated_object_types for lbl in label_tuple):
@@ -146,18 +206,34 @@ class JsonToNeo4jImporter(BaseNeo4JClient):
                     # This node already exists (deduplicate)
                     existing_uid = self.deduplicated_nodes[hash_value]
                     self.deduplicated_to_existing_uid_map[node["uid"]] = existing_uid
+                    if existing_uid in self._unclaimed_nodes:
+                        self._claim_node(claimed_nodes, existing_uid)
                 else:
                     node["hash"] = hash_value
                     # First time we see this node -> keep it
                     self.deduplicated_nodes[hash_value] = node["uid"]
+                    self._pending_uids.add(node["uid"])
                     filtered_nodes.append(node)
 
             # Replace node list with deduplicated version
             grouped_nodes[label_tuple] = filtered_nodes
+        for label_tuple, nodes in claimed_nodes.items():
+            grouped_nodes.setdefault(label_tuple, []).extend(nodes)
         return grouped_nodes
 
+    def _claim_node(self, claimed_nodes: Dict[Tuple[str], List[Dict]], uid: int):
+        """Take over the creation of an unclaimed deduplicated node, it keeps its uid. Needs the `_dedup_lock`."""
+        label_tuple, node = self._unclaimed_nodes.pop(uid)
+        self._pending_uids.add(uid)
+        claimed_nodes.setdefault(label_tuple, []).append(node)
+
     def _deduplicate_rels(self, relationships: dict[tuple[str], list[dict]]):
+        with self._dedup_lock:
+            return self._deduplicate_rels_locked(relationships)
+
+    def _deduplicate_rels_locked(self, relationships: dict[tuple[str], list[dict]]):
         # --- 🔧 Rewrite relationships to use deduplicated UIDs ---
+        added_hashes = []
         for rel_types, rel_list in relationships.items():
             updated_rels = []
             for rel in rel_list:
@@ -170,48 +246,161 @@ class JsonToNeo4jImporter(BaseNeo4JClient):
 
                 if hash_value not in self.deduplicated_rels:
                     self.deduplicated_rels.add(hash_value)
+                    added_hashes.append(hash_value)
                     updated_rels.append(rel)
 
             # Replace with deduplicated and updated relationships
             rel_list[:] = updated_rels
 
+        active = self._active_transaction.get()
+        if active is not None and added_hashes:
+            # Relationships of a rolled back transaction do not exist and have to be created again
+            active.on_rollback.append(lambda: self._forget_relationship_hashes(added_hashes))
         return relationships
 
-    def _upload_nodes_and_relationships(self, nodes: List[Dict], relationships: Dict[str, List],
-                                        stats: UploadStats = None,
-                                        exist_uid_to_internal_id: Optional[Dict[int, int]] = None,
-                                        db_batch_size: int = 1000) -> UploadStats:
-        """Upload nodes and relationships to Neo4j in a single transaction."""
-        if stats is None:
-            stats = UploadStats()
+    def _forget_relationship_hashes(self, hashes: List[str]):
+        with self._dedup_lock:
+            self.deduplicated_rels.difference_update(hashes)
+
+    def _uid_mapping(self) -> Mapping[int, str]:
+        """Return the internal ids of the created nodes, including the ones of the active transaction."""
+        active = self._active_transaction.get()
+        if active is None:
+            return self.uid_to_internal_id
+        return ChainMap(active.uid_to_internal_id, self.uid_to_internal_id)
+
+    def _release_pending_nodes(self, grouped_nodes: Dict[Tuple[str], List[Dict]],
+                               uid_to_internal_id: Optional[Dict[int, int]]):
+        """
+        Publish the created nodes of an upload to the uploads waiting for them.
+
+        If the nodes were not created (`uid_to_internal_id` is None), the deduplicated nodes kept by the upload become
+        unclaimed: other uploads may already be mapped to them, so the next upload which needs one of them creates
+        it, see `_wait_for_pending_nodes`. Nodes created in a transaction are only published after its commit, when
+        the other uploads can see them, and become unclaimed if it is rolled back.
+        """
+        active = self._active_transaction.get()
+        if active is not None and uid_to_internal_id is not None:
+            active.uid_to_internal_id.update(uid_to_internal_id)
+            active.on_commit.append(lambda: self._release_pending_nodes(grouped_nodes, uid_to_internal_id))
+            active.on_rollback.append(lambda: self._release_pending_nodes(grouped_nodes, None))
+            return
+        kept_nodes = [(label_tuple, node) for label_tuple, nodes in grouped_nodes.items() for node in nodes
+                      if "hash" in node]
+        with self._dedup_lock:
+            if uid_to_internal_id is not None:
+                self.uid_to_internal_id.update(uid_to_internal_id)
+            else:
+                for label_tuple, node in kept_nodes:
+                    self._unclaimed_nodes[node["uid"]] = (label_tuple, node)
+            self._pending_uids.difference_update(node["uid"] for _, node in kept_nodes)
+            self._dedup_lock.notify_all()
+
+    def _wait_for_pending_nodes(self, relationships: Dict[str, List]) -> Dict[Tuple[str], List[Dict]]:
+        """
+        Wait until the deduplicated nodes the relationships point to are created by the other uploads.
 
+        Nodes whose upload failed are claimed by this upload and have to be created and released by it
+        (see `_release_pending_nodes`) before the relationships are created.
+
+        Returns:
+            The claimed nodes grouped by their labels.
+
+        Raises:
+            TimeoutError: if the other uploads did not create the nodes within `dedup_wait_timeout` seconds.
+        """
+        active = self._active_transaction.get()
+        created_in_transaction = active.uid_to_internal_id if active is not None else {}
+        claimed_nodes = {}
+        with self._dedup_lock:
+            if not self._pending_uids and not self._unclaimed_nodes:
+                return claimed_nodes
+            waiting = {uid for rels in relationships.values() for rel in rels
+                       for uid in (rel["from_uid"], rel["to_uid"])
+                       if (uid in self._pending_uids or uid in self._unclaimed_nodes)
+                       and uid not in created_in_transaction}
+            if waiting and not self._dedup_lock.wait_for(lambda: not waiting & self._pending_uids,
+                                                         self.dedup_wait_timeout):
+                raise TimeoutError(f"Timed out waiting for {len(waiting & self._pending_uids)} deduplicated nodes "
+                                   f"created by other uploads")
+            for uid in waiting & self._unclaimed_nodes.keys():
+                self._claim_node(claimed_nodes, uid)
+        return claimed_nodes
+
+    def _create_claimed_nodes(self, session: Session, claimed_nodes: Dict[Tuple[str], List[Dict]],
+                              stats: UploadStats):
+        """Create the nodes claimed by `_wait_for_pending_nodes` and release them."""
+        node_start_time = time.time()
+        created_uid_to_internal_id = None
+        try:
+            created_uid_to_internal_id = self._create_nodes(session, claimed_nodes)
+        finally:
+            self._release_pending_nodes(claimed_nodes, created_uid_to_internal_id)
+        self._record_created_nodes(stats, claimed_nodes, time.time() - node_start_time)
+
+    def _prepare_upload(self, nodes: List[Dict], relationships: Dict[str, List], stats: UploadStats) \
+            -> Tuple[Dict[Tuple[str], List[Dict]], Dict[str, List]]:
+        """Group the nodes by their labels and deduplicate the nodes and relationships of an upload."""
         # Group nodes and filter relationships for this batch
         grouped_nodes = self._group_nodes_by_label(nodes)
 
         # --- 🔧 Deduplication steps ---
         # TODO: the deduplication data should be saved late in a DB
         # TODO: Consider the deduplication while CRUD operations on AAS Server
-        grouped_nodes = self._deduplicate_nodes(grouped_nodes)
-        relationships = self._deduplicate_rels(relationships)
+        nodes_before = sum(len(group) for group in grouped_nodes.values())
+        relationships_before = sum(len(rels) for rels in relationships.values())
+        with stats.time_phase("dedup"):
+            grouped_nodes = self._deduplicate_nodes(grouped_nodes)
+            relationships = self._deduplicate_rels(relationships)
+        stats.dedup_nodes_seen += nodes_before
+        stats.dedup_nodes_removed += nodes_before - sum(len(group) for group in grouped_nodes.values())
+        stats.dedup_relationships_seen += relationships_before
+        stats.dedup_relationships_removed += relationships_before - sum(len(rels) for rels in relationships.values())
+        return grouped_nodes, relationships
+
+    @staticmethod
+    def _record_created_nodes(stats: UploadStats, grouped_nodes: Dict[Tuple[str], List[Dict]],
+                              node_creation_time: float):
+        stats.total_node_creation_time += node_creation_time
+        stats.observe_phase("node_write", node_creation_time)
+        node_count = sum(len(nodes) for nodes in grouped_nodes.values())
+        stats.total_nodes_created += node_count
+        for labels, label_nodes in grouped_nodes.items():
+            stats.count_nodes(labels, len(label_nodes))
+        logger.info(f"Created {node_count} nodes in {node_creation_time:.2f} seconds")
+
+    @traced()
+    def _upload_nodes_and_relationships(self, nodes: List[Dict], relationships: Dict[str, List],
+                                        stats: UploadStats = None,
+                                        exist_uid_to_internal_id: Optional[Dict[int, int]] = None,
+                                        db_batch_size: int = 1000) -> UploadStats:
+        """Upload nodes and relationships to Neo4j in a single transaction."""
+        if stats is None:
+            stats = UploadStats()
+        grouped_nodes, relationships = self._prepare_upload(nodes, relationships, stats)
 
         # --- Continue with database operations ---
-        with self.driver.session() as session:
+        with self._session() as session:
             # 1. Create Nodes in Batches
             node_start_time = time.time()
-            self.uid_to_internal_id.update(self._create_nodes(session, grouped_nodes))
-            if exist_uid_to_internal_id:
-                # Merge existing UID to internal ID mapping with newly created nodes
-                self.uid_to_internal_id.update(exist_uid_to_internal_id)
+            created_uid_to_internal_id = None
+            try:
+                created_uid_to_internal_id = self._create_nodes(session, grouped_nodes)
+                if exist_uid_to_internal_id:
+                    # Merge existing UID to internal ID mapping with newly created nodes
+                    created_uid_to_internal_id.update(exist_uid_to_internal_id)
+            finally:
+                self._release_pending_nodes(grouped_nodes, created_uid_to_internal_id)
 
-            node_creation_time = time.time() - node_start_time
-            stats.total_node_creation_time += node_creation_time
-            node_count = sum(len(nodes) for nodes in grouped_nodes.values())
-            stats.total_nodes_created += node_count
-            logger.info(f"Created {node_count} nodes in {node_creation_time:.2f} seconds")
+            self._record_created_nodes(stats, grouped_nodes, time.time() - node_start_time)
 
             # 2. Create Relationships in Batches
+            claimed_nodes = self._wait_for_pending_nodes(relationships)
+            if claimed_nodes:
+                self._create_claimed_nodes(session, claimed_nodes, stats)
             rel_start_time = time.time()
-            relationship_count = self._create_relationships(session, relationships, self.uid_to_internal_id, db_batch_size)
+            relationship_count = self._create_relationships(session, relationships, self._uid_mapping(),
+                                                            db_batch_size, stats)
             relationship_creation_time = time.time() - rel_start_time
             stats.total_relationship_creation_time += relationship_creation_time
             stats.total_relationships_created += relationship_count
@@ -223,6 +412,7 @@ class JsonToNeo4jImporter(BaseNeo4JClient):
         # del grouped_nodes, uid_to_internal_id
         del grouped_nodes
 
+        stats.record_batch_peak_rss()
         return stats
 
     def _cleanup_uids_in_session(self, session: Session, internal_ids: List[int], batch_size: int):
@@ -244,6 +434,15 @@ class JsonToNeo4jImporter(BaseNeo4JClient):
     def identify_labels(obj: Dict):
         return ("Unknown",)
 
+    def _add_shadow_properties(self, obj: Dict, node_labels: Tuple[str], node_properties: Dict[str, Any]):
+        """
+        Add properties derived from the object to its node, e.g. to make them indexable.
+
+        This method can be overloaded in child classes. Added properties should be listed in
+        `model_config.shadow_properties`, so they are not exported.
+        """
+        pass
+
     def _process_dict(self, obj: Dict, node_properties: Optional[Dict[str, any]] = None) \
             -> Tuple[List[Dict], Dict[str, List]]:
         nodes = []
@@ -260,6 +459,7 @@ class JsonToNeo4jImporter(BaseNeo4JClient):
         # unpack the DICTS_TO_PROPERTY_LISTS
         list_of_dicts_prop_as_multiple_list_props = self.get_props_to_model_as_multiple_lists(node_labels)
         dict_prop_as_multiple_props = self.get_complex_props_to_model_as_multiple_simple_props(node_labels)
+        lang_string_props_per_language = self.get_lang_string_props_to_model_per_language(node_labels)
 
         for key, value in obj.items():
             if key in self.model_config.keys_to_ignore:
@@ -271,6 +471,11 @@ class JsonToNeo4jImporter(BaseNeo4JClient):
                 if value:
                     for dict_key in value[0].keys():
                         node_properties[f"{key}_{dict_key}"] = [dict_[dict_key] for dict_ in value]
+                if key in lang_string_props_per_language:
+                    # ADDITIONALLY: value_text__en = "...", value_text__de = "..."
+                    for lang_string in value or ():
+                        node_properties.setdefault(
+                            f"{key}_text{LANGUAGE_PROP_SEPARATOR}{lang_string['language']}", lang_string['text'])
             elif key in dict_prop_as_multiple_props:
                 if value:
                     child_nodes, child_rels = self._process_dict(value)
@@ -325,6 +530,7 @@ class JsonToNeo4jImporter(BaseNeo4JClient):
             else:
                 node_properties[key] = value
 
+        self._add_shadow_properties(obj, node_labels, node_properties)
         nodes.append(node_properties)
         return nodes, relationships
 
@@ -337,57 +543,124 @@ class JsonToNeo4jImporter(BaseNeo4JClient):
         """
         return self._process_dict(json_data)
 
-    def _process_json_file(self, file_path: str) -> Tuple[List[Dict], Dict[str, List]]:
-        """Process a single JSON file and return nodes and relationships."""
+    def _split_json_data(self, json_data: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """
+        Split JSON data into parts which can be processed and uploaded independently.
+
+        This method can be overloaded in child classes, e.g. to split AAS Environments into their Identifiables.
+        """
+        yield json_data
+
+    def _read_json_file(self, file_path: str, stats: UploadStats) -> Dict[str, Any]:
         with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+            raw = f.read()
+        stats.total_bytes_read += len(raw.encode('utf-8'))
+        with stats.time_phase("parse"):
+            return json.loads(raw)
+
+    def _process_json_file(self, file_path: str, stats: Optional[UploadStats] = None) \
+            -> Tuple[List[Dict], Dict[str, List]]:
+        """Process a single JSON file and return nodes and relationships."""
+        stats = stats or UploadStats()
+        data = self._read_json_file(file_path, stats)
+        with stats.time_phase("flatten"):
             nodes, relationships = self._process_json_data(data)
         return nodes, relationships
 
-    def _process_json_files_batch(self, directory: str, files_batch: List[str]) -> Tuple[List[Dict], Dict[str, List]]:
-        """Process a batch of JSON files and return nodes and relationships."""
+    def _process_json_files_batch(self, directory: str, files_batch: List[str],
+                                  stats: Optional[UploadStats] = None, planner: Optional[BatchPlanner] = None) \
+            -> Tuple[List[Dict], Dict[str, List]]:
+        """Process a batch of JSON files and return nodes and relationships, calibrating the planner if given."""
         batch_nodes = []
         batch_relationships = {}
         for filename in files_batch:
-            nodes, relationships = self._process_json_file(join(directory, filename))
+            file_path = join(directory, filename)
+            nodes, relationships = self._process_json_file(file_path, stats)
+            if planner is not None:
+                planner.observe(os.path.getsize(file_path), len(nodes))
             batch_nodes.extend(nodes)
             self._merge_relationships(batch_relationships, relationships)
         return batch_nodes, batch_relationships
 
+    def _upload_json_file_in_sub_batches(self, file_path: str, planner: BatchPlanner, stats: UploadStats,
+                                         db_batch_size: int):
+        """
+        Upload a file exceeding the batch budget in sub-batches of the parts returned by `_split_json_data`.
+
+        The parsed JSON is kept in memory, but the flattened nodes are uploaded whenever a sub-batch reaches
+        `planner.max_sub_batch_nodes`. The time of reading and processing, without the uploads, is added to
+        `stats.total_processing_time`.
+        """
+        processing_start_time = time.time()
+        data = self._read_json_file(file_path, stats)
+        processing_time = time.time() - processing_start_time
+        nodes, relationships = [], {}
+        total_nodes = 0
+        for part in self._split_json_data(data):
+            part_start_time = time.time()
+            with stats.time_phase("flatten"):
+                part_nodes, part_relationships = self._process_json_data(part)
+            nodes.extend(part_nodes)
+            self._merge_relationships(relationships, part_relationships)
+            processing_time += time.time() - part_start_time
+            if len(nodes) >= planner.max_sub_batch_nodes:
+                total_nodes += len(nodes)
+                self._upload_nodes_and_relationships(nodes, relationships, stats, db_batch_size=db_batch_size)
+                nodes, relationships = [], {}
+        if nodes:
+            total_nodes += len(nodes)
+            self._upload_nodes_and_relationships(nodes, relationships, stats, db_batch_size=db_batch_size)
+        planner.observe(os.path.getsize(file_path), total_nodes)
+        stats.total_processing_time += processing_time
+        logger.info(f"Processed {file_path} in {processing_time:.2f} seconds")
+
+    @traced()
     def upload_all_json_from_dir(self, directory: str, file_batch_size: int = 50,
-                                 db_batch_size: int = 10000, max_num_of_batches=10000) -> UploadStats:
-        """Upload JSON files from directory into Neo4j using batch processing."""
+                                 db_batch_size: int = 10000, max_num_of_batches=10000,
+                                 batch_planner: Optional[BatchPlanner] = None) -> UploadStats:
+        """
+        Upload JSON files from directory into Neo4j using batch processing.
+
+        Files are packed into batches by the `batch_planner` under its node and memory budget, with at most
+        `file_batch_size` files per batch by default. Files exceeding the budget are uploaded in sub-batches.
+        """
         stats = UploadStats()
+        planner = batch_planner or BatchPlanner(max_batch_files=file_batch_size)
         json_files = [f for f in os.listdir(directory) if isfile(join(directory, f)) and f.endswith('.json')]
         stats.total_files = len(json_files)
-        stats.total_batches = (stats.total_files + file_batch_size - 1) // file_batch_size
 
         logger.info(f"Found {stats.total_files} JSON files in directory '{directory}'")
-        logger.info(f"File batch size: {stats.total_batches} batches of {file_batch_size} files each")
+        logger.info(f"Batch budget: {planner.max_batch_nodes} nodes, {planner.max_batch_memory // MiB} MiB, "
+                    f"{planner.max_batch_files} files")
         logger.info(f"Database transaction batch size: {db_batch_size}")
 
         # Process files in batches
-        for batch_num in range(stats.total_batches):
-            start_idx = batch_num * file_batch_size
-            end_idx = min(start_idx + file_batch_size, stats.total_files)
-            current_file_batch = json_files[start_idx:end_idx]
+        files_with_sizes = ((f, os.path.getsize(join(directory, f))) for f in json_files)
+        for batch_num, batch in enumerate(planner.plan(files_with_sizes)):
+            stats.total_batches += 1
+            logger.info(f"\n--- Processing Batch {batch_num + 1} ---")
+            logger.info(f"{len(batch.files)} files, estimated {batch.estimated_nodes} nodes and "
+                        f"{batch.estimated_memory // MiB} MiB")
 
-            logger.info(f"\n--- Processing Batch {batch_num + 1}/{stats.total_batches} ---")
-            logger.info(f"Files {start_idx + 1}-{end_idx} of {stats.total_files}")
-
-            # Process current batch
             batch_start_time = time.time()
-            batch_nodes, batch_relationships = self._process_json_files_batch(directory, current_file_batch)
+            if batch.split:
+                logger.info(f"File {batch.files[0]} exceeds the batch budget, uploading it in sub-batches")
+                self._upload_json_file_in_sub_batches(join(directory, batch.files[0]), planner, stats, db_batch_size)
+            else:
+                # Process current batch
+                batch_nodes, batch_relationships = self._process_json_files_batch(directory, batch.files, stats,
+                                                                                  planner)
 
-            processing_time = time.time() - batch_start_time
-            stats.total_processing_time += processing_time
-            logger.info(f"Processed {len(current_file_batch)} files in {processing_time:.2f} seconds")
+                processing_time = time.time() - batch_start_time
+                stats.total_processing_time += processing_time
+                logger.info(f"Processed {len(batch.files)} files in {processing_time:.2f} seconds")
 
-            if not batch_nodes:
-                logger.info("No nodes to create in this batch, skipping...")
-                continue
+                if not batch_nodes:
+                    logger.info("No nodes to create in this batch, skipping...")
+                    continue
 
-            self._upload_nodes_and_relationships(batch_nodes, batch_relationships, stats, db_batch_size=db_batch_size)
+                self._upload_nodes_and_relationships(batch_nodes, batch_relationships, stats,
+                                                     db_batch_size=db_batch_size)
 
             batch_total_time = time.time() - batch_start_time
             logger.info(f"Batch {batch_num + 1} completed in {batch_total_time:.2f} seconds")
@@ -399,12 +672,19 @@ class JsonToNeo4jImporter(BaseNeo4JClient):
         stats.finish()
         return stats
 
-    def upload_json_file(self, file_path: str, db_batch_size: int = 1000):
-        nodes, relationships = self._process_json_file(file_path)
-        stats = self._upload_nodes_and_relationships(nodes, relationships, db_batch_size=db_batch_size)
+    @traced()
+    def upload_json_file(self, file_path: str, db_batch_size: int = 1000) -> UploadStats:
+        stats = UploadStats(total_files=1)
+        nodes, relationships = self._process_json_file(file_path, stats)
+        self._upload_nodes_and_relationships(nodes, relationships, stats, db_batch_size=db_batch_size)
         stats.finish()
+        return stats
 
-    def upload_json(self, json_data: Dict[str, Any], db_batch_size: int = 1000):
-        nodes, relationships = self._process_json_data(json_data)
-        stats = self._upload_nodes_and_relationships(nodes, relationships, db_batch_size=db_batch_size)
+    @traced()
+    def upload_json(self, json_data: Dict[str, Any], db_batch_size: int = 1000) -> UploadStats:
+        stats = UploadStats()
+        with stats.time_phase("flatten"):
+            nodes, relationships = self._process_json_data(json_data)
+        self._upload_nodes_and_relationships(nodes, relationships, stats, db_batch_size=db_batch_size)
         stats.finish()
+        return stats
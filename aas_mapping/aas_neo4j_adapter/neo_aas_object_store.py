@@ -1,5 +1,5 @@
 import json
-from typing import Generic, Iterator, Iterable
+from typing import AsyncIterator, Dict, Generic, Iterator, Iterable
 
 from basyx.aas.adapter.json import AASToJsonEncoder, StrictAASFromJsonDecoder
 from basyx.aas.model import AbstractObjectStore, Identifiable, Identifier
@@ -7,6 +7,15 @@ from basyx.aas.model import AbstractObjectStore, Identifiable, Identifier
 from basyx.aas.model.provider import _IT
 
 from aas_mapping.aas_neo4j_adapter.aas_neo4j_client import AASNeo4JClient
+from aas_mapping.aas_neo4j_adapter.async_aas_neo4j_client import AsyncAASNeo4JClient
+
+
+def _to_data_dict(x: Identifiable) -> Dict:
+    return json.loads(json.dumps(obj=x, cls=AASToJsonEncoder))
+
+
+def _from_data_dict(data: Dict) -> Identifiable:
+    return json.loads(json.dumps(data), cls=StrictAASFromJsonDecoder)
 
 
 class Neo4jObjectStore(AbstractObjectStore[_IT], Generic[_IT]):
@@ -22,17 +31,14 @@ class Neo4jObjectStore(AbstractObjectStore[_IT], Generic[_IT]):
     def add(self, x: _IT) -> None:
         if self._client.identifiable_exists(x.id):
             raise KeyError(f"Identifiable object with same id {x.id} is already stored in this store")
-        data = json.dumps(obj=x, cls=AASToJsonEncoder)
-        data_dict = json.loads(data)
-        self._client.add_identifiable(data_dict)
+        self._client.add_identifiable(_to_data_dict(x))
 
     def get_identifiable(self, identifier: Identifier) -> _IT:
         try:
             data = self._client.get_identifiable(identifier)
         except KeyError as e:
             raise KeyError(identifier)
-        obj = json.loads(json.dumps(data), cls=StrictAASFromJsonDecoder)
-        return obj
+        return _from_data_dict(data)
 
     def discard(self, x: _IT) -> None:
         self._client.remove_identifiable(x.id)
@@ -59,9 +65,65 @@ class Neo4jObjectStore(AbstractObjectStore[_IT], Generic[_IT]):
 
     def __iter__(self) -> Iterator[_IT]:
         """
-        Iterates over all Identifiable objects in the Neo4j store.
+        Iterates over all Identifiable objects in the Neo4j store in constant memory.
+        """
+        for data in self._client.iter_identifiables():
+            yield _from_data_dict(data)
+
+
+class AsyncNeo4jObjectStore(Generic[_IT]):
+    """
+    Asynchronous variant of the Neo4jObjectStore, which uses an AsyncAASNeo4JClient.
+
+    The methods of the object store are coroutines. `len()`, `in` and `iter()` cannot be awaited, they are replaced
+    by `count()`, `contains()` and async iteration. The objects are encoded and decoded in the executor of the client.
+    """
+    def __init__(self, client: AsyncAASNeo4JClient, prefetch: int = 8) -> None:
+        """
+        Args:
+            client: the client of the Neo4j database
+            prefetch: the number of Identifiables fetched ahead of the consumer while iterating
+        """
+        self._client: AsyncAASNeo4JClient = client
+        self.prefetch = prefetch
+
+    async def add(self, x: _IT) -> None:
+        if await self._client.identifiable_exists(x.id):
+            raise KeyError(f"Identifiable object with same id {x.id} is already stored in this store")
+        await self._client.add_identifiable(await self._client.offload(_to_data_dict, x))
+
+    async def get_identifiable(self, identifier: Identifier) -> _IT:
+        try:
+            data = await self._client.get_identifiable(identifier)
+        except KeyError as e:
+            raise KeyError(identifier)
+        return await self._client.offload(_from_data_dict, data)
+
+    async def discard(self, x: _IT) -> None:
+        await self._client.remove_identifiable(x.id)
+
+    async def remove(self, x: _IT) -> None:
+        if not await self._client.identifiable_exists(x.id):
+            raise KeyError(f"Identifiable object with id {x.id} not found in Neo4j store")
+
+        result = await self._client.remove_identifiable(x.id)
+        if not result or result[0]["deletedNodes"] == 0:
+            raise KeyError(f"The Identifiable could not be removed: {x.id}")
+
+    async def contains(self, x: object) -> bool:
+        if isinstance(x, Identifier):
+            return await self._client.identifiable_exists(x)
+        elif isinstance(x, Identifiable):
+            # Like Neo4jObjectStore, only Identifiables with the same ID are checked
+            return await self._client.identifiable_exists(x.id)
+        return False
+
+    async def count(self) -> int:
+        return await self._client.count_identifiables()
+
+    async def __aiter__(self) -> AsyncIterator[_IT]:
+        """
+        Iterates over all Identifiable objects in the Neo4j store, fetching `prefetch` objects ahead.
         """
-        clause = "MATCH (r:Identifiable) RETURN r.id AS id"
-        result = self._client.execute_clause(clause)
-        for record in result:
-            yield self.get_identifiable(record["id"])
+        async for data in self._client.iter_identifiables(self.prefetch):
+            yield await self._client.offload(_from_data_dict, data)
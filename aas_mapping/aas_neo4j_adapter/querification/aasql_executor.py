@@ -0,0 +1,318 @@
+import base64
+import json
+import logging
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Hashable, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple, Union
+
+import neo4j
+
+from aas_mapping.aas_neo4j_adapter.base import BaseNeo4JClient
+from aas_mapping.aas_neo4j_adapter.tracing import traced
+from aas_mapping.aas_neo4j_adapter.querification.aasql_to_ast import parse_aasql_query
+from aas_mapping.aas_neo4j_adapter.querification.aasql_to_cypher import compile_aasql_query, compile_aasql_queries
+from aas_mapping.aas_neo4j_adapter.querification.index_advisor import IndexAdvisor, IndexRecommendation, \
+    unused_indexes
+from aas_mapping.aas_neo4j_adapter.querification.query_profiler import QueryProfiler
+from aas_mapping.aas_neo4j_adapter.querification.query_cost import QueryCost, QueryCostPolicy, estimate_cost, \
+    add_cypher_cost
+from aas_mapping.aas_neo4j_adapter.querification.query_cache import QueryResultCache, CACHE_VERSION_LABEL, \
+    IDENTIFIABLE_LABELS, query_dependencies
+
+logger = logging.getLogger(__name__)
+
+AASQLQuery = Union[dict, str]
+
+
+@dataclass
+class QueryResultPage:
+    """
+    One page of AASQL query results.
+
+    Attributes:
+        result (List): The results of the page.
+        cursor (Optional[str]): Opaque cursor to request the next page, None if this is the last page.
+    """
+    result: List[Any] = field(default_factory=list)
+    cursor: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the page in the structure of a paged result of the AAS API."""
+        paging_metadata = {"cursor": self.cursor} if self.cursor is not None else {}
+        return {"paging_metadata": paging_metadata, "result": self.result}
+
+
+def encode_cursor(order_key: str) -> str:
+    """Encode the order key of the last result of a page to an opaque cursor."""
+    return base64.urlsafe_b64encode(order_key.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> str:
+    """Decode an opaque cursor back to the order key of the last result of the previous page."""
+    try:
+        return base64.urlsafe_b64decode(cursor.encode()).decode()
+    except ValueError as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+class AASQLExecutor(BaseNeo4JClient):
+    """Execute AASQL queries against the Neo4j database."""
+    # Cache of query results, see `enable_query_cache`
+    query_cache: Optional[QueryResultCache] = None
+    # Guardrails applied to queries depending on their estimated cost, no guardrails if None
+    query_cost_policy: Optional[QueryCostPolicy] = None
+    # Number of version nodes per Identifiable label, concurrent writes bump different ones, see `bump_cache_versions`
+    cache_version_shards: int = 16
+    # Statistics of the executed queries, see `enable_query_profiler`
+    query_profiler: Optional[QueryProfiler] = None
+
+    def enable_query_profiler(self, sample_rate: float = 0.1) -> QueryProfiler:
+        """
+        Collect statistics of all executed AASQL queries per query shape, `sample_rate` of them are run with PROFILE.
+
+        Use `query_profiler.top_shapes()` or `query_profiler.dump()` to find the costliest query shapes.
+        """
+        self.query_profiler = QueryProfiler(sample_rate)
+        return self.query_profiler
+
+    def index_advisor(self, queries: Iterable[AASQLQuery] = ()) -> IndexAdvisor:
+        """
+        Return an IndexAdvisor for the workload of the queries and of the shapes recorded by the query profiler.
+
+        Indexes created by `optimize_database` are known to the advisor and not recommended again.
+        """
+        advisor = IndexAdvisor([*self.model_config.default_optimization_clauses,
+                                *self.get_per_language_index_clauses()])
+        for query in queries:
+            advisor.observe(compile_aasql_query(query, per_language=self._lang_strings_per_language)[0])
+        if self.query_profiler is not None:
+            advisor.observe_profiler(self.query_profiler)
+        return advisor
+
+    def apply_index_recommendations(self, recommendations: Iterable[IndexRecommendation]):
+        """Create the recommended indexes together with the default ones."""
+        self.optimize_database(extra_clauses=[recommendation.clause for recommendation in recommendations])
+
+    def find_unused_indexes(self) -> List[Dict[str, Any]]:
+        """Return the indexes of the database which were never read since the server started."""
+        rows = self.execute_clause(
+            "SHOW INDEXES YIELD name, type, labelsOrTypes, properties, readCount, trackedSince, owningConstraint")
+        return unused_indexes(rows)
+
+    def _run_query(self, cypher: str, parameters: Dict[str, Any], fetch_size: int,
+                   timeout: Optional[float] = None) -> Iterator[neo4j.Record]:
+        """Execute a compiled query and yield its records, recording its statistics if a profiler is enabled."""
+        profiler = self.query_profiler
+        if profiler is None:
+            yield from self.stream_clause(self._with_timeout(cypher, timeout), parameters, fetch_size=fetch_size)
+            return
+        clause = f"PROFILE {cypher}" if profiler.sample() else cypher
+        rows = 0
+        summaries = []
+        start = time.perf_counter()
+        # Runs in a transaction like every streamed clause, so a consumer which stops early does not pull the rest
+        records = self.stream_clause(self._with_timeout(clause, timeout), parameters, fetch_size, summaries.append)
+        try:
+            for record in records:
+                rows += 1
+                yield record
+        finally:
+            records.close()
+            # The summary, and so the profile, is only known if all records were consumed
+            profiler.record(cypher, (time.perf_counter() - start) * 1000, rows, summaries[0] if summaries else None)
+
+    def estimate_aasql_query_cost(self, query: AASQLQuery) -> QueryCost:
+        """Estimate the cost of an AASQL query without executing it, see `query_cost.estimate_cost`."""
+        cypher, _ = compile_aasql_query(query, per_language=self._lang_strings_per_language)
+        return estimate_cost(parse_aasql_query(json.loads(query) if isinstance(query, str) else query), cypher)
+
+    def _guard(self, queries: Sequence[AASQLQuery], cypher: str) -> Tuple[Optional[int], Optional[float]]:
+        """
+        Apply the query cost policy to the queries compiled to `cypher`.
+
+        Returns:
+            (limit, timeout): the forced limit of results and the transaction timeout, None if not applicable.
+        Raises:
+            QueryRejectedError: if the queries are too expensive.
+        """
+        if self.query_cost_policy is None:
+            return None, None
+        cost = QueryCost()
+        for query in queries:
+            query_cost = estimate_cost(parse_aasql_query(json.loads(query) if isinstance(query, str) else query))
+            cost.score += query_cost.score
+            cost.reasons += query_cost.reasons
+        add_cypher_cost(cost, cypher)
+        return self.query_cost_policy.apply(cost)
+
+    @staticmethod
+    def _with_timeout(cypher: str, timeout: Optional[float]) -> Union[str, neo4j.Query]:
+        """Return the clause to run, with a transaction timeout enforced by the server if given."""
+        return neo4j.Query(cypher, timeout=timeout) if timeout is not None else cypher
+
+    @property
+    def _lang_strings_per_language(self) -> bool:
+        """True if LangString texts are also saved per language, so queries can compare them directly."""
+        return bool(self.model_config.lang_string_props_per_language)
+
+    @traced()
+    def iter_aasql_query(self, query: AASQLQuery, fetch_size: Optional[int] = None) -> Iterator[Any]:
+        """
+        Execute an AASQL query and yield its results lazily.
+
+        Records are fetched from the database in batches of `fetch_size`, so the results are never
+        held in memory all at once. Results are the matched nodes, or the ids of the matching Identifiables
+        if the query has `"$select": "id"`.
+
+        Raises:
+            QueryRejectedError: if the query is rejected by the `query_cost_policy`.
+        """
+        cypher, parameters = compile_aasql_query(query, per_language=self._lang_strings_per_language)
+        forced_limit, timeout = self._guard([query], cypher)
+        if forced_limit is not None:
+            cypher += f"\nLIMIT {forced_limit}"
+        for record in self._run_query(cypher, parameters, fetch_size or self.default_fetch_size, timeout):
+            yield record[0]
+
+    @traced()
+    def execute_aasql_query(self, query: AASQLQuery, limit: int = 100, cursor: Optional[str] = None,
+                            fetch_size: Optional[int] = None) -> QueryResultPage:
+        """
+        Execute an AASQL query and return one page of its results.
+
+        Pages are built with keyset pagination: results are ordered by a stable order key, and the next page
+        starts after the order key encoded in the `cursor` of the previous page, so no results have to be skipped
+        on the server. One result more than `limit` is fetched to decide if there is a next page.
+
+        The `query_cost_policy` may reduce the `limit` of expensive queries.
+
+        Raises:
+            QueryRejectedError: if the query is rejected by the `query_cost_policy`.
+        """
+        if limit < 1:
+            raise ValueError(f"Limit must be positive, got {limit}")
+        cypher, parameters = compile_aasql_query(query, paginate=True, per_language=self._lang_strings_per_language)
+        forced_limit, timeout = self._guard([query], cypher)
+        if forced_limit is not None:
+            limit = min(limit, forced_limit)
+        parameters["cursor"] = decode_cursor(cursor) if cursor else None
+        parameters["limit"] = limit + 1
+
+        page = self._cached(cypher, parameters,
+                            lambda: self._fetch_page(cypher, parameters, limit, fetch_size, timeout))
+        return QueryResultPage(list(page.result), page.cursor)
+
+    def _fetch_page(self, cypher: str, parameters: Dict[str, Any], limit: int,
+                    fetch_size: Optional[int], timeout: Optional[float]) -> QueryResultPage:
+        page = QueryResultPage()
+        last_order_key = None
+        fetch_size = fetch_size or min(limit + 1, self.default_fetch_size)
+        for record in self._run_query(cypher, parameters, fetch_size, timeout):
+            if len(page.result) == limit:
+                page.cursor = encode_cursor(last_order_key)
+                break
+            page.result.append(record["result"])
+            last_order_key = record["cursor"]
+        return page
+
+    @traced()
+    def evaluate_aasql_queries(self, queries: Union[Mapping[Hashable, AASQLQuery], Sequence[AASQLQuery]],
+                               share_match_clauses: bool = False) -> Dict[Hashable, List[Any]]:
+        """
+        Evaluate many AASQL queries in one round-trip and return the results keyed by query.
+
+        `queries` is either a mapping of keys to queries or a sequence of queries, which are then keyed by
+        their index. All queries are combined into one Cypher statement with a `CALL` subquery per query
+        (see `batch_converter`), so they are executed in a single transaction. With `share_match_clauses`
+        queries with identical MATCH clauses expand their patterns only once, queries which only share a prefix
+        of them do not.
+
+        The `query_cost_policy` is applied to the summed cost of all queries, a forced limit does not apply,
+        because the results are aggregated.
+
+        Raises:
+            QueryRejectedError: if the queries are rejected by the `query_cost_policy`.
+        """
+        keys = list(queries.keys()) if isinstance(queries, Mapping) else list(range(len(queries)))
+        if not keys:
+            return {}
+        cypher, parameters = compile_aasql_queries([queries[key] for key in keys], share_match_clauses,
+                                                   per_language=self._lang_strings_per_language)
+        _, timeout = self._guard([queries[key] for key in keys], cypher)
+        record = self._cached(cypher, parameters, lambda: list(
+            self._run_query(cypher, parameters, self.default_fetch_size, timeout))[0])
+        return {key: list(record[f"q{i}"]) for i, key in enumerate(keys)}
+
+    def enable_query_cache(self, max_size: int = 1024, ttl: float = 60.0) -> QueryResultCache:
+        """
+        Serve repeated queries of `execute_aasql_query` and `evaluate_aasql_queries` from an in-memory cache.
+
+        Before a query is answered from the cache, the write versions of the Identifiable labels it depends on
+        are read from the database, which is a single index lookup. Writes bump these versions in their transaction
+        (see `bump_cache_versions`), so cached results are never served after a write of any process committed.
+        """
+        self.query_cache = QueryResultCache(max_size, ttl)
+        return self.query_cache
+
+    def _cached(self, cypher: str, parameters: Dict[str, Any], execute: Callable[[], Any]) -> Any:
+        """Return the result of `execute` for the query from the query cache or execute it and cache its result."""
+        # Results of a transaction may depend on its uncommitted writes
+        if self.query_cache is None or self.in_transaction:
+            return execute()
+        # The versions are read before the query is executed, so a write during the execution invalidates the result
+        versions = self.read_cache_versions(query_dependencies(cypher))
+        key = QueryResultCache.make_key(cypher, parameters)
+        found, result = self.query_cache.get(key, versions)
+        if not found:
+            result = execute()
+            self.query_cache.put(key, result, versions)
+        return result
+
+    def read_cache_versions(self, labels: Iterable[str]) -> Dict[str, int]:
+        """Return the write versions of the labels, labels which were never written have version 0."""
+        versions = {label: 0 for label in labels}
+        if versions:
+            records = self.execute_clause(
+                f"MATCH (v:{CACHE_VERSION_LABEL}) WHERE v.label IN $labels "
+                "RETURN v.label AS label, sum(v.version) AS version",
+                parameters={"labels": list(versions)})
+            versions.update({record["label"]: record["version"] for record in records})
+        return versions
+
+    def bump_cache_versions(self, labels: Iterable[str] = (), identifiable_ids: Iterable[str] = ()):
+        """
+        Increment the write versions of the labels and of the labels of the Identifiables with the given ids.
+
+        Has to be called in the transaction of every write, which may change query results, so readers never see
+        the write with the old versions. Removed Identifiables have to be given by their labels, which have to be
+        read before they are removed.
+
+        The version of a label is the sum of `cache_version_shards` nodes, of which a random one is incremented.
+        The bump locks its node until the transaction commits, so it should be the last clause of the transaction
+        and concurrent writers of the same label only wait for each other if they hit the same shard.
+        """
+        bump = self._bump_cache_versions_clause(labels, identifiable_ids)
+        if bump is not None:
+            self.execute_clause(bump[0], parameters=bump[1])
+
+    def _bump_cache_versions_clause(self, labels: Iterable[str] = (), identifiable_ids: Iterable[str] = ()) \
+            -> Optional[Tuple[str, Dict[str, Any]]]:
+        """Return the clause of `bump_cache_versions` and its parameters, None if there is nothing to bump."""
+        labels = [label for label in labels if label in IDENTIFIABLE_LABELS]
+        identifiable_ids = list(identifiable_ids)
+        if not labels and not identifiable_ids:
+            return None
+        clause = (
+            "CALL { "
+            "  MATCH (i:Identifiable) WHERE i.id IN $identifiable_ids UNWIND labels(i) AS label RETURN label "
+            "  UNION "
+            "  UNWIND $labels AS label RETURN label "
+            "} "
+            "WITH label WHERE label IN $identifiable_labels "
+            f"MERGE (v:{CACHE_VERSION_LABEL} {{label: label, shard: $shard}}) "
+            "SET v.version = coalesce(v.version, 0) + 1"
+        )
+        return clause, {
+            "labels": labels, "identifiable_ids": identifiable_ids, "identifiable_labels": list(IDENTIFIABLE_LABELS),
+            "shard": random.randrange(self.cache_version_shards)}
@@ -1,81 +1,129 @@
+from typing import Any, Dict, Optional, Tuple, Type, Union
+
 from aas_mapping.aas_neo4j_adapter.querification.ast_nodes import *
 
+SELECTABLE_ATTRIBUTES = ("id",)
+
+# Value operators with the AST node and the accepted Python types of their argument
+AASQL_TO_AST_VALUE_NODES_MAP: Dict[str, Tuple[Type[Value], Union[type, Tuple[type, ...]]]] = {
+    "$field": (Field, str),
+    "$strVal": (StringValue, str),
+    "$numVal": (NumberValue, (int, float)),
+    "$boolean": (BooleanValue, bool),
+}
+AASQL_TO_AST_VALUE_NODES_WITH_CAST_MAP: Dict[str, Type[Value]] = {
+    "$strCast": StrCast,
+    "$numCast": NumCast,
+    "$hexCast": HexCast,
+    "$boolCast": BoolCast,
+    "$dateTimeCast": DateTimeCast,
+    "$timeCast": TimeCast,
+}
+AASQL_TO_AST_COMPARISON_OPERATORS_MAP: Dict[str, Type[BinaryExpression]] = {
+    "$eq": Eq,
+    "$ne": Ne,
+    "$gt": Gt,
+    "$ge": Ge,
+    "$lt": Lt,
+    "$le": Le,
+    "$contains": Contains,
+    "$starts-with": StartsWith,
+    "$ends-with": EndsWith,
+    "$regex": Regex,
+}
+AASQL_TO_AST_LOGICAL_OPERATORS_MAP: Dict[str, Type[Expression]] = {
+    "$match": Match,
+    "$and": And,
+    "$or": Or,
+}
+
+
+class AASQLSyntaxError(ValueError):
+    """
+    Raised if an AASQL query does not conform to the grammar.
 
-def parse_aasql_value(data: dict) -> Value:
+    Attributes:
+        path (str): The path to the offending part of the query, e.g. "$condition.$and[1].$eq[0]".
+        reason (str): What is wrong with it.
+    """
+
+    def __init__(self, path: str, reason: str):
+        self.path = path
+        self.reason = reason
+        super().__init__(f"{path}: {reason}")
+
+
+def _single_operator(data: Any, path: str, kind: str) -> Tuple[str, Any]:
+    """Return the operator and the argument of an AASQL object, which must have exactly one operator."""
+    if not isinstance(data, dict):
+        raise AASQLSyntaxError(path, f"expected {kind} object, got {data!r}")
+    if len(data) != 1:
+        raise AASQLSyntaxError(path, f"expected {kind} object with exactly one operator, got {sorted(data)}")
+    return next(iter(data.items()))
+
+
+def _list_argument(arg: Any, path: str, length: Optional[int] = None) -> list:
+    if not isinstance(arg, list) or not arg:
+        raise AASQLSyntaxError(path, f"expected non-empty list, got {arg!r}")
+    if length is not None and len(arg) != length:
+        raise AASQLSyntaxError(path, f"expected list of {length} operands, got {len(arg)}")
+    return arg
+
+
+def parse_aasql_value(data: dict, path: str = "$value") -> Value:
     """
     Parse AASQL value dictionary into an AST Value node.
 
     Args:
         data (dict): The AASQL value represented as a dictionary.
+        path (str): The path of the value in the query, used in error messages.
     Returns:
-        Value: The AST node representing the value.
+        Value: The interned AST node representing the value.
     Raises:
-        ValueError: If the value type is unknown.
+        AASQLSyntaxError: If the value is malformed or its type is unknown.
     """
-    AASQL_TO_AST_VALUE_NODES_MAP = {
-        "$field": Field,
-        "$strVal": StringValue,
-        "$numVal": NumberValue,
-        "$boolean": BooleanValue,
-    }
-    AASQL_TO_AST_VALUE_NODES_WITH_CAST_MAP = {
-        "$strCast": StrCast,
-        "$numCast": NumCast,
-        "$hexCast": HexCast,
-        "$boolCast": BoolCast,
-        "$dateTimeCast": DateTimeCast,
-        "$timeCast": TimeCast,
-    }
-
-    for value_prop, ast_value_prop_node_type in AASQL_TO_AST_VALUE_NODES_MAP.items():
-        if value_prop in data:
-            return ast_value_prop_node_type(data[value_prop])
-    for value_cast_prop, ast_value_prop_node_type in AASQL_TO_AST_VALUE_NODES_WITH_CAST_MAP.items():
-        if value_cast_prop in data:
-            return ast_value_prop_node_type(parse_aasql_value(data[value_prop]))
-
-    raise ValueError(f"Unknown value type: {data}")
-
-
-def parse_aasql_expression(expr: dict) -> Expression:
+    op, arg = _single_operator(data, path, "value")
+    path = f"{path}.{op}"
+    value_node = AASQL_TO_AST_VALUE_NODES_MAP.get(op)
+    if value_node is not None:
+        cls, types = value_node
+        # bool is a subclass of int, but not a number in AASQL
+        if not isinstance(arg, types) or (isinstance(arg, bool) and types is not bool):
+            raise AASQLSyntaxError(path, f"expected {cls.__name__} argument, got {arg!r}")
+        return cls.interned(arg)
+    cast_node = AASQL_TO_AST_VALUE_NODES_WITH_CAST_MAP.get(op)
+    if cast_node is not None:
+        return cast_node.interned(parse_aasql_value(arg, path))
+    raise AASQLSyntaxError(path, "unknown value type")
+
+
+def parse_aasql_expression(expr: dict, path: str = "$condition") -> Expression:
     """
     Parse AASQL expression dictionary into an AST Expression node.
 
+    The expression is validated in the same pass, the first malformed part raises an error with its path.
+
     Args:
         expr (dict): The AASQL expression represented as a dictionary.
+        path (str): The path of the expression in the query, used in error messages.
     Returns:
-        Expression: The AST node representing the expression.
+        Expression: The interned AST node representing the expression.
     Raises:
-        ValueError: If the expression contains unsupported operations.
+        AASQLSyntaxError: If the expression is malformed or contains unsupported operations.
     """
-    if "$match" in expr:
-        return Match([parse_aasql_expression(e) for e in expr["$match"]])
-    if "$and" in expr:
-        return And([parse_aasql_expression(e) for e in expr["$and"]])
-    if "$or" in expr:
-        return Or([parse_aasql_expression(e) for e in expr["$or"]])
-    if "$not" in expr:
-        return Not(parse_aasql_expression(expr["$not"]))
-
-    AASQL_TO_AST_COMPARISON_OPERATORS_MAP = {
-        "$eq": Eq,
-        "$ne": Ne,
-        "$gt": Gt,
-        "$ge": Ge,
-        "$lt": Lt,
-        "$le": Le,
-        "$contains": Contains,
-        "$starts-with": StartsWith,
-        "$ends-with": EndsWith,
-        "$regex": Regex,
-    }
-
-    for op, cls in AASQL_TO_AST_COMPARISON_OPERATORS_MAP.items():
-        if op in expr:
-            a, b = expr[op]
-            return cls(parse_aasql_value(a), parse_aasql_value(b))
-
-    raise ValueError(f"Unsupported expression: {expr}")
+    op, arg = _single_operator(expr, path, "expression")
+    path = f"{path}.{op}"
+    comparison = AASQL_TO_AST_COMPARISON_OPERATORS_MAP.get(op)
+    if comparison is not None:
+        a, b = _list_argument(arg, path, 2)
+        return comparison.interned(parse_aasql_value(a, f"{path}[0]"), parse_aasql_value(b, f"{path}[1]"))
+    logical = AASQL_TO_AST_LOGICAL_OPERATORS_MAP.get(op)
+    if logical is not None:
+        operands = _list_argument(arg, path)
+        return logical.interned(tuple(parse_aasql_expression(e, f"{path}[{i}]") for i, e in enumerate(operands)))
+    if op == "$not":
+        return Not.interned(parse_aasql_expression(arg, path))
+    raise AASQLSyntaxError(path, "unsupported expression")
 
 
 def parse_aasql_query(query: dict) -> Condition:
@@ -86,6 +134,13 @@ def parse_aasql_query(query: dict) -> Condition:
         query (dict): The AASQL query represented as a dictionary.
     Returns:
         Condition: The root AST node representing the query condition.
+    Raises:
+        AASQLSyntaxError: If the query is malformed or selects something else than "id".
     """
+    if not isinstance(query, dict) or "$condition" not in query:
+        raise AASQLSyntaxError("$", "expected query object with $condition")
     expr = parse_aasql_expression(query["$condition"])
-    return Condition(expr)
+    select = query.get("$select")
+    if select is not None and select not in SELECTABLE_ATTRIBUTES:
+        raise AASQLSyntaxError("$select", f"unsupported $select: {select}")
+    return Condition.interned(expr, select)
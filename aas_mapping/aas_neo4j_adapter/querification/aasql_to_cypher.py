@@ -1,10 +1,10 @@
 import os
 import json
-from typing import Union
+from typing import Any, Dict, List, Tuple, Union
 
 from aas_mapping.aas_neo4j_adapter.querification.aasql_to_ast import parse_aasql_query
 from pprint import pprint
-from aas_mapping.aas_neo4j_adapter.querification.ast_to_cypher import converter
+from aas_mapping.aas_neo4j_adapter.querification.ast_to_cypher import converter, batch_converter
 
 def convert_aasql_to_cypher(aasql_query: Union[dict, str]) -> str:
     if isinstance(aasql_query, str):
@@ -15,6 +15,35 @@ def convert_aasql_to_cypher(aasql_query: Union[dict, str]) -> str:
     cypher = converter(ast)
     return cypher
 
+def compile_aasql_query(aasql_query: Union[dict, str], paginate: bool = False,
+                        per_language: bool = False) -> Tuple[str, Dict[str, Any]]:
+    """
+    Compile an AASQL query to a parametrized Cypher query and its parameters.
+
+    `per_language` tells if LangString texts are also saved per language, see `converter`.
+    """
+    if isinstance(aasql_query, str):
+        aasql_query = json.loads(aasql_query)
+
+    ast = parse_aasql_query(aasql_query)
+    parameters: Dict[str, Any] = {}
+    cypher = converter(ast, parameters=parameters, paginate=paginate, per_language=per_language)
+    return cypher, parameters
+
+def compile_aasql_queries(aasql_queries: List[Union[dict, str]],
+                          share_match_clauses: bool = False,
+                          per_language: bool = False) -> Tuple[str, Dict[str, Any]]:
+    """
+    Compile multiple AASQL queries to one parametrized Cypher query and its parameters.
+
+    The results of the i-th query are returned in the column `q{i}`, see `batch_converter`.
+    """
+    asts = [parse_aasql_query(json.loads(query) if isinstance(query, str) else query) for query in aasql_queries]
+    parameters: Dict[str, Any] = {}
+    cypher = batch_converter(asts, parameters=parameters, share_match_clauses=share_match_clauses,
+                             per_language=per_language)
+    return cypher, parameters
+
 def main():
     project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     query_dir = os.path.join(project_root, "aas_mapping", "examples", "queries")
@@ -0,0 +1,569 @@
+"""
+Evaluate AASQL conditions in memory, without a Neo4j round-trip.
+
+The evaluator works on the nodes and relationships produced by `JsonToNeo4jImporter._process_dict`, so it can filter
+cached Identifiables locally and serve as an oracle for the Cypher queries built by `ast_to_cypher`.
+
+It follows the semantics of the generated Cypher queries: every field is bound independently, a condition holds for an
+Identifiable if some binding of all its fields makes it true, and a field without any binding makes the whole
+condition false (as a failing MATCH pattern does). Fields in a `$match` are additionally correlated at the deepest
+`[]` they have in common, so they have to hold for the same list item. Like the Cypher queries, it returns the
+Identifiable of the first field, so a condition on `$sme` fields returns the Submodels of the matching elements.
+
+SubmodelElement values compared with numbers, booleans or datetimes are read from the same typed shadow properties
+(`value_num`, ...) as in the Cypher queries. These only exist for values of a matching valueType, so e.g. the value
+"80" of an xs:string Property is not greater than 10, unless the field is cast with `$numCast`, which converts the
+value if it has no typed shadow property. Other values are converted like `float` or `datetime.fromisoformat` do,
+which may differ from the conversion functions of Cypher for unusual formats.
+"""
+import operator
+import re
+from datetime import datetime, time, timezone
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+from aas_mapping.aas_neo4j_adapter.querification.ast_nodes import *
+from aas_mapping.aas_neo4j_adapter.querification.ast_to_cypher import TYPED_COMPARISON_OPERATORS, \
+    TYPED_VALUE_ATTRIBUTES
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - NumPy is optional
+    np = None
+
+# Roots of fields which are Identifiables and their node labels
+IDENTIFIABLE_ROOTS = {
+    "$aas": "AssetAdministrationShell",
+    "$sm": "Submodel",
+    "$cd": "ConceptDescription",
+}
+# Attributes of LangStrings and the node properties holding their values as lists
+LANG_STRING_LISTS = {
+    "value": "value_text",
+    "language": "value_language",
+    "description": "description_text",
+}
+
+COMPARISONS: Dict[type, Callable[[Any, Any], bool]] = {
+    Eq: operator.eq,
+    Ne: operator.ne,
+    Gt: operator.gt,
+    Ge: operator.ge,
+    Lt: operator.lt,
+    Le: operator.le,
+    Contains: lambda a, b: b in a,
+    StartsWith: lambda a, b: a.startswith(b),
+    EndsWith: lambda a, b: a.endswith(b),
+    Regex: lambda a, b: re.fullmatch(b, a) is not None,
+}
+TEXT_COMPARISONS = (Contains, StartsWith, EndsWith, Regex)
+
+# A binding of a field: (identifiable, nodes of the root path, node holding the attribute, index in a list attribute)
+Row = Tuple[int, Tuple[int, ...], int, Optional[int]]
+# Truth values an expression can take for a group of bindings, None is the null of Cypher
+Outcomes = Dict[Hashable, Set[Optional[bool]]]
+
+
+def _to_number(value: Any) -> Optional[float]:
+    if isinstance(value, bool):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_datetime(value: Any) -> Optional[datetime]:
+    try:
+        date_time = value if isinstance(value, datetime) else datetime.fromisoformat(str(value))
+    except ValueError:
+        return None
+    return date_time if date_time.tzinfo else date_time.replace(tzinfo=timezone.utc)
+
+
+def _to_time(value: Any) -> Optional[time]:
+    try:
+        return value if isinstance(value, time) else time.fromisoformat(str(value))
+    except ValueError:
+        return None
+
+
+def _to_boolean(value: Any) -> Optional[bool]:
+    if isinstance(value, bool):
+        return value
+    return {"true": True, "1": True, "false": False, "0": False}.get(str(value).lower())
+
+
+def _to_hex(value: Any) -> Optional[str]:
+    number = _to_number(value)
+    return hex(int(number)) if number is not None and number.is_integer() else None
+
+
+# Conversions of values to the type they are compared as
+CONVERSIONS: Dict[str, Callable[[Any], Any]] = {
+    "str": lambda value: value if isinstance(value, str) else None if value is None else str(value),
+    "num": _to_number,
+    "datetime": _to_datetime,
+    "time": _to_time,
+    "bool": _to_boolean,
+    "hex": _to_hex,
+}
+CAST_KINDS = {
+    StrCast: "str",
+    NumCast: "num",
+    HexCast: "hex",
+    BoolCast: "bool",
+    DateTimeCast: "datetime",
+    TimeCast: "time",
+}
+# Kinds of comparisons, which are evaluated on typed shadow properties, e.g. `value_num`
+TYPED_KINDS = ("num", "bool", "datetime")
+
+
+class _Column:
+    """Values of one property for all nodes of the graph, with cached conversions to the compared types."""
+
+    def __init__(self, size: int):
+        self.values: List[Any] = [None] * size
+        self._converted: Dict[str, Any] = {}
+
+    def converted(self, kind: str):
+        """Return the values converted to `kind`. Numbers are a float array with NaN for nulls if NumPy is present."""
+        if kind not in self._converted:
+            values = [CONVERSIONS[kind](value) for value in self.values]
+            if np is not None and kind == "num":
+                values = np.array([np.nan if value is None else value for value in values], dtype=float)
+            self._converted[kind] = values
+        return self._converted[kind]
+
+
+class InMemoryGraph:
+    """
+    Nodes and relationships as produced by `JsonToNeo4jImporter._process_dict`, indexed for the evaluation of queries.
+
+    Node properties are stored in columns, which hold the values of one property for all nodes, so comparisons run
+    over all candidate nodes at once. Relationships are indexed by their start node (children) and end node (parents).
+    """
+
+    def __init__(self, nodes: Iterable[Dict[str, Any]], relationships: Dict[str, List[Dict[str, Any]]]):
+        self.nodes: List[Dict[str, Any]] = list(nodes)
+        index_of_uid = {node["uid"]: i for i, node in enumerate(self.nodes)}
+
+        self.labels: Dict[str, List[int]] = {}
+        self.columns: Dict[str, _Column] = {}
+        for i, node in enumerate(self.nodes):
+            for label in node["labels"]:
+                self.labels.setdefault(label, []).append(i)
+            for key, value in node.items():
+                if key not in ("uid", "labels"):
+                    self.columns.setdefault(key, _Column(len(self.nodes))).values[i] = value
+
+        # {rel_type: {from_node: [(to_node, list_index), ...]}} and {to_node: [(rel_type, from_node), ...]}
+        self.children: Dict[str, Dict[int, List[Tuple[int, Optional[int]]]]] = {}
+        self.parents: Dict[int, List[Tuple[str, int]]] = {}
+        for rel_type, rels in relationships.items():
+            for rel in rels:
+                if rel["from_uid"] not in index_of_uid or rel["to_uid"] not in index_of_uid:
+                    continue
+                from_node, to_node = index_of_uid[rel["from_uid"]], index_of_uid[rel["to_uid"]]
+                list_index = rel.get("rel_props", {}).get("list_index")
+                self.children.setdefault(rel_type, {}).setdefault(from_node, []).append((to_node, list_index))
+                self.parents.setdefault(to_node, []).append((rel_type, from_node))
+
+    def property(self, node: int, key: str) -> Any:
+        column = self.columns.get(key)
+        return column.values[node] if column is not None else None
+
+    def follow(self, node: int, rel_type: str, index: Any = "[]") -> List[int]:
+        """
+        Return the nodes reached from `node` over relationships of `rel_type`.
+
+        `index` selects one list item by its `list_index` (or its position, if the items are not indexed),
+        "[]" selects all of them.
+        """
+        items = self.children.get(rel_type, {}).get(node, [])
+        if index == "[]":
+            return [to_node for to_node, _ in items]
+        if any(list_index is not None for _, list_index in items):
+            return [to_node for to_node, list_index in items if list_index == index]
+        return [items[index][0]] if index < len(items) else []
+
+    def shells_of_submodel(self, submodel: int) -> List[int]:
+        """Return the AssetAdministrationShells which reference the Submodel in their `submodels`."""
+        submodel_id = self.property(submodel, "id")
+        return [
+            shell
+            for reference in self.labels.get("Reference", [])
+            if (self.property(reference, "keys_value") or [None])[0] == submodel_id
+            for rel_type, shell in self.parents.get(reference, [])
+            if rel_type == "submodels"
+        ]
+
+
+def _parse_root(root: str) -> List[Tuple[str, Optional[str], Any]]:
+    """
+    Split the root of a `$sme` field into steps (relationship, idShort, list index), e.g.
+    "$sme.A[].B" -> [("submodelElements", "A", None), ("value", None, "[]"), ("value", "B", None)]
+    """
+    steps = []
+    parts = root.split(".")[1:]
+    for part in parts:
+        id_short, *indexes = part.replace("]", "").split("[")
+        if id_short:
+            steps.append(("value" if steps else "submodelElements", id_short, None))
+        for index in indexes:
+            steps.append(("value" if steps else "submodelElements", None, int(index) if index else "[]"))
+    if not steps:
+        steps.append(("submodelElements", None, "[]"))
+    return steps
+
+
+def _split_attribute_part(part: str) -> Tuple[str, Any]:
+    """Split an attribute element into its name and index, e.g. "keys[0]" -> ("keys", 0), "keys[]" -> ("keys", "[]")"""
+    if "[" not in part:
+        return part, None
+    name, index = part[:-1].split("[", 1)
+    return name, int(index) if index else "[]"
+
+
+class _FieldValues:
+    """Bindings of a field and the values of its attribute, aligned by position."""
+
+    def __init__(self):
+        self.rows: List[Row] = []
+        self.values: List[Any] = []
+        # Set if every value is the value of the property `column` of the attribute node of its row
+        self.column: Optional[str] = None
+
+    def converted(self, graph: InMemoryGraph, kind: str):
+        if self.column is not None and self.column in graph.columns:
+            converted = graph.columns[self.column].converted(kind)
+            nodes = [row[2] for row in self.rows]
+            return converted[np.array(nodes, dtype=int)] if np is not None and kind == "num" \
+                else [converted[node] for node in nodes]
+        return [CONVERSIONS[kind](value) for value in self.values]
+
+    def typed(self, graph: InMemoryGraph, kind: str, cast: bool) -> List[Any]:
+        """
+        Return the typed shadow properties of the values, e.g. `value_num`. A cast field falls back to converting
+        values without one, like `coalesce(sme0.value_num, toFloat(sme0.value))` of the Cypher queries.
+        """
+        typed_values = [graph.property(row[2], f"{self.column}_{kind}") if self.column is not None else None
+                        for row in self.rows]
+        if not cast:
+            return typed_values
+        return [CONVERSIONS[kind](value) if typed_value is None else typed_value
+                for typed_value, value in zip(typed_values, self.values)]
+
+
+class _Evaluator:
+    def __init__(self, graph: InMemoryGraph, ast: Condition):
+        self.graph = graph
+        roots = [self._root_kind(field) for field in _fields(ast.expr)]
+        if not roots:
+            raise ValueError("Condition does not contain any field")
+        # Results are grouped by the Identifiable of the first field, like the converter returns its node
+        self.primary = roots[0]
+        if "$cd" in roots and set(roots) != {"$cd"}:
+            raise ValueError("Conditions combining $cd with other roots are not supported")
+        self._fields: Dict[str, _FieldValues] = {}
+
+    @staticmethod
+    def _root_kind(field: Field) -> str:
+        root = field.name.split("#", 1)[0]
+        if root in IDENTIFIABLE_ROOTS:
+            return root
+        if root.startswith("$sme"):
+            return "$sm"
+        raise ValueError(f"Unknown root of field: {field.name}")
+
+    def _root_rows(self, root: str) -> List[Row]:
+        graph = self.graph
+        if root in IDENTIFIABLE_ROOTS:
+            rows = [(node, (), node, None) for node in graph.labels.get(IDENTIFIABLE_ROOTS[root], [])]
+        else:
+            rows = [(node, (), node, None) for node in graph.labels.get("Submodel", [])]
+            for rel_type, id_short, index in _parse_root(root):
+                rows = [
+                    (identifiable, trail + (child,), child, None)
+                    for identifiable, trail, node, _ in rows
+                    for child in graph.follow(node, rel_type, index if index is not None else "[]")
+                    if id_short is None or graph.property(child, "idShort") == id_short
+                ]
+        kind = root if root in IDENTIFIABLE_ROOTS else "$sm"
+        if kind == self.primary:
+            return rows
+        # Shells and their Submodels are joined over the submodel references
+        if self.primary == "$aas":
+            return [(shell, trail, node, item) for identifiable, trail, node, item in rows
+                    for shell in graph.shells_of_submodel(identifiable)]
+        return [(submodel, trail, node, item) for submodel in graph.labels.get("Submodel", [])
+                for shell in graph.shells_of_submodel(submodel)
+                for identifiable, trail, node, item in rows if identifiable == shell]
+
+    def field_values(self, field: Field) -> _FieldValues:
+        """Bind the field to all matching nodes of the graph and collect the values of its attribute."""
+        if field.name in self._fields:
+            return self._fields[field.name]
+        if "#" not in field.name:
+            raise ValueError(f"Field has no attribute: {field.name}")
+        graph = self.graph
+        root, attribute = field.name.split("#", 1)
+        rows = self._root_rows(root)
+        parts = [_split_attribute_part(part) for part in attribute.split(".")]
+
+        result = _FieldValues()
+        key_index = None
+        for name, index in parts[:-1]:
+            if name == "keys":
+                key_index = "[]" if index is None else index
+            else:
+                rows = [(identifiable, trail, child, None)
+                        for identifiable, trail, node, _ in rows
+                        for child in graph.follow(node, name, "[]" if index is None else index)]
+
+        name, index = parts[-1]
+        if key_index is not None:
+            self._collect(result, rows, f"keys_{name}", key_index)
+        else:
+            plain = True
+            for row in rows:
+                node = row[2]
+                if name in LANG_STRING_LISTS and graph.property(node, LANG_STRING_LISTS[name]) is not None:
+                    self._collect(result, [row], LANG_STRING_LISTS[name], "[]")
+                    plain = False
+                elif graph.property(node, name) is None and graph.follow(node, name):
+                    # A Reference used as value is compared by its first key, e.g. "#semanticId"
+                    references = [(row[0], row[1], child, None) for child in graph.follow(node, name)]
+                    self._collect(result, references, "keys_value", 0)
+                    plain = False
+                else:
+                    plain = self._collect(result, [row], name, index) and plain
+            if plain:
+                result.column = name
+        self._fields[field.name] = result
+        return result
+
+    def _collect(self, result: _FieldValues, rows: List[Row], key: str, index: Any) -> bool:
+        """
+        Add the values of the property `key` of the rows, list values are split into one row per item.
+
+        Returns True if all values were scalar.
+        """
+        scalar = True
+        for identifiable, trail, node, _ in rows:
+            value = self.graph.property(node, key)
+            if isinstance(value, list):
+                scalar = False
+                items = enumerate(value) if index in (None, "[]") else \
+                    [(index, value[index])] if index < len(value) else []
+                for item, item_value in items:
+                    result.rows.append((identifiable, trail, node, item))
+                    result.values.append(item_value)
+            elif index is None or index == "[]":
+                result.rows.append((identifiable, trail, node, None))
+                result.values.append(value)
+        return scalar
+
+    def outcomes(self, exp: Expression, group: Callable[[Row], Hashable]) -> Outcomes:
+        """Return the truth values the expression can take per group of bindings."""
+        match exp:
+            case BinaryExpression():
+                return self._comparison_outcomes(exp, group)
+            case Not():
+                return {key: {None if value is None else not value for value in values}
+                        for key, values in self.outcomes(exp.operand, group).items()}
+            case Match():
+                correlate = self._correlation(exp)
+                inner = self._combine(exp, lambda row: (group(row), correlate(row)), _and)
+                combined: Outcomes = {}
+                for (key, _), values in inner.items():
+                    combined.setdefault(key, set()).update(values)
+                return combined
+            case And():
+                return self._combine(exp, group, _and)
+            case Or():
+                return self._combine(exp, group, _or)
+            case _:
+                raise ValueError(f"Unsupported expression type: {type(exp)}")
+
+    def _combine(self, exp: Expression, group: Callable[[Row], Hashable],
+                 combine: Callable[[Optional[bool], Optional[bool]], Optional[bool]]) -> Outcomes:
+        # Every operand has to be bound, like all patterns of a MATCH clause
+        combined: Optional[Outcomes] = None
+        for operand in exp.operands:
+            outcomes = self.outcomes(operand, group)
+            if combined is None:
+                combined = outcomes
+                continue
+            combined = {key: {combine(a, b) for a in values for b in outcomes[key]}
+                        for key, values in combined.items() if key in outcomes}
+        return combined or {}
+
+    def _correlation(self, exp: Match) -> Callable[[Row], Hashable]:
+        """
+        Return the correlation key of the bindings of a Match: the node of the deepest `[]` all fields pass through,
+        and the LangString item, if all fields address the same LangString list.
+        """
+        fields = list(_fields(exp))
+        roots = [field.name.split("#", 1)[0] for field in fields]
+        if not all(root.startswith("$sme") for root in roots):
+            return lambda row: None
+        steps = [_parse_root(root) for root in roots]
+        depth = 0
+        for i, step in enumerate(steps[0]):
+            if not all(len(other) > i and other[i] == step for other in steps):
+                break
+            if step[2] == "[]":
+                depth = i + 1
+        attributes = {field.name.split("#", 1)[1] for field in fields}
+        pair_items = len(set(roots)) == 1 and attributes <= {"value", "language"} and len(attributes) > 1
+        if pair_items:
+            return lambda row: (row[1][depth - 1] if depth else None, row[2], row[3])
+        return lambda row: row[1][depth - 1] if depth else None
+
+    def _comparison_outcomes(self, exp: BinaryExpression, group: Callable[[Row], Hashable]) -> Outcomes:
+        kind = _comparison_kind(exp)
+        compare = COMPARISONS[type(exp)]
+        typed = _is_typed_comparison(exp, kind)
+        left, right = self._operand(exp.left, kind, typed), self._operand(exp.right, kind, typed)
+        outcomes: Outcomes = {}
+        if left[0] is None and right[0] is None:
+            raise ValueError(f"Comparison without field: {exp}")
+        if left[0] is not None and right[0] is not None:
+            # Both sides are fields, so every pair of bindings in the same group is compared
+            right_by_key: Dict[Hashable, List[Any]] = {}
+            for row, value in zip(right[0], right[1]):
+                right_by_key.setdefault(group(row), []).append(value)
+            for row, value in zip(left[0], left[1]):
+                key = group(row)
+                for other in right_by_key.get(key, []):
+                    outcomes.setdefault(key, set()).add(_compare(compare, value, other))
+            return outcomes
+        rows, values, constant, constant_left = (*left, right[1], False) if left[0] is not None \
+            else (*right, left[1], True)
+        for row, result in zip(rows, self._compare_all(exp, values, constant, constant_left)):
+            outcomes.setdefault(group(row), set()).add(result)
+        return outcomes
+
+    def _compare_all(self, exp: BinaryExpression, values, constant: Any, constant_left: bool) -> List[Optional[bool]]:
+        """Compare all values of a field with a constant, vectorized if the values are a NumPy array."""
+        compare = COMPARISONS[type(exp)]
+        if np is not None and isinstance(values, np.ndarray) and not isinstance(exp, TEXT_COMPARISONS):
+            if constant is None:
+                return [None] * len(values)
+            results = compare(constant, values) if constant_left else compare(values, constant)
+            return [None if null else bool(result) for result, null in zip(results, np.isnan(values))]
+        if constant_left:
+            return [_compare(compare, constant, value) for value in values]
+        return [_compare(compare, value, constant) for value in values]
+
+    def _operand(self, value: Value, kind: str, typed: bool = False) -> Tuple[Optional[List[Row]], Any]:
+        """
+        Return the bindings and values of a field operand, or None and the value of a constant operand.
+
+        If `typed` is True, the values of a field are its typed shadow properties, see `_FieldValues.typed`.
+        """
+        cast = isinstance(value, tuple(CAST_KINDS))
+        while isinstance(value, tuple(CAST_KINDS)):
+            value = value.inner
+        if isinstance(value, Field):
+            field_values = self.field_values(value)
+            if typed:
+                return field_values.rows, field_values.typed(self.graph, kind, cast)
+            return field_values.rows, field_values.converted(self.graph, kind)
+        return None, CONVERSIONS[kind](value.value)
+
+
+def _and(a: Optional[bool], b: Optional[bool]) -> Optional[bool]:
+    if a is False or b is False:
+        return False
+    return None if a is None or b is None else True
+
+
+def _or(a: Optional[bool], b: Optional[bool]) -> Optional[bool]:
+    if a is True or b is True:
+        return True
+    return None if a is None or b is None else False
+
+
+def _compare(compare: Callable[[Any, Any], bool], a: Any, b: Any) -> Optional[bool]:
+    if a is None or b is None:
+        return None
+    try:
+        return compare(a, b)
+    except (TypeError, re.error):
+        return None
+
+
+def _comparison_kind(exp: BinaryExpression) -> str:
+    """Return the type both sides of a comparison are converted to, given by their casts and constants."""
+    if isinstance(exp, TEXT_COMPARISONS):
+        return "str"
+    for value in (exp.left, exp.right):
+        if type(value) in CAST_KINDS:
+            return CAST_KINDS[type(value)]
+    for value in (exp.left, exp.right):
+        if isinstance(value, NumberValue):
+            return "num"
+        if isinstance(value, BooleanValue):
+            return "bool"
+    return "str"
+
+
+def _is_typed_comparison(exp: BinaryExpression, kind: str) -> bool:
+    """
+    Return True if the comparison of a SubmodelElement value with a constant is evaluated on the typed shadow
+    properties, like `ast_to_cypher._convert_typed_comparison` compiles it.
+    """
+    if kind not in TYPED_KINDS or exp.get_operator() not in TYPED_COMPARISON_OPERATORS:
+        return False
+    fields = [field for side in (exp.left, exp.right) for field in _fields(side)]
+    if len(fields) != 1:
+        return False
+    constant = exp.right if next(_fields(exp.left), None) is not None else exp.left
+    constant_kind = CAST_KINDS.get(type(constant)) or \
+        {NumberValue: "num", BooleanValue: "bool"}.get(type(constant), kind)
+    if constant_kind != kind:
+        # E.g. a field cast to a number compared with a boolean
+        return False
+    root, attribute = fields[0].name.split("#", 1) if "#" in fields[0].name else (fields[0].name, None)
+    return root.startswith("$sme") and attribute in TYPED_VALUE_ATTRIBUTES
+
+
+def _fields(exp: Node) -> Iterable[Field]:
+    """Yield all fields of the expression in the order of their appearance."""
+    match exp:
+        case Field():
+            yield exp
+        case BinaryExpression():
+            yield from _fields(exp.left)
+            yield from _fields(exp.right)
+        case Not():
+            yield from _fields(exp.operand)
+        case And() | Or() | Match():
+            for operand in exp.operands:
+                yield from _fields(operand)
+        case StrCast() | NumCast() | HexCast() | BoolCast() | DateTimeCast() | TimeCast():
+            yield from _fields(exp.inner)
+
+
+def evaluate(ast: Condition, graph: InMemoryGraph) -> List[Any]:
+    """
+    Evaluate an AST Condition node against an in-memory graph.
+
+    Returns:
+        The nodes of the Identifiables for which the condition holds, in the order of the graph, or their ids
+        if the condition has `select` "id". The Identifiables are of the kind of the root of the first field,
+        SubmodelElement fields belong to their Submodel.
+
+    Raises:
+        ValueError: if the condition contains unsupported fields or expressions.
+    """
+    if not isinstance(ast, Condition):
+        raise ValueError(f"Expected Condition node, got {type(ast)}")
+    evaluator = _Evaluator(graph, ast)
+    outcomes = evaluator.outcomes(ast.expr, lambda row: row[0])
+    matching = sorted(identifiable for identifiable, values in outcomes.items() if True in values)
+    if ast.select == "id":
+        return [graph.property(identifiable, "id") for identifiable in matching]
+    return [graph.nodes[identifiable] for identifiable in matching]
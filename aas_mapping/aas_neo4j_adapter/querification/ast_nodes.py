@@ -1,14 +1,49 @@
 from __future__ import annotations
-from dataclasses import dataclass
-from typing import List
+import weakref
+from dataclasses import dataclass, fields
+from typing import Any, Optional, Tuple
 from abc import ABC, abstractmethod
 
+# Interned nodes by their structural key, see `Node.interned`
+_INTERNED: weakref.WeakValueDictionary = weakref.WeakValueDictionary()
+
 
 class Node(ABC):
     """
     Abstract base class for all AST nodes.
+
+    Nodes are immutable and compared structurally. The structural hash is computed once per node, so nodes are cheap
+    to use as cache keys. Nodes created with `interned` are shared between all equal (sub)expressions.
     """
-    pass
+
+    def _key(self) -> Tuple[Any, ...]:
+        """Return the structural key of the node, constants are keyed with their type, so 1 and 1.0 differ."""
+        key = [type(self)]
+        for field_ in fields(self):
+            value = getattr(self, field_.name)
+            key.append(value if isinstance(value, (Node, tuple)) or value is None else (type(value), value))
+        return tuple(key)
+
+    def __hash__(self) -> int:
+        try:
+            return self.__dict__["_hash"]
+        except KeyError:
+            hash_ = hash(self._key())
+            object.__setattr__(self, "_hash", hash_)
+            return hash_
+
+    def __eq__(self, other: Any) -> bool:
+        if self is other:
+            return True
+        if type(other) is not type(self) or hash(other) != hash(self):
+            return False
+        return self._key() == other._key()
+
+    @classmethod
+    def interned(cls, *args: Any) -> Node:
+        """Return the shared node of this class with the given fields, creating it if it does not exist yet."""
+        node = cls(*args)
+        return _INTERNED.setdefault(node._key(), node)
 
 
 class Value(Node, ABC):
@@ -25,7 +60,7 @@ class Expression(Node, ABC):
     pass
 
 
-@dataclass
+@dataclass(frozen=True, eq=False)
 class Field(Value):
     """
     Represents a field in the AST.
@@ -38,7 +73,7 @@ class Field(Value):
     def __repr__(self): return f'Field("{self.name}")'
 
 
-@dataclass
+@dataclass(frozen=True, eq=False)
 class StringValue(Value):
     """
     Represents a string value in the AST.
@@ -51,7 +86,7 @@ class StringValue(Value):
     def __repr__(self): return f'StringValue("{self.value}")'
 
 
-@dataclass
+@dataclass(frozen=True, eq=False)
 class NumberValue(Value):
     """
     Represents a numeric value in the AST.
@@ -64,7 +99,7 @@ class NumberValue(Value):
     def __repr__(self): return f'NumberValue({self.value})'
 
 
-@dataclass
+@dataclass(frozen=True, eq=False)
 class BooleanValue(Value):
     """
     Represents a boolean value in the AST.
@@ -77,7 +112,7 @@ class BooleanValue(Value):
     def __repr__(self): return f'BooleanValue({self.value})'
 
 
-@dataclass
+@dataclass(frozen=True, eq=False)
 class StrCast(Value):
     """
     Represents a string cast operation in the AST.
@@ -94,7 +129,7 @@ class StrCast(Value):
     def __repr__(self): return f"Str({self.inner})"
 
 
-@dataclass
+@dataclass(frozen=True, eq=False)
 class NumCast(Value):
     """
     Represents a numeric cast operation in the AST.
@@ -111,7 +146,7 @@ class NumCast(Value):
     def __repr__(self): return f"Num({self.inner})"
 
 
-@dataclass
+@dataclass(frozen=True, eq=False)
 class HexCast(Value):
     """
     Represents a hexadecimal cast operation in the AST.
@@ -128,7 +163,7 @@ class HexCast(Value):
     def __repr__(self): return f"Hex({self.inner})"
 
 
-@dataclass
+@dataclass(frozen=True, eq=False)
 class BoolCast(Value):
     """
     Represents a boolean cast operation in the AST.
@@ -145,7 +180,7 @@ class BoolCast(Value):
     def __repr__(self): return f"Bool({self.inner})"
 
 
-@dataclass
+@dataclass(frozen=True, eq=False)
 class DateTimeCast(Value):
     """
     Represents a datetime cast operation in the AST.
@@ -162,7 +197,7 @@ class DateTimeCast(Value):
     def __repr__(self): return f"DateTime({self.inner})"
 
 
-@dataclass
+@dataclass(frozen=True, eq=False)
 class TimeCast(Value):
     """
     Represents a time cast operation in the AST.
@@ -179,7 +214,7 @@ class TimeCast(Value):
     def __repr__(self): return f"Time({self.inner})"
 
 
-@dataclass
+@dataclass(frozen=True, eq=False)
 class BinaryExpression(Expression):
     """
     Represents a binary expression in the AST.
@@ -197,7 +232,7 @@ class BinaryExpression(Expression):
         pass
 
 
-@dataclass
+@dataclass(frozen=True, eq=False)
 class Eq(BinaryExpression):
     """
     Represents an equality expression in the AST.
@@ -210,7 +245,7 @@ class Eq(BinaryExpression):
     def __repr__(self): return f"Eq({self.left}, {self.right})"
 
 
-@dataclass
+@dataclass(frozen=True, eq=False)
 class Ne(BinaryExpression):
     """
     Represents a not-equal expression in the AST.
@@ -223,7 +258,7 @@ class Ne(BinaryExpression):
     def __repr__(self): return f"Ne({self.left}, {self.right})"
 
 
-@dataclass
+@dataclass(frozen=True, eq=False)
 class Gt(BinaryExpression):
     """
     Represents a greater-than expression in the AST.
@@ -236,7 +271,7 @@ class Gt(BinaryExpression):
     def __repr__(self): return f"Gt({self.left}, {self.right})"
 
 
-@dataclass
+@dataclass(frozen=True, eq=False)
 class Ge(BinaryExpression):
     """
     Represents a greater-than-or-equal expression in the AST.
@@ -249,7 +284,7 @@ class Ge(BinaryExpression):
     def __repr__(self): return f"Ge({self.left}, {self.right})"
 
 
-@dataclass
+@dataclass(frozen=True, eq=False)
 class Lt(BinaryExpression):
     """
     Represents a less-than expression in the AST.
@@ -262,7 +297,7 @@ class Lt(BinaryExpression):
     def __repr__(self): return f"Lt({self.left}, {self.right})"
 
 
-@dataclass
+@dataclass(frozen=True, eq=False)
 class Le(BinaryExpression):
     """
     Represents a less-than-or-equal expression in the AST.
@@ -275,7 +310,7 @@ class Le(BinaryExpression):
     def __repr__(self): return f"Le({self.left}, {self.right})"
 
 
-@dataclass
+@dataclass(frozen=True, eq=False)
 class Contains(BinaryExpression):
     """
     Represents a contains expression in the AST.
@@ -288,7 +323,7 @@ class Contains(BinaryExpression):
     def __repr__(self): return f"Contains({self.left}, {self.right})"
 
 
-@dataclass
+@dataclass(frozen=True, eq=False)
 class StartsWith(BinaryExpression):
     """
     Represents a starts-with expression in the AST.
@@ -301,7 +336,7 @@ class StartsWith(BinaryExpression):
     def __repr__(self): return f"StartsWith({self.left}, {self.right})"
 
 
-@dataclass
+@dataclass(frozen=True, eq=False)
 class EndsWith(BinaryExpression):
     """
     Represents an ends-with expression in the AST.
@@ -314,7 +349,7 @@ class EndsWith(BinaryExpression):
     def __repr__(self): return f"EndsWith({self.left}, {self.right})"
 
 
-@dataclass
+@dataclass(frozen=True, eq=False)
 class Regex(BinaryExpression):
     """
     Represents a regex match expression in the AST.
@@ -327,15 +362,18 @@ class Regex(BinaryExpression):
     def __repr__(self): return f"Regex({self.left}, {self.right})"
 
 
-@dataclass
+@dataclass(frozen=True, eq=False)
 class Match(Expression):
     """
     Represents a match expression in the AST.
 
     Attributes:
-        operands (List[Expression]): The list of expressions to match.
+        operands (Tuple[Expression, ...]): The expressions to match, lists are converted to tuples.
     """
-    operands: List[Expression]
+    operands: Tuple[Expression, ...]
+
+    def __post_init__(self):
+        object.__setattr__(self, "operands", tuple(self.operands))
 
     @staticmethod
     def get_operator() -> str:
@@ -344,15 +382,18 @@ class Match(Expression):
     def __repr__(self): return f"Match([{', '.join(map(str, self.operands))}])"
 
 
-@dataclass
+@dataclass(frozen=True, eq=False)
 class And(Expression):
     """
     Represents a logical AND expression in the AST.
 
     Attributes:
-        operands (List[Expression]): The list of expressions to AND together.
+        operands (Tuple[Expression, ...]): The expressions to AND together, lists are converted to tuples.
     """
-    operands: List[Expression]
+    operands: Tuple[Expression, ...]
+
+    def __post_init__(self):
+        object.__setattr__(self, "operands", tuple(self.operands))
 
     @staticmethod
     def get_operator() -> str:
@@ -361,15 +402,18 @@ class And(Expression):
     def __repr__(self): return f"And([{', '.join(map(str, self.operands))}])"
 
 
-@dataclass
+@dataclass(frozen=True, eq=False)
 class Or(Expression):
     """
     Represents a logical OR expression in the AST.
 
     Attributes:
-        operands (List[Expression]): The list of expressions to OR together.
+        operands (Tuple[Expression, ...]): The expressions to OR together, lists are converted to tuples.
     """
-    operands: List[Expression]
+    operands: Tuple[Expression, ...]
+
+    def __post_init__(self):
+        object.__setattr__(self, "operands", tuple(self.operands))
 
     @staticmethod
     def get_operator() -> str:
@@ -378,7 +422,7 @@ class Or(Expression):
     def __repr__(self): return f"Or([{', '.join(map(str, self.operands))}])"
 
 
-@dataclass
+@dataclass(frozen=True, eq=False)
 class Not(Expression):
     """
     Represents a logical NOT expression in the AST.
@@ -395,14 +439,20 @@ class Not(Expression):
     def __repr__(self): return f"Not({self.operand})"
 
 
-@dataclass
+@dataclass(frozen=True, eq=False)
 class Condition(Node):
     """
     Represents a top-level condition wrapper in the AST.
 
     Attributes:
         expr (Expression): The root expression of the condition tree.
+        select (Optional[str]): What to return for matching elements. None returns the matching nodes,
+            "id" returns only the ids of the Identifiables the matching elements belong to.
     """
     expr: Expression
+    select: Optional[str] = None
 
-    def __repr__(self): return f"Condition({self.expr})"
+    def __repr__(self):
+        if self.select is None:
+            return f"Condition({self.expr})"
+        return f'Condition({self.expr}, select="{self.select}")'
@@ -1,10 +1,35 @@
-from typing import Tuple
+from typing import Any, Dict, List, Optional, Tuple
 import re
 
+from aas_mapping.aas_neo4j_adapter.base import LANGUAGE_PROP_SEPARATOR
 from aas_mapping.aas_neo4j_adapter.querification.ast_nodes import *
 
+# Property with the first key value of the semanticId of a node, saved on the node itself
+SEMANTIC_ID_PROPERTY = "semanticId_value"
 
-def _convert_sme(root: str, mapping: dict[str, int]) -> Tuple[str, str]:
+# Relationship from a resolved ModelReference to the Referable it points to
+RESOLVES_TO = "resolvesTo"
+
+
+def _to_literal(value: Any, parameters: Optional[Dict[str, Any]]) -> str:
+    """
+    Convert a constant to a Cypher literal.
+
+    If a `parameters` dict is given, the constant is not inlined but stored as query parameter and the
+    parameter reference (e.g. "$p0") is returned. Equal constants share one parameter. Parametrized queries
+    have the same text for all constants, so Neo4j can reuse their cached execution plans.
+    """
+    if parameters is None:
+        return value if isinstance(value, (int, float, bool)) else f"'{value}'"
+    for name, existing_value in parameters.items():
+        if type(existing_value) is type(value) and existing_value == value:
+            return f"${name}"
+    name = f"p{len(parameters)}"
+    parameters[name] = value
+    return f"${name}"
+
+
+def _convert_sme(root: str, mapping: dict[str, int], parameters: Optional[Dict[str, Any]] = None) -> Tuple[str, str]:
     """
     Convert a SubmodelElement root string to a Cypher match part and last root identifier.
 
@@ -33,14 +58,15 @@ def _convert_sme(root: str, mapping: dict[str, int]) -> Tuple[str, str]:
     else:
         mapping["sme"] = 0
         depth = 0
+    first_depth = depth
     for part in root.split(".")[1:]:
         if "[" in part:
             for p in part.split("["):
                 if "]" not in p:
-                    if depth == 0:
-                        match_part += f"(sme{depth}:SubmodelElement {{idShort: '{p}'}})"
+                    if depth == first_depth:
+                        match_part += f"(sme{depth}:SubmodelElement {{idShort: {_to_literal(p, parameters)}}})"
                     else:
-                        match_part += f"-[:value]->(sme{depth}:SubmodelElement {{idShort: '{p}'}})"
+                        match_part += f"-[:value]->(sme{depth}:SubmodelElement {{idShort: {_to_literal(p, parameters)}}})"
                 elif len(p) > 1:
                     # FIXME: take a look here: why we have a list_index for SubmodelELements?
                     match_part += f"-[:value {{list_index: {p[:-1]}}}]->(sme{depth}:SubmodelElement)"
@@ -48,10 +74,10 @@ def _convert_sme(root: str, mapping: dict[str, int]) -> Tuple[str, str]:
                     match_part += f"-[:value]->(sme{depth}:SubmodelElement)"
                 depth += 1
         else:
-            if depth == 0:
-                match_part += f"(sme{depth}:SubmodelElement {{idShort: '{part}'}})"
+            if depth == first_depth:
+                match_part += f"(sme{depth}:SubmodelElement {{idShort: {_to_literal(part, parameters)}}})"
             else:
-                match_part += f"-[:value]->(sme{depth}:SubmodelElement {{idShort: '{part}'}})"
+                match_part += f"-[:value]->(sme{depth}:SubmodelElement {{idShort: {_to_literal(part, parameters)}}})"
             last_root = f"sme{depth}"
             depth += 1
     if last_root != "":
@@ -63,7 +89,7 @@ def _convert_sme(root: str, mapping: dict[str, int]) -> Tuple[str, str]:
     return match_part, last_root
 
 
-def _convert_root(root: str, mapping: dict[str, int]) -> Tuple[str, str]:
+def _convert_root(root: str, mapping: dict[str, int], parameters: Optional[Dict[str, Any]] = None) -> Tuple[str, str]:
     """
     Convert the root part of a field to a Cypher match part and last root identifier.
 
@@ -90,7 +116,7 @@ def _convert_root(root: str, mapping: dict[str, int]) -> Tuple[str, str]:
             match_part += "(cd:ConceptDescription)"
             last_root = "cd"
         case _:
-            match_part, last_root = _convert_sme(root, mapping)
+            match_part, last_root = _convert_sme(root, mapping, parameters)
     return match_part, last_root
 
 
@@ -109,6 +135,7 @@ def _convert_attribute_elements(attribute: str, last_root: str, mapping: dict[st
       - "name" -> "{last_root}.name"
       - "assetInformation" -> adds a node traversal "-[:assetInformation]->(assetInformation:AssetInformation)"
       - "keys[0]" or "keys_value[0]" -> map to positional access inside reference keys
+      - "semanticId" or "semanticId.keys[0].value" -> "{last_root}.semanticId_value", the denormalized first key
       - "language" within a MultiLanguageProperty -> uses "{last_root}.value_language" and marks `isList` True
 
     Returns:
@@ -176,6 +203,10 @@ def _convert_attribute_elements(attribute: str, last_root: str, mapping: dict[st
                 match_part += f"-[:submodels]->(submodels{mapping['submodels']}:Reference)"
                 last_root = f"submodels{mapping['submodels']}"
                 mapping["submodels"] += 1
+            case "semanticId" if attribute in ("semanticId", "semanticId.keys[0].value"):
+                # The first key value is denormalized on the node, so no Reference node has to be expanded
+                where_part += f"{last_root}.{SEMANTIC_ID_PROPERTY}"
+                break
             case "semanticId":
                 if "semanticId" not in mapping:
                     mapping["semanticId"] = 0
@@ -187,6 +218,11 @@ def _convert_attribute_elements(attribute: str, last_root: str, mapping: dict[st
                     where_part += f"{last_root}.keys_value[0]"
             case "valueType":
                 where_part += f"{last_root}.valueType"
+            case "min" | "max":
+                where_part += f"{last_root}.{part}"
+            case "description":
+                where_part += f"{last_root}.description_text"
+                isList = True
             case "language":
                 # FIXME: this should be flexible. We should check here the config and build a Cypher based on config
                 where_part += f"{last_root}.value_language"
@@ -211,7 +247,8 @@ def _convert_attribute_elements(attribute: str, last_root: str, mapping: dict[st
     return where_part, match_part, isList
 
 
-def _convert_field(field: Field, mapping: dict[str, int]) -> Tuple[str, str, bool]:
+def _convert_field(field: Field, mapping: dict[str, int],
+                   parameters: Optional[Dict[str, Any]] = None) -> Tuple[str, str, bool]:
     """
     Convert an AST Field node to Cypher where part and match part.
 
@@ -222,13 +259,14 @@ def _convert_field(field: Field, mapping: dict[str, int]) -> Tuple[str, str, boo
         (where_part, match_part, isList)
     """
     root, attribute = field.name.split("#")
-    match_part, last_root = _convert_root(root, mapping)
+    match_part, last_root = _convert_root(root, mapping, parameters)
     where_part, match_addition, isList = _convert_attribute_elements(attribute, last_root, mapping)
     match_part += match_addition
     return where_part, match_part, isList
 
 
-def _convert_value(value: Value, mapping: dict[str, int]) -> Tuple[str, str, bool]:
+def _convert_value(value: Value, mapping: dict[str, int],
+                   parameters: Optional[Dict[str, Any]] = None) -> Tuple[str, str, bool]:
     """
     Convert an AST Value node to a Cypher query string and associated fields.
 
@@ -239,22 +277,255 @@ def _convert_value(value: Value, mapping: dict[str, int]) -> Tuple[str, str, boo
 
     Literal string values are wrapped in single quotes in the generated Cypher.
     Numeric and boolean values are returned as-is.
+    If `parameters` are given, literals are replaced by query parameters (see `_to_literal`).
     """
     match value:
         case Field():
-            return _convert_field(value, mapping)
+            return _convert_field(value, mapping, parameters)
         case StrCast() | NumCast() | BoolCast() | DateTimeCast():
-            inner = _convert_value(value.inner, mapping)
+            inner = _convert_value(value.inner, mapping, parameters)
             return f"{value.get_operator()}({inner[0]})", inner[1], False
         case HexCast() | TimeCast():
             raise NotImplementedError(f"{type(value)} cannot be converted to Cypher.")
         case StringValue() | NumberValue() | BooleanValue():
-            return value.value if isinstance(value.value, (int, float, bool)) else f"'{value.value}'", "", False
+            return _to_literal(value.value, parameters), "", False
         case _:
             raise ValueError(f"Unsupported value type: {type(value)}")
 
 
-def _convert_expression(exp: Expression, mapping: dict[str, int]) -> Tuple[str, list[str]]:
+# Comparisons, which can be evaluated on the typed shadow properties of values (e.g. `value_num`)
+TYPED_COMPARISON_OPERATORS = ("=", "<>", "<", "<=", ">", ">=")
+# Attributes of SubmodelElements, which have typed shadow properties
+TYPED_VALUE_ATTRIBUTES = ("value", "min", "max")
+# Cypher functions which convert a constant or a string value to the type of a typed shadow property
+TYPED_VALUE_CASTS = {"num": "toFloat", "bool": "toBoolean", "datetime": "datetime"}
+
+
+def _typed_value_suffix(value: Value) -> Optional[str]:
+    """Return the suffix of the typed shadow property which matches the type of a constant or a cast."""
+    match value:
+        case BooleanValue() | BoolCast():
+            return "bool"
+        case NumberValue() | NumCast():
+            return "num"
+        case DateTimeCast():
+            return "datetime"
+    return None
+
+
+def _contains_field(value: Value) -> bool:
+    """Return True if the value is a field or a cast of a field."""
+    while isinstance(value, (StrCast, NumCast, HexCast, BoolCast, DateTimeCast, TimeCast)):
+        value = value.inner
+    return isinstance(value, Field)
+
+
+def _convert_typed_comparison(exp: BinaryExpression, mapping: dict[str, int],
+                              parameters: Optional[Dict[str, Any]] = None) -> Optional[Tuple[str, list[str]]]:
+    """
+    Convert a comparison of a SubmodelElement value with a typed constant to a comparison of its typed shadow property.
+
+    Property and Range values are saved as strings, so comparing them with numbers, booleans or dates would need
+    a conversion of every value at query time. The importer also saves typed copies of them (`value_num`,
+    `value_datetime`, `value_bool`, `min_num`, ...), which can be compared using range indexes instead.
+
+    The typed copies only exist for values of a matching valueType. An explicitly cast field is also compared for
+    other valueTypes, e.g. numbers saved in xs:string Properties, so it falls back to converting the value.
+
+    Examples:
+        Gt(Field("$sme.Temperature#value"), NumberValue(80)) -> "sme0.value_num > 80"
+        Gt(NumCast(Field("$sme.Weight#value")), NumberValue(100))
+            -> "coalesce(sme0.value_num, toFloat(sme0.value)) > 100"
+
+    Returns:
+        (expression_string, list_of_match_parts) or None, if the comparison can not use typed shadow properties.
+    """
+    if exp.get_operator() not in TYPED_COMPARISON_OPERATORS:
+        return None
+    for field_side, constant_side in ((exp.left, exp.right), (exp.right, exp.left)):
+        field = field_side.inner if isinstance(field_side, (NumCast, BoolCast, DateTimeCast)) else field_side
+        if not isinstance(field, Field) or _contains_field(constant_side):
+            continue
+        root, attribute = field.name.split("#")
+        if not root.startswith("$sme") or attribute not in TYPED_VALUE_ATTRIBUTES:
+            continue
+        suffix = _typed_value_suffix(constant_side) or _typed_value_suffix(field_side)
+        if suffix is None or field_side is not field and _typed_value_suffix(field_side) != suffix:
+            continue
+
+        where_part, match_part, _ = _convert_field(field, mapping, parameters)
+        typed_field = f"{where_part}_{suffix}"
+        if field_side is not field:
+            typed_field = f"coalesce({typed_field}, {TYPED_VALUE_CASTS[suffix]}({where_part}))"
+        if isinstance(constant_side, DateTimeCast):
+            # Dates and datetimes are both saved as datetimes
+            constant = f"datetime({_convert_value(constant_side.inner, mapping, parameters)[0]})"
+        else:
+            constant = _convert_value(constant_side, mapping, parameters)[0]
+            if _typed_value_suffix(constant_side) is None:
+                # An untyped constant compared with a cast field is cast to the same type
+                constant = f"{TYPED_VALUE_CASTS[suffix]}({constant})"
+
+        left, right = (typed_field, constant) if field_side is exp.left else (constant, typed_field)
+        return f"{left} {exp.get_operator()} {right}", [match_part]
+    return None
+
+
+# Name of the full-text index over the texts of LangStrings, which is used by `_fulltext_prefilter`
+FULLTEXT_INDEX_NAME = "referable_text"
+# Properties of Referables, which are covered by the full-text index
+FULLTEXT_INDEX_PROPERTIES = ("value_text", "description_text")
+# Characters with a special meaning in regular expressions
+REGEX_META_CHARACTERS = set(".^$*+?()[]{}|\\")
+
+
+def _fulltext_prefilter(exp: BinaryExpression, list_field: str,
+                        parameters: Optional[Dict[str, Any]] = None) -> Optional[str]:
+    """
+    Return a CALL clause, which finds the candidate nodes of a text search in a list of LangString texts.
+
+    The full-text index contains the lowercased words of the texts. If the searched string is a single word,
+    every text which contains, starts or ends with it has a word which matches the Lucene query below, so the
+    nodes found by the index are a superset of the result. The exact comparison is still done in WHERE.
+
+    Example:
+        Contains(Field("$sme.Title#description"), StringValue("Motor"))
+        -> "CALL db.index.fulltext.queryNodes('referable_text', 'description_text:/.*motor.*/') YIELD node AS sme0"
+
+    Returns:
+        The CALL clause or None, if the search cannot be served by the full-text index, e.g. because the list
+        is not one of the `FULLTEXT_INDEX_PROPERTIES`.
+    """
+    if not isinstance(exp.right, StringValue) or not re.fullmatch(r"\w+", exp.right.value):
+        return None
+    var, prop = list_field.split(".", 1)
+    if prop not in FULLTEXT_INDEX_PROPERTIES:
+        return None
+    term = exp.right.value.lower()
+    match exp:
+        case Contains():
+            lucene_query = f"{prop}:/.*{term}.*/"
+        case StartsWith():
+            lucene_query = f"{prop}:{term}*"
+        case EndsWith():
+            lucene_query = f"{prop}:/.*{term}/"
+        case _:
+            return None
+    return (f"CALL db.index.fulltext.queryNodes('{FULLTEXT_INDEX_NAME}', {_to_literal(lucene_query, parameters)}) "
+            f"YIELD node AS {var}")
+
+
+def regex_literal_prefix(pattern: str) -> Tuple[str, bool]:
+    """
+    Return the literal prefix of all strings matching the regex and whether the regex matches only this prefix.
+
+    Cypher regexes always have to match the whole string, so a string matching "SN[0-9]{4}" starts with "SN".
+
+    Examples:
+        "SN[0-9]{4}" -> ("SN", False)
+        "ABC\\.1"    -> ("ABC.1", True)
+        "ab?c"       -> ("a", False)
+    """
+    if "|" in pattern:
+        return "", False
+    prefix = ""
+    i = 1 if pattern.startswith("^") else 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == "$" and i == len(pattern) - 1:
+            break
+        if char == "\\" and i + 1 < len(pattern) and not pattern[i + 1].isalnum():
+            literal, length = pattern[i + 1], 2
+        elif char in REGEX_META_CHARACTERS:
+            return prefix, False
+        else:
+            literal, length = char, 1
+        next_char = pattern[i + length] if i + length < len(pattern) else ""
+        if next_char in ("*", "?", "{"):
+            # The character is optional
+            return prefix, False
+        prefix += literal
+        if next_char == "+":
+            return prefix, False
+        i += length
+    return prefix, True
+
+
+def _convert_text_search(exp: BinaryExpression, left: Tuple[str, str, bool], right: Tuple[str, str, bool],
+                         parameters: Optional[Dict[str, Any]] = None,
+                         conjunctive: bool = False) -> Optional[Tuple[str, list[str]]]:
+    """
+    Convert a text search ($contains, $starts-with, $ends-with, $regex) to a form which can use indexes.
+
+    - Searches in lists (e.g. LangString texts) are applied to every item with ANY(). If the search is required
+      for the whole condition (`conjunctive`), a full-text index prefilter is added (see `_fulltext_prefilter`).
+    - A regex is replaced by an equality if it is only literal, or is combined with a STARTS WITH for its literal
+      prefix, which can use a text or range index. Other regexes fall back to a scan.
+
+    Returns:
+        (expression_string, list_of_match_parts) or None, if the default conversion should be used.
+    """
+    operator = exp.get_operator()
+    if left[2]:
+        expression = f"ANY(text IN {left[0]} WHERE text {operator} {right[0]})"
+        match_parts = [left[1], right[1]]
+        if conjunctive:
+            prefilter = _fulltext_prefilter(exp, left[0], parameters)
+            if prefilter is not None:
+                match_parts.insert(0, prefilter)
+        return expression, match_parts
+    if isinstance(exp, Regex) and isinstance(exp.right, StringValue) and not right[2]:
+        prefix, is_literal = regex_literal_prefix(exp.right.value)
+        if is_literal:
+            return f"{left[0]} = {_to_literal(prefix, parameters)}", [left[1], right[1]]
+        if prefix:
+            return (f"({left[0]} STARTS WITH {_to_literal(prefix, parameters)} AND {left[0]} {operator} {right[0]})",
+                    [left[1], right[1]])
+    return None
+
+
+def _lang_string_pairs(exp: Match) -> List[Tuple[Eq, Eq, str]]:
+    """
+    Find pairs of operands of a Match, which compare the language and the text of the value of the same element.
+
+    For example `$sme.Name#language = 'nl'` and `$sme.Name#value = 'Naam'` are a pair, which is only true if
+    the element has the text 'Naam' in the language 'nl'. `#language` is the language of the value, so it is not
+    paired with other LangString attributes like `#description`.
+
+    Returns:
+        A list of (language_expression, text_expression, language) tuples.
+    """
+    language_operands: Dict[str, Tuple[Eq, str]] = {}
+    text_operands: Dict[str, Eq] = {}
+    for operand in exp.operands:
+        if not (isinstance(operand, Eq) and isinstance(operand.left, Field) and isinstance(operand.right, StringValue)):
+            continue
+        root, _, attribute = operand.left.name.partition("#")
+        if attribute == "language" and re.fullmatch(r"[A-Za-z0-9-]+", operand.right.value):
+            language_operands.setdefault(root, (operand, operand.right.value))
+        elif attribute == "value":
+            text_operands.setdefault(root, operand)
+    return [(language_operand, text_operands[root], language)
+            for root, (language_operand, language) in language_operands.items() if root in text_operands]
+
+
+def _convert_lang_string_pair(text_exp: Eq, language: str, mapping: dict[str, int],
+                              parameters: Optional[Dict[str, Any]] = None) -> Tuple[str, list[str]]:
+    """
+    Convert a pair of language and text comparisons to a comparison of the per-language property,
+    e.g. "sme0.`value_text__nl` = 'Naam'".
+    """
+    where_part, match_part, _ = _convert_field(text_exp.left, mapping, parameters)
+    owner, _, prop = where_part.rpartition(".")
+    prop = prop.removesuffix("_text")
+    return (f"{owner}.`{prop}_text{LANGUAGE_PROP_SEPARATOR}{language}` = "
+            f"{_to_literal(text_exp.right.value, parameters)}", [match_part])
+
+
+def _convert_expression(exp: Expression, mapping: dict[str, int],
+                        parameters: Optional[Dict[str, Any]] = None,
+                        conjunctive: bool = True,
+                        per_language: bool = False) -> Tuple[str, list[str]]:
     """
     Convert an AST Expression node to a Cypher WHERE expression string and list of match fragments.
 
@@ -265,22 +536,44 @@ def _convert_expression(exp: Expression, mapping: dict[str, int]) -> Tuple[str,
         and operator is "=", transforms the comparison into an `IN` expression in Cypher.
       - Not: negates the inner expression.
       - And / Or / Match: joins multiple operand expressions using the appropriate logical operator.
+
+    `conjunctive` tells if the expression has to be true for the whole condition to be true,
+    which allows to add index prefilters for it.
+
+    If `per_language` is True, LangString texts are also saved per language (e.g. "value_text__en"), and a Match
+    comparing the language and the text of the same attribute is converted to a comparison of that property.
     """
     match exp:
         case BinaryExpression():
-            left = _convert_value(exp.left, mapping)
-            right = _convert_value(exp.right, mapping)
+            typed_comparison = _convert_typed_comparison(exp, mapping, parameters)
+            if typed_comparison is not None:
+                return typed_comparison
+            left = _convert_value(exp.left, mapping, parameters)
+            right = _convert_value(exp.right, mapping, parameters)
             operator = exp.get_operator()
             # If field returns a list, compare using IN operator
-            if (left[2] or right[2]) and operator == "=":
+            if left[2] and operator == "=":
+                return f"{right[0]} IN {left[0]}", [left[1], right[1]]
+            if right[2] and operator == "=":
                 return f"{left[0]} IN {right[0]}", [left[1], right[1]]
+            if isinstance(exp, (Contains, StartsWith, EndsWith, Regex)):
+                text_search = _convert_text_search(exp, left, right, parameters, conjunctive)
+                if text_search is not None:
+                    return text_search
             return f"{left[0]} {operator} {right[0]}", [left[1], right[1]]
         case Not():
-            inner, fields = _convert_expression(exp.operand, mapping)
+            inner, fields = _convert_expression(exp.operand, mapping, parameters, False, per_language)
             return f"{exp.get_operator()} ({inner})", fields
         case And() | Or() | Match():
-            inner = map(lambda e: _convert_expression(e, mapping), exp.operands)
-            inner = list(inner)
+            conjunctive = conjunctive and not isinstance(exp, Or)
+            operands = list(exp.operands)
+            inner = []
+            if per_language and isinstance(exp, Match):
+                for language_exp, text_exp, language in _lang_string_pairs(exp):
+                    operands.remove(language_exp)
+                    operands.remove(text_exp)
+                    inner.append(_convert_lang_string_pair(text_exp, language, mapping, parameters))
+            inner += [_convert_expression(e, mapping, parameters, conjunctive, per_language) for e in operands]
             operator = exp.get_operator()
             return f"{f' {operator} '.join(i[0] for i in inner)}", [f for i in inner for f in i[1]]
         case _:
@@ -303,36 +596,164 @@ def _remove_duplicate_matches(matches: list[str]) -> list[str]:
     return unique_matches
 
 
-def converter(ast: Condition) -> str:
+def _convert_condition(ast: Condition, parameters: Optional[Dict[str, Any]] = None,
+                       per_language: bool = False) -> Tuple[List[str], str, str]:
+    """
+    Convert an AST Condition node to the parts of a Cypher query.
+
+    Returns:
+        (match_parts, where_part, return_var): the unique MATCH fragments, the WHERE expression and
+        the identifier of the node which is returned by the query (the main identifier of the first match fragment).
+
+    Raises:
+        ValueError: if the provided AST is not a Condition.
+    """
+    if not isinstance(ast, Condition):
+        raise ValueError(f"Expected Condition node, got {type(ast)}")
+
+    mapping: dict[str, int] = {}
+    where_part, match_parts = _convert_expression(ast.expr, mapping, parameters, per_language=per_language)
+    combined_matches = _remove_duplicate_matches(match_parts)
+
+    # An index prefilter binds the variable of its pattern and has to come first. Only the first one is used,
+    # as every further CALL would multiply the rows by its hits, the other searches are still checked in WHERE.
+    prefilters = [match for match in combined_matches if match.startswith("CALL ")][:1]
+    combined_matches = [match for match in combined_matches if not match.startswith("CALL ")]
+
+    # Shells and Submodels in one condition belong together: join them over the resolved submodel references
+    if (any(match.startswith("(aas:AssetAdministrationShell)") for match in combined_matches)
+            and any(match.startswith("(sm:Submodel)") for match in combined_matches)):
+        combined_matches.append(f"(aas)-[:submodels]->(:Reference)-[:{RESOLVES_TO}]->(sm)")
+
+    first_match = combined_matches[0]
+    match_var = re.findall(r"\((\w+):", first_match)
+    return_var = match_var[0] if match_var else "sm"
+    return [*prefilters, *combined_matches], where_part, return_var
+
+
+def _match_clauses(combined_matches: List[str], indent: str = "") -> str:
+    """Join the match fragments to MATCH clauses. Index prefilters are CALL clauses and are kept as they are."""
+    return f"\n{indent}".join(match if match.startswith("CALL ") else f"MATCH {match}" for match in combined_matches)
+
+
+def _owning_identifiable_var(var: str) -> str:
+    """
+    Return the identifier of the Identifiable node which owns the node with the given identifier.
+
+    SubmodelElement paths always start at their Submodel `sm`, the other roots are Identifiables themselves.
+    """
+    return "sm" if var.startswith("sme") else var
+
+
+def converter(ast: Condition, parameters: Optional[Dict[str, Any]] = None, paginate: bool = False,
+              per_language: bool = False) -> str:
     """
     Convert an AST Condition node to a full Cypher query string.
 
     The returned string contains MATCH, WHERE and RETURN clauses.
     - MATCH clause is assembled from match fragments collected during expression conversion.
     - WHERE clause contains the boolean expression produced by `_convert_expression`.
-    - RETURN clause returns the main identifier from the first match fragment.
+    - RETURN clause returns the distinct nodes of the main identifier from the first match fragment.
+
+    If `parameters` is given, all constants are collected in it and referenced as query parameters.
+
+    If the condition has `select` "id", only the distinct ids of the Identifiables owning the matched nodes are
+    returned, so no node has to be fetched.
+
+    If `paginate` is True, the distinct results are ordered by a stable order key, which is used for keyset
+    pagination: the id of Identifiables, or the element id of other nodes. The query then expects the parameters
+    `$cursor` (order key of the last result of the previous page or null) and `$limit`, and returns the columns
+    `result` and `cursor`. All results are sorted for every page, an index on the id of Identifiables only helps
+    if the planner starts from it. Element ids of deleted nodes may be reused by new nodes, which can then be
+    skipped or returned twice by pages requested across the deletion.
+
+    `per_language` tells if LangString texts are also saved per language, see `_convert_expression`.
 
     Example output:
         MATCH (sm:Submodel)-[:submodelElements]->(sme0:SubmodelElement {idShort: 'x'})
         WHERE sme0.value = 'some'
-        RETURN sme0
+        RETURN DISTINCT sm
 
     Raises:
         ValueError: if the provided AST is not a Condition.
     """
-    if not isinstance(ast, Condition):
-        raise ValueError(f"Expected Condition node, got {type(ast)}")
+    combined_matches, where_part, return_var = _convert_condition(ast, parameters, per_language)
+
+    cypher = _match_clauses(combined_matches)
+    cypher += "\nWHERE " + where_part
+    if ast.select == "id":
+        identifiable_var = _owning_identifiable_var(return_var)
+        if paginate:
+            cypher += f"\nWITH DISTINCT {identifiable_var}.id AS result"
+            cypher += "\nWHERE $cursor IS NULL OR result > $cursor"
+            cypher += "\nRETURN result, result AS cursor"
+            cypher += "\nORDER BY cursor"
+            cypher += "\nLIMIT $limit"
+        else:
+            cypher += f"\nRETURN DISTINCT {identifiable_var}.id AS id"
+    elif paginate:
+        order_key = "result.id" if _owning_identifiable_var(return_var) == return_var else "elementId(result)"
+        cypher += f"\nWITH DISTINCT {return_var} AS result"
+        cypher += f"\nWHERE $cursor IS NULL OR {order_key} > $cursor"
+        cypher += f"\nRETURN result, {order_key} AS cursor"
+        cypher += "\nORDER BY cursor"
+        cypher += "\nLIMIT $limit"
+    else:
+        cypher += f"\nRETURN DISTINCT {return_var}"
+    return cypher
 
-    mapping: dict[str, int] = {}
-    where_parts, match_parts = _convert_expression(ast.expr, mapping)
 
-    combined_where, combined_matches = [where_parts], _remove_duplicate_matches(match_parts)
+def batch_converter(asts: List[Condition], parameters: Optional[Dict[str, Any]] = None,
+                    share_match_clauses: bool = False, per_language: bool = False) -> str:
+    """
+    Convert multiple AST Condition nodes to one Cypher query, which evaluates all of them in a single round-trip.
 
-    first_match = combined_matches[0]
-    match_var = re.findall(r"\((\w+):", first_match)
-    return_var = match_var[0] if match_var else "sm"
+    Every condition is evaluated in its own `CALL { ... }` subquery, which aggregates its distinct results
+    into one list. The query returns one row with the columns `q0`, `q1`, ... holding the results of the
+    conditions in the given order. Constants are shared between the conditions if `parameters` are collected.
+
+    If `share_match_clauses` is True, conditions with identical MATCH clauses are evaluated in the same subquery:
+    the patterns are expanded once and the WHERE expression of each condition decides, if a row is collected
+    for its column. Conditions which only share a prefix of their MATCH clauses are not combined, the rows of
+    their longer patterns would have to be collected per row of the shared prefix in nested subqueries.
 
-    cypher = "MATCH " + "\nMATCH ".join(combined_matches)
-    cypher += "\nWHERE " + " AND ".join(combined_where)
-    cypher += f"\nRETURN {return_var}"
+    Example output:
+        CALL {
+          MATCH (sm:Submodel)
+          RETURN collect(DISTINCT CASE WHEN sm.idShort = 'a' THEN sm END) AS q0,
+                 collect(DISTINCT CASE WHEN sm.idShort = 'b' THEN sm END) AS q1
+        }
+        RETURN q0, q1
+    """
+    if not asts:
+        raise ValueError("Expected at least one Condition node")
+
+    groups: Dict[Tuple[str, ...], List[Tuple[str, str, str]]] = {}
+    for i, ast in enumerate(asts):
+        combined_matches, where_part, return_var = _convert_condition(ast, parameters, per_language)
+        if ast.select == "id":
+            return_expression = f"{_owning_identifiable_var(return_var)}.id"
+        else:
+            return_expression = return_var
+        # Without sharing, every condition gets its own group
+        group_key = tuple(combined_matches) if share_match_clauses else (str(i), *combined_matches)
+        groups.setdefault(group_key, []).append((f"q{i}", where_part, return_expression))
+
+    subqueries = []
+    for group_key, group in groups.items():
+        combined_matches = group_key if share_match_clauses else group_key[1:]
+        subquery = "CALL {\n  " + _match_clauses(combined_matches, indent="  ")
+        if len(group) == 1:
+            column, where_part, return_expression = group[0]
+            subquery += f"\n  WHERE {where_part}"
+            subquery += f"\n  RETURN collect(DISTINCT {return_expression}) AS {column}"
+        else:
+            collects = [f"collect(DISTINCT CASE WHEN {where_part} THEN {return_expression} END) AS {column}"
+                        for column, where_part, return_expression in group]
+            subquery += "\n  RETURN " + ",\n         ".join(collects)
+        subquery += "\n}"
+        subqueries.append(subquery)
+
+    cypher = "\n".join(subqueries)
+    cypher += "\nRETURN " + ", ".join(f"q{i}" for i in range(len(asts)))
     return cypher
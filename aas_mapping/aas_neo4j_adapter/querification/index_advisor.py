@@ -0,0 +1,207 @@
+"""
+Recommend indexes for the workload of compiled AASQL queries.
+
+The advisor extracts the labels and properties which are looked up in the MATCH patterns and WHERE predicates of the
+compiled Cypher queries, weights them by how often the queries run, and recommends the range, text and composite
+indexes which are missing for them.
+"""
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+# Relative benefit of an index for one lookup by the kind of the predicate, roughly the db hits it saves
+ACCESS_WEIGHTS = {
+    "equality": 10.0,
+    "range": 5.0,
+    "text": 3.0,
+}
+# Index types serving the kinds of predicates
+ACCESS_INDEX_TYPES = {
+    "equality": "RANGE",
+    "range": "RANGE",
+    "text": "TEXT",
+}
+# Operators of WHERE predicates and the kind of access they are
+PREDICATE_ACCESSES = {
+    "=": "equality",
+    "<": "range",
+    "<=": "range",
+    ">": "range",
+    ">=": "range",
+    "STARTS WITH": "range",
+    "CONTAINS": "text",
+    "ENDS WITH": "text",
+}
+
+_PROPERTY = r"(`[^`]+`|\w+)"
+_NODE_PATTERN = re.compile(r"\((\w+)\s*:\s*(\w+)\s*(?:\{([^}]*)\})?\)")
+_PATTERN_PROPERTY = re.compile(rf"{_PROPERTY}\s*:")
+_PREDICATE = re.compile(rf"\b(\w+)\.{_PROPERTY}\s*(STARTS WITH|ENDS WITH|CONTAINS|<=|>=|<>|=~|=|<|>)")
+_CREATE_INDEX = re.compile(
+    rf"CREATE\s+(?:(TEXT|RANGE|FULLTEXT)\s+)?INDEX\b.*?\bFOR\s*\(\w+\s*:\s*(\w+)\)\s*ON\s*(?:EACH\s*)?[(\[]([^)\]]*)[)\]]",
+    re.IGNORECASE)
+_INDEXED_PROPERTY = re.compile(rf"\w+\.{_PROPERTY}")
+
+
+def _unquote(name: str) -> str:
+    return name.strip("`")
+
+
+@dataclass(frozen=True)
+class PropertyAccess:
+    """
+    Lookup of nodes by properties in a query.
+
+    Attributes:
+        label (str): The label of the nodes.
+        properties (Tuple[str, ...]): The properties, more than one for a composite lookup.
+        kind (str): The kind of the predicate, one of ACCESS_WEIGHTS.
+    """
+    label: str
+    properties: Tuple[str, ...]
+    kind: str
+
+    @property
+    def index_type(self) -> str:
+        return ACCESS_INDEX_TYPES[self.kind]
+
+
+@dataclass
+class IndexRecommendation:
+    """
+    An index which is missing for the observed workload.
+
+    Attributes:
+        index_type (str): "RANGE" or "TEXT".
+        label (str): The label of the indexed nodes.
+        properties (Tuple[str, ...]): The indexed properties, more than one for a composite index.
+        uses (int): How often queries which would use the index were executed.
+        benefit (float): Estimated benefit, the weighted number of lookups served by the index.
+    """
+    index_type: str
+    label: str
+    properties: Tuple[str, ...]
+    uses: int = 0
+    benefit: float = 0.0
+
+    @property
+    def clause(self) -> str:
+        """The clause creating the index, which can be passed to `optimize_database`."""
+        properties = ", ".join(f"n.`{prop}`" if not prop.isidentifier() else f"n.{prop}" for prop in self.properties)
+        index = "TEXT INDEX" if self.index_type == "TEXT" else "INDEX"
+        return f"CREATE {index} FOR (n:{self.label}) ON ({properties});"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"index_type": self.index_type, "label": self.label, "properties": list(self.properties),
+                "uses": self.uses, "benefit": self.benefit, "clause": self.clause}
+
+
+def analyze_cypher(cypher: str) -> List[PropertyAccess]:
+    """
+    Return the property lookups of a compiled query.
+
+    Properties of node patterns, e.g. `(sme0:SubmodelElement {idShort: $p0})`, and of WHERE predicates on bound
+    variables, e.g. `sme0.value_num > $p1`, are equality, range or text lookups. Several equality lookups of the
+    same variable are additionally a composite lookup.
+    """
+    labels: Dict[str, str] = {}
+    equalities: Dict[str, List[str]] = {}
+    accesses: List[PropertyAccess] = []
+
+    def add(var: str, prop: str, kind: str):
+        if var not in labels:
+            return
+        access = PropertyAccess(labels[var], (prop,), kind)
+        if access not in accesses:
+            accesses.append(access)
+        if kind == "equality" and prop not in equalities.setdefault(var, []):
+            equalities[var].append(prop)
+
+    for var, label, properties in _NODE_PATTERN.findall(cypher):
+        labels.setdefault(var, label)
+        for prop in _PATTERN_PROPERTY.findall(properties or ""):
+            add(var, _unquote(prop), "equality")
+    for var, prop, operator in _PREDICATE.findall(cypher):
+        if operator in PREDICATE_ACCESSES:
+            add(var, _unquote(prop), PREDICATE_ACCESSES[operator])
+    for var, props in equalities.items():
+        if len(props) > 1:
+            accesses.append(PropertyAccess(labels[var], tuple(sorted(props)), "equality"))
+    return accesses
+
+
+def existing_indexes(clauses: Iterable[str]) -> List[Tuple[str, str, Tuple[str, ...]]]:
+    """Return the (index type, label, properties) of the node indexes created by the clauses."""
+    indexes = []
+    for clause in clauses:
+        match = _CREATE_INDEX.search(clause)
+        if match:
+            index_type, label, properties = match.groups()
+            properties = tuple(_unquote(prop) for prop in _INDEXED_PROPERTY.findall(properties))
+            indexes.append(((index_type or "RANGE").upper(), label, properties))
+    return indexes
+
+
+class IndexAdvisor:
+    """
+    Recommend indexes for an observed workload of compiled queries.
+
+    Queries are added with `observe`, or with `observe_profiler` from the statistics of a QueryProfiler, where
+    query shapes with more db hits weigh more. Lookups which are already served by one of the `existing_clauses`
+    are not recommended.
+    """
+
+    def __init__(self, existing_clauses: Iterable[str] = ()):
+        self.existing = set(existing_indexes(existing_clauses))
+        self._uses: Dict[PropertyAccess, int] = {}
+        self._benefits: Dict[PropertyAccess, float] = {}
+
+    def observe(self, cypher: str, count: int = 1, weight: float = 1.0):
+        """Add a compiled query, which was executed `count` times."""
+        for access in analyze_cypher(cypher):
+            self._uses[access] = self._uses.get(access, 0) + count
+            benefit = count * weight * ACCESS_WEIGHTS[access.kind] * len(access.properties)
+            self._benefits[access] = self._benefits.get(access, 0.0) + benefit
+
+    def observe_profiler(self, profiler: Any):
+        """Add the query shapes recorded by a QueryProfiler, weighted by their mean db hits."""
+        for statistics in profiler.top_shapes(len(profiler.shapes)):
+            self.observe(statistics.cypher, statistics.executions, max(1.0, statistics.mean_db_hits))
+
+    def is_indexed(self, access: PropertyAccess) -> bool:
+        return (access.index_type, access.label, access.properties) in self.existing
+
+    def recommend(self, min_uses: int = 1, limit: Optional[int] = None) -> List[IndexRecommendation]:
+        """Return the missing indexes used at least `min_uses` times, the most beneficial first."""
+        recommendations = [
+            IndexRecommendation(access.index_type, access.label, access.properties, uses, self._benefits[access])
+            for access, uses in self._uses.items()
+            if uses >= min_uses and not self.is_indexed(access)
+        ]
+        # Equality and range lookups of the same properties share one range index
+        merged: Dict[Tuple[str, str, Tuple[str, ...]], IndexRecommendation] = {}
+        for recommendation in recommendations:
+            key = (recommendation.index_type, recommendation.label, recommendation.properties)
+            if key in merged:
+                merged[key].uses += recommendation.uses
+                merged[key].benefit += recommendation.benefit
+            else:
+                merged[key] = recommendation
+        result = sorted(merged.values(), key=lambda recommendation: recommendation.benefit, reverse=True)
+        return result[:limit] if limit is not None else result
+
+
+def unused_indexes(index_rows: Iterable[Mapping[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Return the indexes which were never read, from the rows of `SHOW INDEXES`.
+
+    Lookup indexes and indexes backing constraints are never reported. Unused indexes only slow down writes,
+    but read counts are tracked since the start of the server, so they should be checked after a representative
+    period of time.
+    """
+    return [
+        {"name": row["name"], "type": row["type"], "labelsOrTypes": row["labelsOrTypes"],
+         "properties": row["properties"], "trackedSince": row.get("trackedSince")}
+        for row in index_rows
+        if row["type"] != "LOOKUP" and not row.get("owningConstraint") and not row.get("readCount")
+    ]
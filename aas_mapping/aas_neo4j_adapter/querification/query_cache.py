@@ -0,0 +1,91 @@
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, Hashable, Iterable, Optional, Tuple
+
+# Label of the nodes holding the write versions of an Identifiable label, e.g.
+# (:AASQLCacheVersion {label: 'Submodel', shard: 3}). The version of the label is the sum over its shards.
+CACHE_VERSION_LABEL = "AASQLCacheVersion"
+# Labels of the Identifiables whose writes invalidate cached query results
+IDENTIFIABLE_LABELS = ("AssetAdministrationShell", "Submodel", "ConceptDescription")
+
+_IDENTIFIABLE_LABEL_PATTERN = re.compile(rf":({'|'.join(IDENTIFIABLE_LABELS)})\b")
+
+
+def query_dependencies(cypher: str) -> FrozenSet[str]:
+    """
+    Return the labels of the Identifiables a compiled query reads, e.g. {"Submodel"} for a query over `$sme`.
+
+    The result of the query can only change, if an Identifiable with one of these labels is written.
+    """
+    return frozenset(_IDENTIFIABLE_LABEL_PATTERN.findall(cypher))
+
+
+@dataclass
+class _CacheEntry:
+    value: Any
+    versions: Dict[str, int]
+    expires_at: float
+
+
+class QueryResultCache:
+    """
+    LRU cache of query results, bounded by the number of entries and their time to live.
+
+    Every entry remembers the write versions of the labels its query depends on, which were read before the query was
+    executed. An entry is only served as long as these versions did not change, so results are consistent with all
+    writes which bump the versions, also of other processes sharing the database.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 60.0):
+        if max_size < 1:
+            raise ValueError(f"Cache size must be positive, got {max_size}")
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[Hashable, _CacheEntry] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(cypher: str, parameters: Optional[Dict[str, Any]], *extra: Hashable) -> Hashable:
+        """Return the cache key of a compiled query with its parameters and further arguments of the execution."""
+        return cypher, json.dumps(parameters or {}, sort_keys=True, default=str), extra
+
+    def get(self, key: Hashable, versions: Dict[str, int]) -> Tuple[bool, Any]:
+        """Return (True, value) if a valid entry for the current `versions` exists, (False, None) otherwise."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (entry.expires_at < time.monotonic() or entry.versions != versions):
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, entry.value
+
+    def put(self, key: Hashable, value: Any, versions: Dict[str, int]):
+        """Add the value, evicting the least recently used entries if the cache is full."""
+        with self._lock:
+            self._entries[key] = _CacheEntry(value, dict(versions), time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, labels: Optional[Iterable[str]] = None):
+        """Remove the entries depending on one of the labels, or all entries."""
+        with self._lock:
+            if labels is None:
+                self._entries.clear()
+                return
+            labels = set(labels)
+            for key in [key for key, entry in self._entries.items() if labels & entry.versions.keys()]:
+                del self._entries[key]
+
+    def __len__(self) -> int:
+        return len(self._entries)
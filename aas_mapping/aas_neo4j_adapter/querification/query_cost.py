@@ -0,0 +1,227 @@
+"""
+Static cost estimation of AASQL queries and policies guarding their execution.
+
+The estimation does not ask the database, it scores the expected work from the AST and the generated Cypher:
+how the matched patterns are anchored, if the predicates can use indexes, regular expressions, disjunctions and
+negations, which disable index prefilters, and list and variable-length expansions.
+"""
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from aas_mapping.aas_neo4j_adapter.querification.ast_nodes import *
+from aas_mapping.aas_neo4j_adapter.querification.ast_to_cypher import regex_literal_prefix
+
+# Cost of a lookup of an indexed property and of a scan over all Identifiables of a kind or all SubmodelElements
+INDEX_SEEK_COST = 1.0
+IDENTIFIABLE_SCAN_COST = 10.0
+SUBMODEL_ELEMENT_SCAN_COST = 1000.0
+# Expected number of items of a list expanded by `[]`
+LIST_FANOUT = 10.0
+# Cost of a variable-length expansion in the generated Cypher
+VARIABLE_LENGTH_EXPANSION_COST = 1000.0
+
+# Factors of the predicates applied to the matched values
+PREDICATE_FACTORS = {
+    Contains: 2.0,
+    EndsWith: 2.0,
+    Regex: 20.0,
+}
+# Factor of predicates which cannot use an index prefilter, because they are negated or part of a disjunction
+UNINDEXED_FACTOR = 2.0
+
+# Attributes of Identifiables, whose equality comparisons are served by an index
+INDEXED_IDENTIFIABLE_ATTRIBUTES = ("id", "idShort", "semanticId")
+
+_VARIABLE_LENGTH_PATTERN = re.compile(r"\[[^\]]*\*[^\]]*\]")
+
+
+@dataclass
+class CostReason:
+    """
+    One contribution to the cost of a query.
+
+    Attributes:
+        code (str): Machine readable kind of the contribution, e.g. "submodel_element_scan".
+        message (str): Human readable explanation.
+        cost (float): The cost added by the contribution.
+    """
+    code: str
+    message: str
+    cost: float
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"code": self.code, "message": self.message, "cost": self.cost}
+
+
+@dataclass
+class QueryCost:
+    """
+    Estimated cost of a query with the reasons explaining it.
+
+    Attributes:
+        score (float): The total estimated cost, roughly the number of nodes which have to be visited.
+        reasons (List[CostReason]): The contributions to the cost, the most expensive first.
+    """
+    score: float = 0.0
+    reasons: List[CostReason] = field(default_factory=list)
+
+    def add(self, code: str, message: str, cost: float):
+        self.score += cost
+        self.reasons.append(CostReason(code, message, cost))
+
+    def to_dict(self) -> Dict[str, Any]:
+        reasons = sorted(self.reasons, key=lambda reason: reason.cost, reverse=True)
+        return {"score": self.score, "reasons": [reason.to_dict() for reason in reasons]}
+
+
+class QueryRejectedError(ValueError):
+    """Raised if the estimated cost of a query exceeds the limit of the QueryCostPolicy."""
+
+    def __init__(self, cost: QueryCost, max_cost: float):
+        self.cost = cost
+        self.max_cost = max_cost
+        super().__init__(f"Query rejected: estimated cost {cost.score:g} exceeds the maximum of {max_cost:g}")
+
+    @property
+    def explanation(self) -> Dict[str, Any]:
+        """Structured explanation of the rejection, which can be returned to the client."""
+        return {"error": "query_too_expensive", "max_cost": self.max_cost, **self.cost.to_dict()}
+
+
+@dataclass
+class QueryCostPolicy:
+    """
+    Guardrails for the execution of queries depending on their estimated cost.
+
+    Attributes:
+        reject_above (Optional[float]): Queries with a higher cost are rejected with QueryRejectedError.
+        limit_above (Optional[float]): Queries with a higher cost return at most `forced_limit` results.
+        forced_limit (int): The number of results queries above `limit_above` are limited to.
+        timeout_above (Optional[float]): Queries with a higher cost run with a transaction timeout of `timeout`, use
+            0.0 for all queries.
+        timeout (Optional[float]): The transaction timeout in seconds. In a transaction of the client, queries are
+            bound to the timeout of that transaction instead and a warning is logged.
+    """
+    reject_above: Optional[float] = None
+    limit_above: Optional[float] = None
+    forced_limit: int = 100
+    timeout_above: Optional[float] = None
+    timeout: Optional[float] = None
+
+    def __post_init__(self):
+        if (self.timeout_above is None) != (self.timeout is None):
+            raise ValueError("Timeout above and timeout have to be given together")
+
+    def apply(self, cost: QueryCost) -> Tuple[Optional[int], Optional[float]]:
+        """
+        Return the forced limit and the timeout to execute a query with the given cost, None if not applicable.
+
+        Raises:
+            QueryRejectedError: if the query has to be rejected.
+        """
+        if self.reject_above is not None and cost.score > self.reject_above:
+            raise QueryRejectedError(cost, self.reject_above)
+        limit = self.forced_limit if self.limit_above is not None and cost.score > self.limit_above else None
+        timeout = self.timeout if self.timeout_above is not None and cost.score > self.timeout_above else None
+        return limit, timeout
+
+
+def _root_cost(field_: Field, indexed: bool, cost: QueryCost):
+    """Add the cost of matching the root path of the field."""
+    root, _, attribute = field_.name.partition("#")
+    if not root.startswith("$sme"):
+        if indexed and attribute in INDEXED_IDENTIFIABLE_ATTRIBUTES:
+            cost.add("index_seek", f"{field_.name} is looked up in an index", INDEX_SEEK_COST)
+        else:
+            cost.add("identifiable_scan", f"{field_.name} is compared for all Identifiables of {root}",
+                     IDENTIFIABLE_SCAN_COST)
+        return
+    parts = root.split(".")[1:]
+    if not parts or not parts[0].split("[")[0]:
+        cost.add("submodel_element_scan", f"{field_.name} is not anchored by an idShort and visits all "
+                                          f"SubmodelElements", SUBMODEL_ELEMENT_SCAN_COST)
+        return
+    path_cost = INDEX_SEEK_COST
+    expansions = root.count("[]")
+    for _ in range(expansions):
+        path_cost *= LIST_FANOUT
+    if expansions:
+        cost.add("list_expansion", f"{field_.name} expands all items of {expansions} list(s)", path_cost)
+    else:
+        cost.add("anchored_path", f"{field_.name} is anchored by its idShort path", path_cost)
+
+
+def _predicate_factor(exp: BinaryExpression) -> Tuple[float, Optional[str]]:
+    """Return the factor of the predicate and the reason for it, if it is more expensive than an equality."""
+    if isinstance(exp, Regex) and isinstance(exp.right, StringValue):
+        prefix, literal = regex_literal_prefix(exp.right.value)
+        if literal:
+            return 1.0, None
+        if prefix:
+            return PREDICATE_FACTORS[Contains], f"regex '{exp.right.value}' is narrowed by its literal prefix"
+        return PREDICATE_FACTORS[Regex], f"regex '{exp.right.value}' has no literal prefix and is evaluated " \
+                                         f"for every value"
+    factor = PREDICATE_FACTORS.get(type(exp), 1.0)
+    if factor > 1.0:
+        return factor, f"{type(exp).__name__} is served by a text index"
+    return factor, None
+
+
+def _uncast(value: Value) -> Value:
+    while isinstance(value, (StrCast, NumCast, HexCast, BoolCast, DateTimeCast, TimeCast)):
+        value = value.inner
+    return value
+
+
+def _estimate(exp: Expression, cost: QueryCost, indexed: bool):
+    """Add the cost of the expression. `indexed` tells if index prefilters can be used for it."""
+    match exp:
+        case BinaryExpression():
+            fields = [value for value in map(_uncast, (exp.left, exp.right)) if isinstance(value, Field)]
+            indexed = indexed and isinstance(exp, Eq) and len(fields) == 1
+            operand_cost = QueryCost()
+            for field_ in fields:
+                _root_cost(field_, indexed, operand_cost)
+            factor, message = _predicate_factor(exp)
+            if not indexed and fields:
+                factor *= UNINDEXED_FACTOR
+            for reason in operand_cost.reasons:
+                cost.add(reason.code, reason.message, reason.cost * factor)
+            if message is not None:
+                cost.add("expensive_predicate", message, 0.0)
+        case Not():
+            cost.add("negation", "negated expressions cannot use indexes", 0.0)
+            _estimate(exp.operand, cost, False)
+        case Or():
+            cost.add("disjunction", "every branch of $or expands all patterns of the query", 0.0)
+            for operand in exp.operands:
+                _estimate(operand, cost, False)
+        case And() | Match():
+            for operand in exp.operands:
+                _estimate(operand, cost, indexed)
+        case _:
+            raise ValueError(f"Unsupported expression type: {type(exp)}")
+
+
+def estimate_cost(ast: Condition, cypher: Optional[str] = None) -> QueryCost:
+    """
+    Estimate the cost of an AST Condition node and optionally the Cypher query generated from it.
+
+    Returns:
+        The QueryCost with the reasons explaining it.
+    """
+    if not isinstance(ast, Condition):
+        raise ValueError(f"Expected Condition node, got {type(ast)}")
+    cost = QueryCost()
+    _estimate(ast.expr, cost, True)
+    if cypher is not None:
+        add_cypher_cost(cost, cypher)
+    return cost
+
+
+def add_cypher_cost(cost: QueryCost, cypher: str):
+    """Add the cost of the patterns of a generated Cypher query, which are not visible in the AST."""
+    for pattern in _VARIABLE_LENGTH_PATTERN.findall(cypher):
+        cost.add("variable_length_expansion", f"{pattern} is a variable-length expansion",
+                 VARIABLE_LENGTH_EXPANSION_COST)
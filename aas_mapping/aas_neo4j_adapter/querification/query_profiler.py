@@ -0,0 +1,143 @@
+import hashlib
+import random
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+# Orders of `QueryProfiler.top_shapes`
+SHAPE_ORDERS = ("db_hits", "server_time", "client_time", "executions", "rows")
+
+
+def query_shape(cypher: str) -> str:
+    """
+    Return the id of the shape of a compiled query.
+
+    Compiled queries hold all constants as parameters, so their text only depends on the structure of the AST:
+    queries which only differ in their constants have the same shape.
+    """
+    return hashlib.sha1(cypher.encode()).hexdigest()[:16]
+
+
+@dataclass
+class OperatorStatistics:
+    """Totals of one planner operator in the profiled executions of a query shape."""
+    occurrences: int = 0
+    db_hits: int = 0
+    rows: int = 0
+
+
+@dataclass
+class ShapeStatistics:
+    """
+    Statistics of all executions of one query shape.
+
+    Times are in milliseconds. The server time is the time until the result was available plus the time to
+    consume it, the client time also includes the network and the processing of the records. Db hits and
+    operators are only known for the executions which ran with PROFILE.
+    """
+    shape: str
+    cypher: str
+    executions: int = 0
+    profiled_executions: int = 0
+    rows: int = 0
+    client_time: float = 0.0
+    max_client_time: float = 0.0
+    server_time: float = 0.0
+    db_hits: int = 0
+    operators: Dict[str, OperatorStatistics] = field(default_factory=dict)
+
+    @property
+    def mean_client_time(self) -> float:
+        return self.client_time / self.executions if self.executions else 0.0
+
+    @property
+    def mean_db_hits(self) -> float:
+        return self.db_hits / self.profiled_executions if self.profiled_executions else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "shape": self.shape,
+            "cypher": self.cypher,
+            "executions": self.executions,
+            "profiled_executions": self.profiled_executions,
+            "rows": self.rows,
+            "client_time": self.client_time,
+            "mean_client_time": self.mean_client_time,
+            "max_client_time": self.max_client_time,
+            "server_time": self.server_time,
+            "db_hits": self.db_hits,
+            "mean_db_hits": self.mean_db_hits,
+            "operators": {name: vars(operator) for name, operator in sorted(
+                self.operators.items(), key=lambda item: item[1].db_hits, reverse=True)},
+        }
+
+
+class QueryProfiler:
+    """
+    Collect execution statistics of queries per query shape.
+
+    Every execution is timed, `sample_rate` of them are run with PROFILE to record the db hits, rows and
+    planner operators. Profiled executions return the same records, but are slower.
+    """
+
+    def __init__(self, sample_rate: float = 0.1):
+        if not 0.0 <= sample_rate <= 1.0:
+            raise ValueError(f"Sample rate must be between 0 and 1, got {sample_rate}")
+        self.sample_rate = sample_rate
+        self.shapes: Dict[str, ShapeStatistics] = {}
+        self._lock = threading.Lock()
+
+    def sample(self) -> bool:
+        """Decide if the next execution is profiled."""
+        return self.sample_rate >= 1.0 or random.random() < self.sample_rate
+
+    def record(self, cypher: str, client_time: float, rows: int, summary: Optional[Any] = None):
+        """
+        Record one execution of a query.
+
+        Args:
+            cypher: the query without the PROFILE prefix
+            client_time: the time of the execution measured by the client in milliseconds
+            rows: the number of records returned to the client
+            summary: the `neo4j.ResultSummary` of the execution, which holds the profile, if it ran with PROFILE
+        """
+        shape = query_shape(cypher)
+        with self._lock:
+            statistics = self.shapes.setdefault(shape, ShapeStatistics(shape, cypher))
+            statistics.executions += 1
+            statistics.rows += rows
+            statistics.client_time += client_time
+            statistics.max_client_time = max(statistics.max_client_time, client_time)
+            if summary is None:
+                return
+            statistics.server_time += (summary.result_available_after or 0) + (summary.result_consumed_after or 0)
+            if summary.profile:
+                statistics.profiled_executions += 1
+                self._record_operators(statistics, summary.profile)
+
+    @classmethod
+    def _record_operators(cls, statistics: ShapeStatistics, plan: Dict[str, Any]):
+        """Add the db hits and rows of the operators of a profiled plan, which is a tree of operators."""
+        name = plan.get("operatorType", "Unknown").split("@", 1)[0]
+        operator = statistics.operators.setdefault(name, OperatorStatistics())
+        operator.occurrences += 1
+        operator.db_hits += plan.get("dbHits", 0)
+        operator.rows += plan.get("rows", 0)
+        statistics.db_hits += plan.get("dbHits", 0)
+        for child in plan.get("children", []):
+            cls._record_operators(statistics, child)
+
+    def top_shapes(self, n: int = 10, order: str = "db_hits") -> List[ShapeStatistics]:
+        """Return the `n` query shapes with the highest total of `order`, one of SHAPE_ORDERS."""
+        if order not in SHAPE_ORDERS:
+            raise ValueError(f"Unknown order: {order}, expected one of {SHAPE_ORDERS}")
+        with self._lock:
+            return sorted(self.shapes.values(), key=lambda statistics: getattr(statistics, order), reverse=True)[:n]
+
+    def dump(self, n: int = 10, order: str = "db_hits") -> List[Dict[str, Any]]:
+        """Return the statistics of the top `n` query shapes as JSON serializable dicts."""
+        return [statistics.to_dict() for statistics in self.top_shapes(n, order)]
+
+    def reset(self):
+        with self._lock:
+            self.shapes.clear()
@@ -0,0 +1,194 @@
+"""
+Pluggable tracing of the database calls and the high-level operations of the clients.
+
+Clients use the no-op `NO_OP_TRACER` by default, which records nothing and costs one attribute check per call.
+`OpenTelemetryTracer` emits the spans with OpenTelemetry, any other tracing backend can be plugged in by
+implementing `Tracer.start_span`.
+"""
+import functools
+import inspect
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, ContextManager, Dict, Iterator, Optional, Union
+
+import neo4j
+
+from aas_mapping.aas_neo4j_adapter.querification.query_profiler import query_shape
+
+
+class NoOpSpan:
+    """Span which records nothing, returned by the no-op Tracer."""
+    __slots__ = ()
+
+    def __enter__(self) -> "NoOpSpan":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> bool:
+        return False
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+
+NO_OP_SPAN = NoOpSpan()
+
+
+class Tracer:
+    """
+    Interface of the tracers, which records nothing.
+
+    Attributes:
+        enabled (bool): If False, the clients skip computing span attributes.
+    """
+    enabled = False
+
+    def start_span(self, name: str, attributes: Optional[Dict[str, Any]] = None,
+                   current: bool = True) -> ContextManager[Any]:
+        """
+        Return a context manager which starts a span on enter and ends it on exit.
+
+        Args:
+            name: the name of the span
+            attributes: the initial attributes of the span
+            current: if the span becomes the parent of spans started in the block. Spans of generators, which yield
+                to the caller in the block, must not be current.
+        Returns:
+            A context manager yielding the span, which has a `set_attribute(key, value)` method.
+        """
+        return NO_OP_SPAN
+
+
+NO_OP_TRACER = Tracer()
+
+
+class OpenTelemetryTracer(Tracer):
+    """Tracer emitting the spans with OpenTelemetry, requires the `opentelemetry-api` package."""
+    enabled = True
+
+    def __init__(self, tracer: Optional[Any] = None, instrumentation_name: str = "aas_mapping"):
+        """
+        Args:
+            tracer: an `opentelemetry.trace.Tracer`, by default the one of the global tracer provider
+            instrumentation_name: the name of the instrumentation to get the default tracer for
+        """
+        if tracer is None:
+            try:
+                from opentelemetry import trace
+            except ImportError as e:
+                raise ImportError("OpenTelemetryTracer requires the opentelemetry-api package") from e
+            tracer = trace.get_tracer(instrumentation_name)
+        self._tracer = tracer
+
+    def start_span(self, name: str, attributes: Optional[Dict[str, Any]] = None,
+                   current: bool = True) -> ContextManager[Any]:
+        if current:
+            return self._tracer.start_as_current_span(name, attributes=attributes)
+        # OpenTelemetry spans end when used as context managers
+        return self._tracer.start_span(name, attributes=attributes)
+
+
+class QueryTrace:
+    """Collects the record count and the time to the first record of a traced query."""
+    __slots__ = ("span", "start", "records", "first_record_time")
+
+    def __init__(self, span: Any):
+        self.span = span
+        self.start = time.perf_counter()
+        self.records = 0
+        self.first_record_time: Optional[float] = None
+
+    def record(self, count: int = 1):
+        """Count received records, the first call marks the time to the first record."""
+        if self.first_record_time is None and count:
+            self.first_record_time = time.perf_counter()
+        self.records += count
+
+
+class _NoOpQueryTrace:
+    __slots__ = ()
+
+    def record(self, count: int = 1):
+        pass
+
+
+_NO_OP_QUERY_TRACE = _NoOpQueryTrace()
+
+
+@contextmanager
+def trace_query(tracer: Tracer, name: str, clause: Union[str, neo4j.Query],
+                parameters: Optional[Dict[str, Any]] = None) -> Iterator[Union[QueryTrace, _NoOpQueryTrace]]:
+    """
+    Trace the execution of a Cypher query in a span, which is never current, so it can be used in generators.
+
+    The span has the query shape, the parameter count, the record count, the time to the first record and the
+    total time. Records have to be counted with `record()` of the yielded QueryTrace.
+    """
+    if not tracer.enabled:
+        yield _NO_OP_QUERY_TRACE
+        return
+    text = clause.text if isinstance(clause, neo4j.Query) else clause
+    attributes = {
+        "db.system": "neo4j",
+        "db.query.shape": query_shape(text),
+        "db.query.parameter_count": len(parameters or ()),
+    }
+    with tracer.start_span(name, attributes, current=False) as span:
+        trace = QueryTrace(span)
+        try:
+            yield trace
+        finally:
+            end = time.perf_counter()
+            span.set_attribute("db.response.returned_rows", trace.records)
+            if trace.first_record_time is not None:
+                span.set_attribute("db.time_to_first_record_ms", (trace.first_record_time - trace.start) * 1000)
+            span.set_attribute("db.total_time_ms", (end - trace.start) * 1000)
+
+
+def traced(name: Optional[str] = None) -> Callable[[Callable], Callable]:
+    """
+    Decorate a method of a client to run in a span of the client's `tracer`, named by default by its qualified name.
+
+    Spans of database calls in the method nest under its span. Generator methods get a span which is not current,
+    because they yield to the caller while the span is open. Coroutine methods are awaited in their span.
+    """
+    def decorator(func: Callable) -> Callable:
+        span_name = name or func.__qualname__
+        if inspect.isasyncgenfunction(func):
+            @functools.wraps(func)
+            async def async_generator_wrapper(self, *args, **kwargs):
+                if not self.tracer.enabled:
+                    async for item in func(self, *args, **kwargs):
+                        yield item
+                    return
+                with self.tracer.start_span(span_name, current=False):
+                    async for item in func(self, *args, **kwargs):
+                        yield item
+            return async_generator_wrapper
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def coroutine_wrapper(self, *args, **kwargs):
+                if not self.tracer.enabled:
+                    return await func(self, *args, **kwargs)
+                with self.tracer.start_span(span_name):
+                    return await func(self, *args, **kwargs)
+            return coroutine_wrapper
+
+        if inspect.isgeneratorfunction(func):
+            @functools.wraps(func)
+            def generator_wrapper(self, *args, **kwargs):
+                if not self.tracer.enabled:
+                    yield from func(self, *args, **kwargs)
+                    return
+                with self.tracer.start_span(span_name, current=False):
+                    yield from func(self, *args, **kwargs)
+            return generator_wrapper
+
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            if not self.tracer.enabled:
+                return func(self, *args, **kwargs)
+            with self.tracer.start_span(span_name):
+                return func(self, *args, **kwargs)
+        return wrapper
+    return decorator
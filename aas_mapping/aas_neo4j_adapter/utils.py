@@ -1,9 +1,12 @@
 import hashlib
 import json
 import logging
+import sys
 import time
 from collections import abc
-from dataclasses import dataclass
+from contextlib import contextmanager
+from dataclasses import dataclass, field, fields
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
 
 logger = logging.getLogger(__name__)
 
@@ -20,9 +23,61 @@ def is_iterable(obj):
     return isinstance(obj, abc.Iterable) and not isinstance(obj, (str, bytes, bytearray))
 
 
+# Phases of the ingest whose latencies are recorded by UploadStats
+INGEST_PHASES = ("parse", "flatten", "dedup", "node_write", "rel_write")
+# Upper bounds in seconds of the latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 60.0)
+
+
+def peak_rss_bytes() -> int:
+    """Return the high-water mark of the resident memory of the process, 0 if the platform does not report it."""
+    try:
+        import resource
+    except ImportError:
+        return 0
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in kilobytes on Linux and in bytes on macOS
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+@dataclass
+class Histogram:
+    """Distribution of observed values in cumulative buckets, like a Prometheus histogram."""
+    buckets: Tuple[float, ...] = LATENCY_BUCKETS
+    bucket_counts: List[int] = field(default_factory=list)
+    count: int = 0
+    sum: float = 0.0
+
+    def __post_init__(self):
+        if not self.bucket_counts:
+            self.bucket_counts = [0] * len(self.buckets)
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.bucket_counts[i] += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"count": self.count, "sum": self.sum,
+                "buckets": {str(bound): count for bound, count in zip(self.buckets, self.bucket_counts)}}
+
+
 @dataclass
 class UploadStats:
-    overall_start_time: float
+    """
+    Metrics of an ingest, available as a structured object, with `to_dict` and in the OpenMetrics text format.
+
+    Latencies are recorded per phase in histograms, one observation per file for parse and flatten, per batch for
+    dedup and node_write and per transaction for rel_write. The peak RSS is the high-water mark of the process after
+    every batch.
+    """
+    overall_start_time: float = field(default_factory=time.time)
     total_files: int = 0
     total_batches: int = 0
     batch_size: int = 0
@@ -32,10 +87,110 @@ class UploadStats:
     total_processing_time: float = 0.0
     total_node_creation_time: float = 0.0
     total_relationship_creation_time: float = 0.0
+    total_bytes_read: int = 0
+    phase_latencies: Dict[str, Histogram] = field(
+        default_factory=lambda: {phase: Histogram() for phase in INGEST_PHASES})
+    # e.g. {("Identifiable", "Referable", "Submodel"): 10}
+    nodes_per_labels: Dict[Tuple[str, ...], int] = field(default_factory=dict)
+    relationships_per_type: Dict[str, int] = field(default_factory=dict)
+    dedup_nodes_seen: int = 0
+    dedup_nodes_removed: int = 0
+    dedup_relationships_seen: int = 0
+    dedup_relationships_removed: int = 0
+    batch_peak_rss_bytes: List[int] = field(default_factory=list)
+
+    def observe_phase(self, phase: str, seconds: float):
+        if phase not in self.phase_latencies:
+            raise KeyError(f"Unknown ingest phase: {phase}, expected one of {INGEST_PHASES}")
+        self.phase_latencies[phase].observe(seconds)
+
+    @contextmanager
+    def time_phase(self, phase: str) -> Iterator[None]:
+        """Observe the duration of the block as latency of the phase."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe_phase(phase, time.perf_counter() - start)
+
+    def count_nodes(self, labels: Iterable[str], count: int):
+        labels = tuple(sorted(labels))
+        self.nodes_per_labels[labels] = self.nodes_per_labels.get(labels, 0) + count
+
+    def count_relationships(self, rel_type: str, count: int):
+        self.relationships_per_type[rel_type] = self.relationships_per_type.get(rel_type, 0) + count
+
+    def record_batch_peak_rss(self) -> int:
+        rss = peak_rss_bytes()
+        self.batch_peak_rss_bytes.append(rss)
+        return rss
+
+    @property
+    def peak_rss_bytes(self) -> int:
+        return max(self.batch_peak_rss_bytes, default=0)
+
+    @property
+    def node_dedup_ratio(self) -> float:
+        return self.dedup_nodes_removed / self.dedup_nodes_seen if self.dedup_nodes_seen else 0.0
+
+    @property
+    def relationship_dedup_ratio(self) -> float:
+        if not self.dedup_relationships_seen:
+            return 0.0
+        return self.dedup_relationships_removed / self.dedup_relationships_seen
+
+    def to_dict(self) -> Dict[str, Any]:
+        result = {f.name: getattr(self, f.name) for f in fields(self)}
+        result["phase_latencies"] = {phase: histogram.to_dict() for phase, histogram in self.phase_latencies.items()}
+        result["nodes_per_labels"] = {",".join(labels): count for labels, count in self.nodes_per_labels.items()}
+        result["relationships_per_type"] = dict(self.relationships_per_type)
+        result["node_dedup_ratio"] = self.node_dedup_ratio
+        result["relationship_dedup_ratio"] = self.relationship_dedup_ratio
+        result["peak_rss_bytes"] = self.peak_rss_bytes
+        return result
+
+    def to_openmetrics(self, prefix: str = "aas_ingest") -> str:
+        """Return the metrics in the OpenMetrics text format, which can be served to Prometheus."""
+        lines = [
+            f"# TYPE {prefix}_phase_seconds histogram",
+            f"# HELP {prefix}_phase_seconds Latency of the ingest phases.",
+        ]
+        for phase, histogram in self.phase_latencies.items():
+            for bound, count in zip(histogram.buckets, histogram.bucket_counts):
+                lines.append(f'{prefix}_phase_seconds_bucket{{phase="{phase}",le="{bound}"}} {count}')
+            lines.append(f'{prefix}_phase_seconds_bucket{{phase="{phase}",le="+Inf"}} {histogram.count}')
+            lines.append(f'{prefix}_phase_seconds_count{{phase="{phase}"}} {histogram.count}')
+            lines.append(f'{prefix}_phase_seconds_sum{{phase="{phase}"}} {histogram.sum}')
+
+        lines += [f"# TYPE {prefix}_nodes counter", f"# HELP {prefix}_nodes Nodes written per label combination."]
+        for labels, count in self.nodes_per_labels.items():
+            lines.append(f'{prefix}_nodes_total{{labels="{_escape_label_value(",".join(labels))}"}} {count}')
+        lines += [f"# TYPE {prefix}_relationships counter",
+                  f"# HELP {prefix}_relationships Relationships written per type."]
+        for rel_type, count in self.relationships_per_type.items():
+            lines.append(f'{prefix}_relationships_total{{type="{_escape_label_value(rel_type)}"}} {count}')
+
+        lines += [f"# TYPE {prefix}_dedup_seen counter", f"# HELP {prefix}_dedup_seen Items checked for duplicates.",
+                  f'{prefix}_dedup_seen_total{{kind="node"}} {self.dedup_nodes_seen}',
+                  f'{prefix}_dedup_seen_total{{kind="relationship"}} {self.dedup_relationships_seen}',
+                  f"# TYPE {prefix}_dedup_removed counter", f"# HELP {prefix}_dedup_removed Duplicates removed.",
+                  f'{prefix}_dedup_removed_total{{kind="node"}} {self.dedup_nodes_removed}',
+                  f'{prefix}_dedup_removed_total{{kind="relationship"}} {self.dedup_relationships_removed}',
+                  f"# TYPE {prefix}_dedup_ratio gauge", f"# HELP {prefix}_dedup_ratio Share of removed duplicates.",
+                  f'{prefix}_dedup_ratio{{kind="node"}} {self.node_dedup_ratio}',
+                  f'{prefix}_dedup_ratio{{kind="relationship"}} {self.relationship_dedup_ratio}']
 
-    def __init__(self):
-        super().__init__()
-        self.overall_start_time = time.time()
+        for name, metric_type, value, help_text in (
+                ("files", "counter", self.total_files, "JSON files processed."),
+                ("batches", "counter", self.total_batches, "File batches processed."),
+                ("read_bytes", "counter", self.total_bytes_read, "Bytes of JSON read."),
+                ("peak_rss_bytes", "gauge", self.peak_rss_bytes, "High-water mark of the resident memory."),
+        ):
+            suffix = "_total" if metric_type == "counter" else ""
+            lines += [f"# TYPE {prefix}_{name} {metric_type}", f"# HELP {prefix}_{name} {help_text}",
+                      f"{prefix}_{name}{suffix} {value}"]
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
 
     def finish(self):
         self.total_time = time.time() - self.overall_start_time
@@ -44,9 +199,13 @@ class UploadStats:
         logger.info(f"Total relationships created: {self.total_relationships_created}")
         logger.info(f"Total batches processed: {self.total_batches}")
         logger.info(f"Total files processed: {self.total_files}")
+        logger.info(f"Total bytes read: {self.total_bytes_read}")
         logger.info(f"Total processing time: {self.total_processing_time:.2f} seconds")
         logger.info(f"Total node creation time: {self.total_node_creation_time:.2f} seconds")
         logger.info(f"Total relationship creation time: {self.total_relationship_creation_time:.2f} seconds")
+        logger.info(f"Node dedup ratio: {self.node_dedup_ratio:.2%}, "
+                    f"relationship dedup ratio: {self.relationship_dedup_ratio:.2%}")
+        logger.info(f"Peak RSS: {self.peak_rss_bytes / 2 ** 20:.1f} MiB")
 
 
 def hash_dict_obj(obj: dict) -> str:
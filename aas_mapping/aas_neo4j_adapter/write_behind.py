@@ -0,0 +1,337 @@
+"""
+Write-behind buffer, which turns many small writes of SubmodelElements into few batched writes.
+
+Gateways adding one element per call pay a lookup of the parent and an upload per element. The buffer queues the
+added elements and the new values of Properties instead and writes all of them with one lookup of the parents and
+one upload in a single transaction, when `max_writes` writes are pending, `max_delay` seconds after the first pending
+write or on `flush()`.
+"""
+import copy
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+from neo4j.exceptions import DriverError, Neo4jError
+
+from aas_mapping.aas_neo4j_adapter.aas_neo4j_client import AASNeo4JClient
+from aas_mapping.aas_neo4j_adapter.utils import UploadStats
+
+logger = logging.getLogger(__name__)
+
+# Attributes holding the child Referables by the modelType of their parent, "value" for all other parents
+CHILD_ELEMENTS_ATTRIBUTES = {
+    "Submodel": "submodelElements",
+    "Entity": "statements",
+    "AnnotatedRelationshipElement": "annotations",
+}
+
+
+@dataclass(frozen=True)
+class BufferedWrite:
+    """
+    A write accepted by the `WriteBehindBuffer`, as it is passed to its durability hooks.
+
+    Attributes:
+        kind (str): "insert" of a SubmodelElement or "update" of the value of a Property.
+        parent_id (str): The id of the Identifiable.
+        id_short_path (Optional[str]): The canonical idShortPath of the parent of the inserted element, None for
+            elements of a Submodel, or the idShortPath of the updated Property.
+        element (Optional[Dict]): The inserted SubmodelElement.
+        value (Optional[str]): The new value of the Property.
+    """
+    kind: str
+    parent_id: str
+    id_short_path: Optional[str]
+    element: Optional[Dict] = None
+    value: Optional[str] = None
+
+
+def _is_retryable(error: Exception) -> bool:
+    return isinstance(error, (Neo4jError, DriverError)) and error.is_retryable()
+
+
+def _relative_path(path: Optional[str], prefix: Optional[str]) -> Optional[str]:
+    """Return the idShortPath relative to the prefix, None if the path is not at or below the prefix."""
+    path = path or ""
+    if not prefix:
+        return path
+    if path == prefix:
+        return ""
+    if path.startswith(prefix + ".") or path.startswith(prefix + "["):
+        return path[len(prefix):]
+    return None
+
+
+def _child_elements(element: Dict) -> List[Dict]:
+    return element.setdefault(CHILD_ELEMENTS_ATTRIBUTES.get(element.get("modelType"), "value"), [])
+
+
+def _descend(element: Dict, relative_path: str) -> Optional[Dict]:
+    """Return the Referable at the idShortPath relative to the element, None if there is none."""
+    for id_short in AASNeo4JClient.itemize_id_short_path(relative_path):
+        children = element.get(CHILD_ELEMENTS_ATTRIBUTES.get(element.get("modelType"), "value"))
+        if not isinstance(children, list):
+            return None
+        if isinstance(id_short, int):
+            element = children[id_short] if id_short < len(children) else None
+        else:
+            element = next((child for child in children
+                            if isinstance(child, dict) and child.get("idShort") == id_short), None)
+        if element is None:
+            return None
+    return element
+
+
+class WriteBehindBuffer:
+    """
+    Buffer of added SubmodelElements and updated Property values, which are written in batches.
+
+    Repeated updates of the same Property are coalesced, so only the last value is written. Elements and values
+    added below an element which is still buffered are merged into it. Additions are grouped by their parent, all
+    parents are found with one clause and all elements are uploaded at once, so the throughput is bounded by the
+    batch size rather than by round trips.
+
+    Reads of the buffer see its pending writes. The durability hooks allow to keep the pending writes in a
+    write-ahead log, which is replayed with `replay` after a crash:
+
+        with WriteBehindBuffer(client, on_enqueue=log.append, on_flush=lambda writes, stats: log.clear()) as buffer:
+            buffer.add_submodel_element(element, submodel_id, "Measurements")
+            buffer.update_value(submodel_id, "Status.Temperature", "21.5")
+
+    A flush, which failed with a retryable error, keeps the writes in the buffer. Otherwise they are dropped and
+    passed to `on_error`. The buffer is thread-safe, writes wait while a flush is running.
+
+    A flush in a transaction of the client, e.g. one triggered by a write in `client.transaction()`, joins it. Its
+    writes are only durable after the commit, so `on_flush` is called after the commit and the writes are queued
+    again if the transaction is rolled back.
+    """
+
+    def __init__(self, client: AASNeo4JClient, max_writes: int = 1000, max_delay: Optional[float] = 1.0,
+                 on_enqueue: Optional[Callable[[BufferedWrite], None]] = None,
+                 on_flush: Optional[Callable[[List[BufferedWrite], UploadStats], None]] = None,
+                 on_error: Optional[Callable[[List[BufferedWrite], Exception], None]] = None):
+        """
+        Args:
+            client: the client writing the batches
+            max_writes: the number of pending writes, which triggers a flush
+            max_delay: the maximal seconds a write is pending before it is flushed in the background,
+                None to only flush on `max_writes` and `flush()`
+            on_enqueue: called with every write before it is accepted, a raised exception rejects the write
+            on_flush: called with the written writes and the stats of the upload after their transaction committed,
+                which may be the transaction of the caller of the flush
+            on_error: called with the dropped writes and the error, if a flush failed with a non-retryable error
+        """
+        if max_writes < 1:
+            raise ValueError(f"Max writes must be positive, got {max_writes}")
+        self.client = client
+        self.max_writes = max_writes
+        self.max_delay = max_delay
+        self.on_enqueue = on_enqueue
+        self.on_flush = on_flush
+        self.on_error = on_error
+        self._lock = threading.RLock()
+        self._timer: Optional[threading.Timer] = None
+        self._reset()
+
+    def _reset(self):
+        # Added elements by their parent, which is found at the flush
+        self._inserts: Dict[Tuple[str, Optional[str]], List[Dict]] = {}
+        # Last value by the id of the Identifiable and the idShortPath of the Property
+        self._updates: Dict[Tuple[str, str], Optional[str]] = {}
+        self._writes: List[BufferedWrite] = []
+        self._pending_writes = 0
+
+    @property
+    def pending_writes(self) -> int:
+        """The number of pending writes after coalescing."""
+        return self._pending_writes
+
+    def __enter__(self) -> "WriteBehindBuffer":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        """Flush the pending writes and stop the background flush."""
+        self.flush()
+
+    def add_submodel_element(self, obj: Dict, parent_id: str, id_short_path: Optional[str] = None):
+        """Queue adding the SubmodelElement below the parent, like `AASNeo4JClient.add_submodel_element`."""
+        id_short_path = AASNeo4JClient.canonical_id_short_path(id_short_path) if id_short_path else None
+        self.enqueue(BufferedWrite("insert", parent_id, id_short_path, element=copy.deepcopy(obj)))
+
+    def update_value(self, parent_id: str, id_short_path: str, value: Optional[str]):
+        """Queue setting the value of the Property, like `AASNeo4JClient.update_property_values`."""
+        if not id_short_path:
+            raise ValueError("ID short path should be provided for Property values")
+        self.enqueue(BufferedWrite("update", parent_id, AASNeo4JClient.canonical_id_short_path(id_short_path),
+                                   value=value))
+
+    def enqueue(self, write: BufferedWrite):
+        """
+        Accept the write after passing it to `on_enqueue` and flush if `max_writes` writes are pending.
+
+        A retryable error of the flush is not raised, since the write stays in the buffer and must not be enqueued
+        again.
+        """
+        with self._lock:
+            if self.on_enqueue is not None:
+                self.on_enqueue(write)
+            self._apply(write)
+            self._flush_if_full()
+
+    def replay(self, writes: List[BufferedWrite]):
+        """Accept writes of a write-ahead log again, without passing them to `on_enqueue`."""
+        with self._lock:
+            for write in writes:
+                self._apply(write)
+            self._flush_if_full()
+
+    def _flush_if_full(self):
+        if self._pending_writes < self.max_writes:
+            return
+        try:
+            self.flush()
+        except Exception as e:
+            # In a transaction of the caller, the writes are queued again when it is rolled back
+            if not _is_retryable(e) or self.client.in_transaction:
+                raise
+            # The flush kept the writes and is retried by the next write or in the background
+
+    def _requeue(self, writes: List[BufferedWrite]):
+        """Queue the writes of a rolled back flush again, before the writes which were accepted since."""
+        with self._lock:
+            accepted = self._writes
+            self._cancel_flush()
+            self._reset()
+            for write in writes + accepted:
+                self._apply(write)
+
+    def _apply(self, write: BufferedWrite):
+        if write.kind not in ("insert", "update"):
+            raise ValueError(f"Unknown kind of write: {write.kind}")
+        if not self._writes:
+            self._schedule_flush()
+        self._writes.append(write)
+        pending_element = self._pending_element(write.parent_id, write.id_short_path)
+        if write.kind == "insert":
+            if pending_element is not None:
+                _child_elements(pending_element).append(copy.deepcopy(write.element))
+            else:
+                self._inserts.setdefault((write.parent_id, write.id_short_path), []).append(
+                    copy.deepcopy(write.element))
+            self._pending_writes += 1
+        elif pending_element is not None:
+            pending_element["value"] = write.value
+        else:
+            key = (write.parent_id, write.id_short_path)
+            if key not in self._updates:
+                self._pending_writes += 1
+            self._updates[key] = write.value
+
+    def _pending_element(self, parent_id: str, id_short_path: Optional[str]) -> Optional[Dict]:
+        """Return the buffered element at the idShortPath or the buffered element containing it."""
+        if not id_short_path:
+            return None
+        for (insert_parent_id, parent_path), elements in self._inserts.items():
+            if insert_parent_id != parent_id or _relative_path(id_short_path, parent_path) is None:
+                continue
+            for element in elements:
+                if not element.get("idShort"):
+                    # Items of SubmodelElementLists get their index, and so their idShortPath, at the flush
+                    continue
+                element_path = f"{parent_path}.{element['idShort']}" if parent_path else element["idShort"]
+                relative_path = _relative_path(id_short_path, element_path)
+                if relative_path is not None:
+                    return _descend(element, relative_path)
+        return None
+
+    def _schedule_flush(self):
+        if self.max_delay is not None and self._timer is None:
+            self._timer = threading.Timer(self.max_delay, self._flush_in_background)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _cancel_flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def _flush_in_background(self):
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("Background flush of the write-behind buffer failed")
+
+    def flush(self) -> Optional[UploadStats]:
+        """
+        Write all pending writes in one transaction.
+
+        Returns:
+            The stats of the upload of the added elements, None if no writes were pending.
+        """
+        with self._lock:
+            self._cancel_flush()
+            if not self._writes:
+                return None
+            writes, inserts, updates, pending_writes = \
+                self._writes, self._inserts, self._updates, self._pending_writes
+            self._reset()
+            joined = self.client.in_transaction
+            try:
+                with self.client.transaction():
+                    stats = self.client.add_submodel_elements(inserts)
+                    updated = self.client.update_property_values(updates)
+            except Exception as e:
+                if joined:
+                    # The failed transaction of the caller can only be rolled back, which queues the writes again
+                    self.client.after_transaction(lambda: None, lambda: self._requeue(writes))
+                elif _is_retryable(e):
+                    logger.warning(f"Flush of {len(writes)} writes failed and will be retried: {e}")
+                    self._writes, self._inserts, self._updates, self._pending_writes = \
+                        writes, inserts, updates, pending_writes
+                    self._schedule_flush()
+                elif self.on_error is not None:
+                    self.on_error(writes, e)
+                raise
+            if updated < len(updates):
+                logger.warning(f"Only {updated} of {len(updates)} Property values were updated, "
+                               f"the other Properties were not found")
+            if joined:
+                self.client.after_transaction(lambda: self._flushed(writes, stats), lambda: self._requeue(writes))
+            else:
+                self._flushed(writes, stats)
+            return stats
+
+    def _flushed(self, writes: List[BufferedWrite], stats: UploadStats):
+        if self.on_flush is not None:
+            self.on_flush(writes, stats)
+
+    def get_referable(self, parent_id: str, id_short_path: Optional[str] = None) -> Dict:
+        """Return the Referable like `AASNeo4JClient.get_referable`, including the pending writes of the buffer."""
+        id_short_path = AASNeo4JClient.canonical_id_short_path(id_short_path) if id_short_path else None
+        with self._lock:
+            pending_element = self._pending_element(parent_id, id_short_path)
+            if pending_element is not None:
+                return copy.deepcopy(pending_element)
+            data = self.client.get_referable(parent_id, id_short_path)
+            for (insert_parent_id, parent_path), elements in self._inserts.items():
+                relative_path = _relative_path(parent_path, id_short_path)
+                if insert_parent_id != parent_id or relative_path is None:
+                    continue
+                parent = _descend(data, relative_path)
+                if parent is not None:
+                    _child_elements(parent).extend(copy.deepcopy(elements))
+            for (update_parent_id, path), value in self._updates.items():
+                relative_path = _relative_path(path, id_short_path)
+                if update_parent_id != parent_id or relative_path is None:
+                    continue
+                element = _descend(data, relative_path)
+                if element is not None:
+                    element["value"] = value
+            return data
+
+    def get_identifiable(self, identifier: str) -> Dict:
+        return self.get_referable(identifier)
@@ -0,0 +1,114 @@
+"""
+Timing, result and baseline helpers shared by the benchmarks.
+
+Results are JSON documents with the environment, the workload and per stage timing summaries. A run can be compared
+with the results of an earlier run, the baseline, and fails if a stage became slower than the allowed regression.
+"""
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Tuple
+
+# Metric of the stage summaries compared with the baseline, independent of the size of the workload
+BASELINE_METRIC = "median_per_item_us"
+
+
+def percentile(samples: List[float], q: float) -> float:
+    """Return the `q` percentile (0-100) of the samples, interpolating linearly between the closest ranks."""
+    ordered = sorted(samples)
+    if not ordered:
+        raise ValueError("No samples")
+    rank = (len(ordered) - 1) * q / 100
+    lower = int(rank)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
+
+
+def summarize(samples: List[float], items: int) -> Dict[str, float]:
+    """
+    Return the summary of the timing samples of a stage.
+
+    Args:
+        samples: the durations of the runs of the stage in seconds
+        items: the number of items, e.g. nodes or queries, processed by one run
+    """
+    median = statistics.median(samples)
+    return {
+        "runs": len(samples),
+        "items": items,
+        "min_s": min(samples),
+        "median_s": median,
+        "mean_s": statistics.fmean(samples),
+        "p95_s": percentile(samples, 95),
+        "p99_s": percentile(samples, 99),
+        "max_s": max(samples),
+        BASELINE_METRIC: median / items * 1e6 if items else 0.0,
+        "items_per_s": items / median if median else 0.0,
+    }
+
+
+def timed(func: Callable[[], Any]) -> Tuple[float, Any]:
+    """Run the function and return its duration in seconds and its result."""
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def environment() -> Dict[str, str]:
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+
+
+def compare_to_baseline(results: Dict[str, Any], baseline: Dict[str, Any], max_regression: float) -> List[str]:
+    """
+    Return a message for every stage which is slower than in the baseline by more than `max_regression`.
+
+    Stages are compared by their median time per item, so baselines stay comparable if the workload size changes.
+    Stages missing in one of the results are skipped.
+    """
+    regressions = []
+    for name, stage in results["stages"].items():
+        baseline_stage = baseline.get("stages", {}).get(name)
+        if not baseline_stage or not baseline_stage.get(BASELINE_METRIC):
+            continue
+        current, previous = stage[BASELINE_METRIC], baseline_stage[BASELINE_METRIC]
+        change = current / previous - 1
+        if change > max_regression:
+            regressions.append(f"{name}: {current:.3f} us/item vs. {previous:.3f} us/item in the baseline "
+                               f"(+{change:.1%}, allowed +{max_regression:.1%})")
+    return regressions
+
+
+def add_common_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--repeat", type=int, default=5, help="runs of every stage, the median is reported")
+    parser.add_argument("--output", help="file to write the JSON results to, stdout if not given")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare with")
+    parser.add_argument("--max-regression", type=float, default=0.1,
+                        help="allowed slowdown per stage compared with the baseline, e.g. 0.1 for 10%%")
+
+
+def finish(results: Dict[str, Any], args: argparse.Namespace) -> int:
+    """Write the results and compare them with the baseline. Return the exit code, 1 if a stage regressed."""
+    document = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(document)
+    else:
+        print(document)
+    if not args.baseline:
+        return 0
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = compare_to_baseline(results, baseline, args.max_regression)
+    for regression in regressions:
+        print(f"REGRESSION {regression}", file=sys.stderr)
+    return 1 if regressions else 0
@@ -0,0 +1,113 @@
+"""
+Benchmark of the ingest pipeline on a synthetic workload scaled from the IDTA templates.
+
+    python -m aas_mapping.benchmarks.ingest --instances 200 --output baseline.json
+    python -m aas_mapping.benchmarks.ingest --instances 200 --baseline baseline.json --max-regression 0.15
+
+The stages flatten (`_process_json_data`), group (`_group_nodes_by_label`) and deduplicate (`_deduplicate_nodes`,
+`_deduplicate_rels`) run without a database and are timed separately. The db_write stage only runs if `--uri` is
+given and writes the workload once into that database.
+"""
+import argparse
+import json
+import logging
+import sys
+from dataclasses import asdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from aas_mapping.aas_neo4j_adapter.aas_neo4j_client import AASNeo4JClient, AAS_NEO4J_MODEL_CONFIG
+from aas_mapping.benchmarks.common import add_common_arguments, environment, finish, summarize, timed
+from aas_mapping.benchmarks.workload import WorkloadSpec, generate_workload
+
+logger = logging.getLogger(__name__)
+
+STAGES = ("flatten", "group", "deduplicate")
+
+
+def _flatten(client: AASNeo4JClient, environments: List[Dict[str, Any]]) -> Tuple[List[Dict], Dict[str, List]]:
+    nodes, relationships = [], {}
+    for env in environments:
+        env_nodes, env_relationships = client._process_json_data(env)
+        nodes.extend(env_nodes)
+        client._merge_relationships(relationships, env_relationships)
+    return nodes, relationships
+
+
+def _count_relationships(relationships: Dict[str, List]) -> int:
+    return sum(len(rels) for rels in relationships.values())
+
+
+def run_ingest_benchmark(spec: WorkloadSpec, repeat: int = 5, db_client: Optional[AASNeo4JClient] = None,
+                         db_batch_size: int = 10000) -> Dict[str, Any]:
+    """
+    Run the ingest stages `repeat` times on the workload and return the JSON serializable results.
+
+    Every run uses a fresh client, so the deduplication starts without known nodes. Times per item are per flattened
+    node. If `db_client` is given, the workload is written once into its database as the db_write stage.
+    """
+    environments = list(generate_workload(spec))
+    samples: Dict[str, List[float]] = {stage: [] for stage in STAGES}
+    for _ in range(repeat):
+        client = AASNeo4JClient(uri=None, user=None, model_config=AAS_NEO4J_MODEL_CONFIG)
+        duration, (nodes, relationships) = timed(lambda: _flatten(client, environments))
+        samples["flatten"].append(duration)
+        node_count, relationship_count = len(nodes), _count_relationships(relationships)
+        duration, grouped_nodes = timed(lambda: client._group_nodes_by_label(nodes))
+        samples["group"].append(duration)
+        duration, _ = timed(lambda: (client._deduplicate_nodes(grouped_nodes),
+                                     client._deduplicate_rels(relationships)))
+        samples["deduplicate"].append(duration)
+
+    kept_nodes = sum(len(group) for group in grouped_nodes.values())
+    kept_relationships = _count_relationships(relationships)
+    results = {
+        "benchmark": "ingest",
+        "environment": environment(),
+        "workload": {
+            **asdict(spec),
+            "input_bytes": sum(len(json.dumps(env)) for env in environments),
+            "nodes": node_count,
+            "relationships": relationship_count,
+            "node_dedup_ratio": 1 - kept_nodes / node_count if node_count else 0.0,
+            "relationship_dedup_ratio": 1 - kept_relationships / relationship_count if relationship_count else 0.0,
+        },
+        "stages": {stage: summarize(stage_samples, node_count) for stage, stage_samples in samples.items()},
+    }
+
+    if db_client is not None:
+        nodes, relationships = _flatten(db_client, environments)
+        duration, _ = timed(lambda: db_client._upload_nodes_and_relationships(
+            nodes, relationships, db_batch_size=db_batch_size))
+        results["stages"]["db_write"] = summarize([duration], node_count)
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--instances", type=int, default=WorkloadSpec.instances)
+    parser.add_argument("--depth", type=int, default=WorkloadSpec.depth)
+    parser.add_argument("--list-width", type=int, default=WorkloadSpec.list_width)
+    parser.add_argument("--duplication-ratio", type=float, default=WorkloadSpec.duplication_ratio)
+    parser.add_argument("--seed", type=int, default=WorkloadSpec.seed)
+    parser.add_argument("--uri", help="Neo4j URI to also benchmark the db_write stage, the workload is written into it")
+    parser.add_argument("--user", default="neo4j")
+    parser.add_argument("--password")
+    parser.add_argument("--db-batch-size", type=int, default=10000)
+    add_common_arguments(parser)
+    args = parser.parse_args(argv)
+
+    spec = WorkloadSpec(args.instances, args.depth, args.list_width, args.duplication_ratio, args.seed)
+    db_client = None
+    if args.uri:
+        db_client = AASNeo4JClient(uri=args.uri, user=args.user, password=args.password,
+                                   model_config=AAS_NEO4J_MODEL_CONFIG)
+    try:
+        results = run_ingest_benchmark(spec, args.repeat, db_client, args.db_batch_size)
+    finally:
+        if db_client is not None:
+            db_client.driver.close()
+    return finish(results, args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,164 @@
+"""
+Benchmark of the query compiler and the exporter.
+
+    python -m aas_mapping.benchmarks.roundtrip --output baseline.json
+    python -m aas_mapping.benchmarks.roundtrip --baseline baseline.json --fixtures recorded_subgraphs/
+
+Every example query in `examples/queries` and generated large queries (deep $and/$or trees, long idShort paths)
+are parsed with `parse_aasql_query` and compiled with `converter`. Subgraphs in the JSON format returned by
+`apoc.convert.toJson`, generated from the synthetic workload in growing sizes or recorded in `--fixtures`, are
+converted back with `convert_subgraph_to_data_dict`. All timings are reported with percentiles.
+"""
+import argparse
+import json
+import os
+import sys
+from typing import Any, Dict, List, Optional
+
+from aas_mapping.aas_neo4j_adapter.aas_neo4j_client import AASNeo4JClient, AAS_NEO4J_MODEL_CONFIG
+from aas_mapping.aas_neo4j_adapter.querification.aasql_to_ast import parse_aasql_query
+from aas_mapping.aas_neo4j_adapter.querification.ast_to_cypher import converter
+from aas_mapping.benchmarks.common import add_common_arguments, environment, finish, summarize, timed
+from aas_mapping.benchmarks.workload import WorkloadSpec, generate_workload
+
+EXAMPLE_QUERIES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "examples", "queries")
+# List widths of the generated subgraphs
+SUBGRAPH_SIZES = (10, 100, 300)
+
+
+def load_example_queries(queries_dir: str = EXAMPLE_QUERIES_DIR) -> Dict[str, Dict[str, Any]]:
+    queries = {}
+    for file_name in sorted(os.listdir(queries_dir)):
+        if file_name.endswith(".json"):
+            with open(os.path.join(queries_dir, file_name), encoding="utf-8") as f:
+                queries[file_name.removesuffix(".json")] = json.load(f)
+    return queries
+
+
+def _comparison(i: int) -> Dict[str, Any]:
+    return {"$gt": [{"$field": f"$sme.Level{i}#value"}, {"$numVal": i}]}
+
+
+def nested_query(depth: int, width: int = 2) -> Dict[str, Any]:
+    """Return a query with a tree of alternating $and and $or of the given depth, with width^depth comparisons."""
+    counter = iter(range(width ** depth))
+
+    def expression(level: int) -> Dict[str, Any]:
+        if level == depth:
+            return _comparison(next(counter))
+        return {"$and" if level % 2 == 0 else "$or": [expression(level + 1) for _ in range(width)]}
+
+    return {"$condition": expression(0)}
+
+
+def long_path_query(length: int, list_every: int = 0) -> Dict[str, Any]:
+    """Return a query comparing an element at an idShort path of the given length, every `list_every` a list."""
+    parts = [f"Level{i}" + ("[]" if list_every and i % list_every == list_every - 1 else "") for i in range(length)]
+    return {"$condition": {"$eq": [{"$field": "$sme." + ".".join(parts) + "#value"}, {"$strVal": "value"}]}}
+
+
+def generated_queries() -> Dict[str, Dict[str, Any]]:
+    return {
+        "generated_and_or_depth_4": nested_query(4),
+        "generated_and_or_depth_8": nested_query(8),
+        "generated_and_width_64": nested_query(1, 64),
+        "generated_path_length_16": long_path_query(16),
+        "generated_path_length_16_lists": long_path_query(16, list_every=4),
+    }
+
+
+def subgraph_from_identifiable(client: AASNeo4JClient, obj: Dict[str, Any]) -> Dict[str, Any]:
+    """Return the subgraph of the Identifiable as it is returned by `_get_subgraph_of_referable`, root node first."""
+    nodes, relationships = client._process_identifiable(obj)
+    nodes.insert(0, nodes.pop())
+
+    def node(properties: Dict[str, Any]) -> Dict[str, Any]:
+        return {"id": str(properties["uid"]), "type": "node", "labels": list(properties["labels"]),
+                "properties": {key: value for key, value in properties.items() if key != "labels"}}
+
+    return {
+        "nodes": [node(properties) for properties in nodes],
+        "relationships": [
+            {"id": f"{rel_type}_{i}", "type": "relationship", "label": rel_type, "start": {"id": str(rel["from_uid"])},
+             "end": {"id": str(rel["to_uid"])}, "properties": rel["rel_props"]}
+            for rel_type, rels in relationships.items() for i, rel in enumerate(rels)
+        ],
+    }
+
+
+def generated_subgraphs(client: AASNeo4JClient, sizes=SUBGRAPH_SIZES) -> Dict[str, Dict[str, Any]]:
+    subgraphs = {}
+    for size in sizes:
+        env = next(generate_workload(WorkloadSpec(instances=1, depth=4, list_width=size)))
+        subgraphs[f"generated_list_width_{size}"] = subgraph_from_identifiable(client, env["submodels"][0])
+    return subgraphs
+
+
+def load_subgraph_fixtures(fixtures_dir: str) -> Dict[str, Dict[str, Any]]:
+    """Return the recorded subgraphs, JSON files with the `nodes` and `relationships` of apoc.convert.toJson."""
+    fixtures = {}
+    for file_name in sorted(os.listdir(fixtures_dir)):
+        if file_name.endswith(".json"):
+            with open(os.path.join(fixtures_dir, file_name), encoding="utf-8") as f:
+                fixtures[file_name.removesuffix(".json")] = json.load(f)
+    return fixtures
+
+
+def _time_each(items: Dict[str, Any], func, repeat: int) -> Dict[str, List[float]]:
+    return {name: [timed(lambda: func(item))[0] for _ in range(repeat)] for name, item in items.items()}
+
+
+def _totals(samples: Dict[str, List[float]], repeat: int) -> List[float]:
+    return [sum(item_samples[i] for item_samples in samples.values()) for i in range(repeat)]
+
+
+def run_roundtrip_benchmark(repeat: int = 100, fixtures_dir: Optional[str] = None,
+                            subgraph_sizes=SUBGRAPH_SIZES) -> Dict[str, Any]:
+    """
+    Time parsing and compiling of all queries and exporting of all subgraphs `repeat` times.
+
+    The stages parse, compile and export are the totals over all queries or subgraphs per run, with times per item
+    per query or per node. The timings of every single query and subgraph are reported separately.
+    """
+    queries = {**load_example_queries(), **generated_queries()}
+    asts = {name: parse_aasql_query(query) for name, query in queries.items()}
+    parse_samples = _time_each(queries, parse_aasql_query, repeat)
+    compile_samples = _time_each(asts, converter, repeat)
+
+    client = AASNeo4JClient(uri=None, user=None, model_config=AAS_NEO4J_MODEL_CONFIG)
+    subgraphs = generated_subgraphs(client, subgraph_sizes)
+    if fixtures_dir:
+        subgraphs.update(load_subgraph_fixtures(fixtures_dir))
+    export_repeat = max(1, repeat // 10)
+    export_samples = _time_each(subgraphs, client.convert_subgraph_to_data_dict, export_repeat)
+    node_counts = {name: len(subgraph["nodes"]) for name, subgraph in subgraphs.items()}
+
+    return {
+        "benchmark": "roundtrip",
+        "environment": environment(),
+        "stages": {
+            "parse": summarize(_totals(parse_samples, repeat), len(queries)),
+            "compile": summarize(_totals(compile_samples, repeat), len(queries)),
+            "export": summarize(_totals(export_samples, export_repeat), sum(node_counts.values())),
+        },
+        "queries": {
+            name: {"parse": summarize(parse_samples[name], 1), "compile": summarize(compile_samples[name], 1)}
+            for name in queries
+        },
+        "subgraphs": {name: summarize(samples, node_counts[name]) for name, samples in export_samples.items()},
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fixtures", help="directory with recorded subgraph JSON files to export")
+    parser.add_argument("--subgraph-sizes", type=int, nargs="*", default=list(SUBGRAPH_SIZES),
+                        help="list widths of the generated subgraphs to export")
+    add_common_arguments(parser)
+    parser.set_defaults(repeat=100)
+    args = parser.parse_args(argv)
+    return finish(run_roundtrip_benchmark(args.repeat, args.fixtures, args.subgraph_sizes), args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
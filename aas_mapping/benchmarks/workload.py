@@ -0,0 +1,116 @@
+"""
+Synthetic AAS workload scaled from the IDTA submodel templates.
+
+Every instance is a copy of one of the templates with a unique id, extended by a nested SubmodelElementCollection
+chain and a SubmodelElementList. The semanticIds of the generated elements are shared between all instances with
+the probability `duplication_ratio`, so the ratio controls how much of the workload the deduplication removes.
+"""
+import json
+import os
+import random
+from copy import deepcopy
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List
+
+TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "examples", "submodels")
+SEMANTIC_ID_PREFIX = "https://example.com/benchmark/"
+
+
+@dataclass
+class WorkloadSpec:
+    """
+    Parameters of a synthetic workload. The same spec always generates the same workload.
+
+    Attributes:
+        instances (int): The number of generated submodels, the templates are used round-robin.
+        depth (int): The nesting depth of the generated SubmodelElementCollections, 0 for none.
+        list_width (int): The number of items of the generated SubmodelElementList, 0 for none.
+        duplication_ratio (float): The share of generated elements whose semanticId is shared between instances.
+        seed (int): The seed of the random values.
+    """
+    instances: int = 100
+    depth: int = 3
+    list_width: int = 10
+    duplication_ratio: float = 0.5
+    seed: int = 0
+
+    def __post_init__(self):
+        if not 0.0 <= self.duplication_ratio <= 1.0:
+            raise ValueError(f"Duplication ratio must be between 0 and 1, got {self.duplication_ratio}")
+
+
+def load_templates(templates_dir: str = TEMPLATES_DIR) -> List[Dict[str, Any]]:
+    """Return the submodels of all AAS environment files in the directory, ordered by file name."""
+    templates = []
+    for file_name in sorted(os.listdir(templates_dir)):
+        if file_name.endswith(".json"):
+            with open(os.path.join(templates_dir, file_name), encoding="utf-8") as f:
+                templates.extend(json.load(f).get("submodels", []))
+    if not templates:
+        raise ValueError(f"No submodel templates found in {templates_dir}")
+    return templates
+
+
+class _Generator:
+    def __init__(self, spec: WorkloadSpec):
+        self.spec = spec
+        self.rng = random.Random(spec.seed)
+
+    def semantic_id(self, name: str, instance: int) -> Dict[str, Any]:
+        value = SEMANTIC_ID_PREFIX + name
+        if self.rng.random() >= self.spec.duplication_ratio:
+            value += f"/{instance}"
+        return {"type": "ExternalReference", "keys": [{"type": "GlobalReference", "value": value}]}
+
+    def property_element(self, id_short: str, instance: int) -> Dict[str, Any]:
+        return {
+            "modelType": "Property",
+            "idShort": id_short,
+            "semanticId": self.semantic_id(id_short, instance),
+            "valueType": "xs:double",
+            "value": str(round(self.rng.uniform(0, 1000), 3)),
+        }
+
+    def collection_element(self, level: int, instance: int) -> Dict[str, Any]:
+        value = [self.property_element("Value", instance), self.property_element("Limit", instance)]
+        if level + 1 < self.spec.depth:
+            value.append(self.collection_element(level + 1, instance))
+        return {
+            "modelType": "SubmodelElementCollection",
+            "idShort": f"Level{level}",
+            "semanticId": self.semantic_id(f"Level{level}", instance),
+            "value": value,
+        }
+
+    def list_element(self, instance: int) -> Dict[str, Any]:
+        return {
+            "modelType": "SubmodelElementList",
+            "idShort": "Items",
+            "typeValueListElement": "SubmodelElementCollection",
+            "value": [
+                {
+                    "modelType": "SubmodelElementCollection",
+                    "semanticId": self.semantic_id("Item", instance),
+                    "value": [self.property_element("Quantity", instance), self.property_element("Price", instance)],
+                }
+                for _ in range(self.spec.list_width)
+            ],
+        }
+
+    def submodel(self, template: Dict[str, Any], instance: int) -> Dict[str, Any]:
+        submodel = deepcopy(template)
+        submodel["id"] = f"{template['id']}/instance/{instance}"
+        elements = submodel.setdefault("submodelElements", [])
+        if self.spec.depth:
+            elements.append(self.collection_element(0, instance))
+        if self.spec.list_width:
+            elements.append(self.list_element(instance))
+        return submodel
+
+
+def generate_workload(spec: WorkloadSpec, templates: List[Dict[str, Any]] = None) -> Iterator[Dict[str, Any]]:
+    """Yield one AAS environment with one submodel per instance of the workload."""
+    templates = templates or load_templates()
+    generator = _Generator(spec)
+    for instance in range(spec.instances):
+        yield {"submodels": [generator.submodel(templates[instance % len(templates)], instance)]}
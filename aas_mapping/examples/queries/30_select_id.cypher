@@ -0,0 +1,3 @@
+MATCH (sm:Submodel)-[:submodelElements]->(sme0:SubmodelElement {idShort: 'ProductClassifications'})-[:value]->(sme1:SubmodelElement {idShort: 'ProductClassificationItem'})-[:value]->(sme2:SubmodelElement {idShort: 'ProductClassId'})
+WHERE sme2.value = '27-37-09-05'
+RETURN DISTINCT sm.id AS id
\ No newline at end of file
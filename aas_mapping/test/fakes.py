@@ -0,0 +1,224 @@
+"""
+Fake Neo4j driver shared by the tests, so clients can be tested without a database.
+
+The driver creates all nodes and relationships it gets, records the clauses run in its sessions and transactions and
+answers all other clauses with the records returned by `respond`, which tests override for the clauses they need.
+"""
+import asyncio
+import threading
+from types import SimpleNamespace
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from aas_mapping.aas_neo4j_adapter.aas_neo4j_client import AASNeo4JClient
+
+# Summary of every fake result, as far as the clients read it
+SUMMARY = SimpleNamespace(result_available_after=2, result_consumed_after=1, profile=None)
+
+
+class FakeResult(list):
+    """Records of a clause."""
+
+    def single(self):
+        return self[0] if self else None
+
+    def consume(self):
+        return SUMMARY
+
+
+class LazyResult:
+    """Records of a clause, which are produced while they are consumed, like those of a streamed result."""
+
+    def __init__(self, records: Iterable):
+        self.records = iter(records)
+
+    def __iter__(self):
+        return self.records
+
+    def single(self):
+        return next(self.records, None)
+
+    def consume(self):
+        for _ in self.records:
+            pass
+        return SUMMARY
+
+
+class FakeTransaction:
+    """Transaction, whose `state` is "open", "committed" or "rolled back"."""
+
+    def __init__(self, driver: "FakeDriver"):
+        self.driver = driver
+        self.state = "open"
+
+    def run(self, clause, parameters=None, **kwargs):
+        return self.driver.run("transaction", clause, {**(parameters or {}), **kwargs})
+
+    def commit(self):
+        self.state = "committed"
+
+    def close(self):
+        if self.state == "open":
+            self.state = "rolled back"
+
+
+class FakeSession:
+    def __init__(self, driver: "FakeDriver"):
+        self.driver = driver
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def run(self, clause, parameters=None, **kwargs):
+        return self.driver.run("session", clause, {**(parameters or {}), **kwargs})
+
+    def begin_transaction(self, **kwargs):
+        transaction = FakeTransaction(self.driver)
+        with self.driver.lock:
+            self.driver.transactions.append(transaction)
+        return transaction
+
+    def execute_write(self, work):
+        transaction = self.begin_transaction()
+        try:
+            result = work(transaction)
+            transaction.commit()
+            return result
+        finally:
+            transaction.close()
+
+
+class FakeDriver:
+    """
+    Driver of a fake database, which is thread-safe.
+
+    Attributes:
+        clauses (List[Tuple[str, str]]): The clauses run, by "session" or "transaction".
+        created_uids (List[int]): The uids of the created nodes.
+        transactions (List[FakeTransaction]): The transactions begun.
+        fetch_sizes (List[Optional[int]]): The fetch sizes of the sessions.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clauses: List[Tuple[str, str]] = []
+        self.created_uids: List[int] = []
+        self.transactions: List[FakeTransaction] = []
+        self.fetch_sizes: List[Optional[int]] = []
+
+    @property
+    def states(self) -> List[str]:
+        """The states of the transactions."""
+        return [transaction.state for transaction in self.transactions]
+
+    def session(self, fetch_size: Optional[int] = None, **kwargs) -> FakeSession:
+        with self.lock:
+            self.fetch_sizes.append(fetch_size)
+        return FakeSession(self)
+
+    def run(self, runner: str, clause: str, parameters: Dict[str, Any]):
+        with self.lock:
+            self.clauses.append((runner, clause))
+        if "data" in parameters:
+            uids = [node["uid"] for nodes in parameters["data"].values() for node in nodes]
+            with self.lock:
+                self.created_uids.extend(uids)
+            return FakeResult({"uid": uid, "internal_id": f"4:{uid}"} for uid in uids)
+        if "relationships" in parameters:
+            return FakeResult([{"created": len(parameters["relationships"])}])
+        return self.respond(clause, parameters)
+
+    def respond(self, clause: str, parameters: Dict[str, Any]):
+        """Return the result of a clause, which creates no nodes or relationships."""
+        return FakeResult()
+
+
+class FakeAsyncResult:
+    def __init__(self, result):
+        self.result = result
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for record in self.result:
+            await asyncio.sleep(0)
+            yield record
+
+    async def single(self):
+        return self.result.single()
+
+    async def consume(self):
+        return self.result.consume()
+
+
+class FakeAsyncTransaction(FakeTransaction):
+    async def run(self, clause, parameters=None, **kwargs):
+        await asyncio.sleep(0)
+        return FakeAsyncResult(super().run(clause, parameters, **kwargs))
+
+    async def commit(self):
+        super().commit()
+
+    async def close(self):
+        super().close()
+
+
+class FakeAsyncSession(FakeSession):
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def run(self, clause, parameters=None, **kwargs):
+        await asyncio.sleep(0)
+        return FakeAsyncResult(super().run(clause, parameters, **kwargs))
+
+    async def begin_transaction(self, **kwargs):
+        transaction = FakeAsyncTransaction(self.driver)
+        with self.driver.lock:
+            self.driver.transactions.append(transaction)
+        return transaction
+
+
+class FakeAsyncDriver(FakeDriver):
+    """Async driver of a fake database, see `FakeDriver`."""
+
+    def session(self, fetch_size: Optional[int] = None, **kwargs) -> FakeAsyncSession:
+        with self.lock:
+            self.fetch_sizes.append(fetch_size)
+        return FakeAsyncSession(self)
+
+
+def submodel(i: int) -> Dict[str, Any]:
+    """Return a Submodel with 20 Properties, which all share the same semanticId."""
+    semantic_id = {"type": "ExternalReference", "keys": [{"type": "GlobalReference", "value": "https://example.com/x"}]}
+    return {
+        "modelType": "Submodel",
+        "id": f"https://example.com/submodel/{i}",
+        "semanticId": semantic_id,
+        "submodelElements": [
+            {"modelType": "Property", "idShort": f"P{j}", "valueType": "xs:int", "value": str(j),
+             "semanticId": semantic_id}
+            for j in range(20)
+        ],
+    }
+
+
+def subgraph(client: AASNeo4JClient, obj: Dict[str, Any]) -> Dict[str, Any]:
+    """Return the subgraph of the Identifiable as the database returns it to `_get_subgraph_of_referable`."""
+    nodes, relationships = client._process_identifiable(obj)
+    nodes.insert(0, nodes.pop())
+    return {
+        "nodes": [{"id": str(node["uid"]), "type": "node", "labels": list(node["labels"]),
+                   "properties": {key: value for key, value in node.items() if key != "labels"}}
+                  for node in nodes],
+        "relationships": [
+            {"id": f"{rel_type}_{i}", "type": "relationship", "label": rel_type, "start": {"id": str(rel["from_uid"])},
+             "end": {"id": str(rel["to_uid"])}, "properties": rel["rel_props"]}
+            for rel_type, rels in relationships.items() for i, rel in enumerate(rels)
+        ],
+    }
@@ -0,0 +1,105 @@
+import unittest
+
+from aas_mapping.aas_neo4j_adapter.aas_neo4j_client import AASNeo4JClient, AAS_NEO4J_MODEL_CONFIG
+from aas_mapping.aas_neo4j_adapter.querification.aasql_to_ast import parse_aasql_query
+from aas_mapping.aas_neo4j_adapter.querification.ast_evaluator import InMemoryGraph, evaluate
+from aas_mapping.aas_neo4j_adapter.querification.ast_to_cypher import converter
+
+
+def _submodel(id_: str, weight: str, documents: list) -> dict:
+    return {
+        "modelType": "Submodel",
+        "id": id_,
+        "idShort": "TechnicalData",
+        "semanticId": {"type": "ExternalReference", "keys": [{"type": "GlobalReference", "value": "sem/" + id_}]},
+        "submodelElements": [
+            {"modelType": "Property", "idShort": "Weight", "valueType": "xs:double", "value": weight},
+            {"modelType": "Property", "idShort": "Code", "valueType": "xs:string", "value": weight},
+            {"modelType": "MultiLanguageProperty", "idShort": "Name", "value": [
+                {"language": "en", "text": "Motor"}, {"language": "nl", "text": "Motor " + id_}]},
+            {"modelType": "SubmodelElementList", "idShort": "Documents", "value": [
+                {"modelType": "SubmodelElementCollection", "value": [
+                    {"modelType": "Property", "idShort": "Class", "valueType": "xs:string", "value": class_},
+                    {"modelType": "Property", "idShort": "Language", "valueType": "xs:string", "value": language},
+                ]}
+                for class_, language in documents
+            ]},
+        ]
+    }
+
+
+SHELL = {"modelType": "AssetAdministrationShell", "id": "aas/1", "idShort": "Shell", "submodels": [
+    {"type": "ModelReference", "keys": [{"type": "Submodel", "value": "sm/2"}]}]}
+
+
+class TestAstEvaluator(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        client = AASNeo4JClient(uri=None, user=None, model_config=AAS_NEO4J_MODEL_CONFIG)
+        nodes, relationships = [], {}
+        for obj in (_submodel("sm/1", "80", [("03-01", "de"), ("02-01", "nl")]),
+                    _submodel("sm/2", "120.5", [("03-01", "nl")]),
+                    SHELL):
+            obj_nodes, obj_relationships = client._process_identifiable(obj)
+            nodes += obj_nodes
+            client._merge_relationships(relationships, obj_relationships)
+        cls.graph = InMemoryGraph(nodes, relationships)
+
+    def ids(self, condition: dict) -> list:
+        return evaluate(parse_aasql_query({"$select": "id", "$condition": condition}), self.graph)
+
+    def test_comparisons(self):
+        self.assertEqual(["sm/2"], self.ids({"$gt": [{"$field": "$sme.Weight#value"}, {"$numVal": 100}]}))
+        self.assertEqual(["sm/1"], self.ids({"$not": {"$gt": [{"$field": "$sme.Weight#value"}, {"$numVal": 100}]}}))
+        self.assertEqual(["sm/1", "sm/2"], self.ids({"$or": [
+            {"$eq": [{"$field": "$sme.Weight#value"}, {"$strVal": "80"}]},
+            {"$regex": [{"$field": "$sm#semanticId"}, {"$strVal": "sem/sm/[2-9]"}]},
+        ]}))
+        self.assertEqual([], self.ids({"$eq": [{"$field": "$sme.Missing#value"}, {"$strVal": "80"}]}))
+
+    def test_typed_comparisons_follow_the_value_type(self):
+        # Like the Cypher query, only values of a numeric valueType have a value_num
+        code = {"$field": "$sme.Code#value"}
+        self.assertEqual([], self.ids({"$gt": [code, {"$numVal": 100}]}))
+        self.assertEqual(["sm/2"], self.ids({"$gt": [{"$numCast": code}, {"$numVal": 100}]}))
+        self.assertEqual(["sm/1"], self.ids({"$eq": [code, {"$strVal": "80"}]}))
+
+    def test_sme_conditions_return_submodels(self):
+        ast = parse_aasql_query({"$condition": {"$gt": [{"$field": "$sme.Weight#value"}, {"$numVal": 100}]}})
+        self.assertTrue(converter(ast).endswith("\nRETURN DISTINCT sm"))
+        self.assertEqual([("Submodel", "sm/2")],
+                         [(node["labels"][0], node["id"]) for node in evaluate(ast, self.graph)])
+
+    def test_match_correlates_list_items(self):
+        def documents(class_: str, language: str) -> dict:
+            return {"$match": [
+                {"$eq": [{"$field": "$sme.Documents[].Class#value"}, {"$strVal": class_}]},
+                {"$eq": [{"$field": "$sme.Documents[].Language#value"}, {"$strVal": language}]},
+            ]}
+
+        self.assertEqual(["sm/2"], self.ids(documents("03-01", "nl")))
+        self.assertEqual(["sm/1"], self.ids(documents("02-01", "nl")))
+        self.assertEqual(["sm/1", "sm/2"], self.ids({"$and": documents("03-01", "nl")["$match"]}))
+
+    def test_match_pairs_lang_strings(self):
+        self.assertEqual(["sm/2"], self.ids({"$match": [
+            {"$eq": [{"$field": "$sme.Name#language"}, {"$strVal": "nl"}]},
+            {"$eq": [{"$field": "$sme.Name#value"}, {"$strVal": "Motor sm/2"}]},
+        ]}))
+        self.assertEqual([], self.ids({"$match": [
+            {"$eq": [{"$field": "$sme.Name#language"}, {"$strVal": "en"}]},
+            {"$eq": [{"$field": "$sme.Name#value"}, {"$strVal": "Motor sm/2"}]},
+        ]}))
+
+    def test_shells_are_joined_with_their_submodels(self):
+        self.assertEqual(["aas/1"], self.ids({"$and": [
+            {"$eq": [{"$field": "$aas#idShort"}, {"$strVal": "Shell"}]},
+            {"$gt": [{"$field": "$sme.Weight#value"}, {"$numVal": 100}]},
+        ]}))
+        result = evaluate(parse_aasql_query({"$condition": {
+            "$eq": [{"$field": "$sm#idShort"}, {"$strVal": "TechnicalData"}]}}), self.graph)
+        self.assertEqual(["sm/1", "sm/2"], [node["id"] for node in result])
+
+
+if __name__ == '__main__':
+    unittest.main()
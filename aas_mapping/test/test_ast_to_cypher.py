@@ -0,0 +1,173 @@
+import unittest
+
+from aas_mapping.aas_neo4j_adapter.querification.aasql_to_ast import parse_aasql_query, AASQLSyntaxError
+from aas_mapping.aas_neo4j_adapter.querification.ast_to_cypher import converter, batch_converter
+
+
+def _field(name: str) -> dict:
+    return {"$field": name}
+
+
+class TestAstToCypher(unittest.TestCase):
+    def test_constants_as_parameters(self):
+        ast = parse_aasql_query({"$condition": {"$and": [
+            {"$eq": [_field("$sme.Color#value"), {"$strVal": "Blue"}]},
+            {"$eq": [_field("$sme.Material#value"), {"$strVal": "Blue"}]},
+        ]}})
+        parameters = {}
+        cypher = converter(ast, parameters=parameters)
+        self.assertEqual({"p0": "Color", "p1": "Blue", "p2": "Material"}, parameters)
+        self.assertIn("(sme0:SubmodelElement {idShort: $p0})", cypher)
+        self.assertIn("sme0.value = $p1 AND sme1.value = $p1", cypher)
+        self.assertNotIn("'", cypher)
+
+    def test_paginated_query(self):
+        ast = parse_aasql_query({"$condition": {"$eq": [_field("$sm#idShort"), {"$strVal": "TechnicalData"}]}})
+        cypher = converter(ast, paginate=True)
+        self.assertEqual(
+            "MATCH (sm:Submodel)\n"
+            "WHERE sm.idShort = 'TechnicalData'\n"
+            "WITH DISTINCT sm AS result\n"
+            "WHERE $cursor IS NULL OR result.id > $cursor\n"
+            "RETURN result, result.id AS cursor\n"
+            "ORDER BY cursor\n"
+            "LIMIT $limit",
+            cypher
+        )
+        ast = parse_aasql_query({"$condition": {"$eq": [_field("$sme.Weight#value"), {"$numVal": 100}]}})
+        # Like the pages, the unpaginated results are distinct, also if several elements of a Submodel match
+        self.assertTrue(converter(ast).endswith("\nRETURN DISTINCT sm"))
+
+    def test_select_id_returns_ids_of_owning_identifiables(self):
+        ast = parse_aasql_query({"$select": "id", "$condition": {
+            "$eq": [_field("$sme.Weight#value"), {"$numVal": 100}]}})
+        self.assertEqual("id", ast.select)
+        cypher = converter(ast)
+        self.assertTrue(cypher.endswith("\nRETURN DISTINCT sm.id AS id"))
+        paginated_cypher = converter(ast, paginate=True)
+        self.assertIn("WITH DISTINCT sm.id AS result\nWHERE $cursor IS NULL OR result > $cursor", paginated_cypher)
+
+    def test_unsupported_select(self):
+        with self.assertRaises(ValueError):
+            parse_aasql_query({"$select": "idShort", "$condition": {
+                "$eq": [_field("$sm#idShort"), {"$strVal": "TechnicalData"}]}})
+
+    def test_syntax_errors_have_paths(self):
+        with self.assertRaises(AASQLSyntaxError) as context:
+            parse_aasql_query({"$condition": {"$or": [
+                {"$eq": [_field("$sm#idShort"), {"$strVal": "TechnicalData"}]},
+                {"$gt": [_field("$sme.Weight#value"), {"$numVal": "100"}]},
+            ]}})
+        self.assertEqual("$condition.$or[1].$gt[1].$numVal", context.exception.path)
+        with self.assertRaises(AASQLSyntaxError) as context:
+            parse_aasql_query({"$condition": {"$not": {"$eq": [_field("$sm#id")], "$ne": []}}})
+        self.assertEqual("$condition.$not", context.exception.path)
+
+    def test_equal_subexpressions_are_interned(self):
+        eq = {"$eq": [_field("$sm#idShort"), {"$strVal": "TechnicalData"}]}
+        ast = parse_aasql_query({"$condition": {"$or": [eq, {"$not": eq}]}})
+        self.assertIs(ast.expr.operands[0], ast.expr.operands[1].operand)
+        self.assertIs(ast, parse_aasql_query({"$condition": {"$or": [eq, {"$not": eq}]}}))
+        self.assertEqual({ast.expr}, {parse_aasql_query({"$condition": {"$or": [eq, {"$not": eq}]}}).expr})
+
+    def test_typed_comparisons_use_shadow_properties(self):
+        def where_part(query: dict) -> str:
+            return converter(parse_aasql_query({"$condition": query})).split("\n")[1]
+
+        self.assertEqual("WHERE sme0.value_num > 80",
+                         where_part({"$gt": [_field("$sme.Temperature#value"), {"$numVal": 80}]}))
+        self.assertEqual("WHERE coalesce(sme0.value_datetime, datetime(sme0.value)) < datetime('2024-01-01')",
+                         where_part({"$lt": [{"$dateTimeCast": _field("$sme.Date#value")},
+                                             {"$dateTimeCast": {"$strVal": "2024-01-01"}}]}))
+        self.assertEqual("WHERE coalesce(sme0.min_num, toFloat(sme0.min)) >= toFloat('5')",
+                         where_part({"$ge": [{"$numCast": _field("$sme.Range#min")}, {"$strVal": "5"}]}))
+        self.assertEqual("WHERE sme0.value = 'Blue'",
+                         where_part({"$eq": [_field("$sme.Color#value"), {"$strVal": "Blue"}]}))
+
+    def test_cast_fields_convert_values_without_typed_copy(self):
+        # xs:string Properties have no value_num, so the cast converts their value like before
+        cypher = converter(parse_aasql_query({"$condition": {
+            "$gt": [{"$numCast": _field("$sme.Weight#value")}, {"$numVal": 100}]}}))
+        self.assertIn("WHERE coalesce(sme0.value_num, toFloat(sme0.value)) > 100", cypher)
+
+    def test_semantic_id_uses_denormalized_key(self):
+        cypher = converter(parse_aasql_query({"$condition": {
+            "$eq": [_field("$sme#semanticId"), {"$strVal": "0173-1#02-BAF016#006"}]}}))
+        self.assertNotIn("[:semanticId]", cypher)
+        self.assertIn("WHERE sme0.semanticId_value = '0173-1#02-BAF016#006'", cypher)
+
+    def test_shells_and_submodels_are_joined_over_resolved_references(self):
+        cypher = converter(parse_aasql_query({"$condition": {"$and": [
+            {"$eq": [_field("$aas#idShort"), {"$strVal": "Shell"}]},
+            {"$eq": [_field("$sm#idShort"), {"$strVal": "TechnicalData"}]},
+        ]}}))
+        self.assertIn("MATCH (aas)-[:submodels]->(:Reference)-[:resolvesTo]->(sm)\n", cypher)
+        self.assertTrue(cypher.endswith("RETURN DISTINCT aas"))
+
+    def test_text_searches_use_indexes(self):
+        cypher = converter(parse_aasql_query({"$condition": {"$and": [
+            {"$contains": [_field("$sme.Title#description"), {"$strVal": "Motor"}]},
+            {"$regex": [_field("$sme.Serial#value"), {"$strVal": "SN[0-9]{4}"}]},
+        ]}}))
+        self.assertTrue(cypher.startswith("CALL db.index.fulltext.queryNodes('referable_text', "
+                                          "'description_text:/.*motor.*/') YIELD node AS sme0\nMATCH "))
+        self.assertIn("ANY(text IN sme0.description_text WHERE text CONTAINS 'Motor')", cypher)
+        self.assertIn("(sme1.value STARTS WITH 'SN' AND sme1.value =~ 'SN[0-9]{4}')", cypher)
+
+        cypher = converter(parse_aasql_query({"$condition": {"$not": {
+            "$contains": [_field("$sme.Title#description"), {"$strVal": "Motor"}]}}}))
+        self.assertNotIn("CALL", cypher)
+
+    def test_fulltext_prefilter_only_for_indexed_lists(self):
+        for field, operator in (("$sme.Name#language", "$contains"), ("$sm#semanticId.keys[].value", "$starts-with")):
+            cypher = converter(parse_aasql_query({"$condition": {operator: [_field(field), {"$strVal": "abc"}]}}))
+            self.assertNotIn("CALL", cypher)
+            self.assertIn("ANY(text IN ", cypher)
+
+        cypher = converter(parse_aasql_query({"$condition": {"$and": [
+            {"$contains": [_field("$sme.Title#description"), {"$strVal": "Motor"}]},
+            {"$contains": [_field("$sme.Name#description"), {"$strVal": "Pump"}]},
+        ]}}))
+        self.assertEqual(1, cypher.count("CALL db.index.fulltext.queryNodes"))
+        self.assertIn("ANY(text IN sme1.description_text WHERE text CONTAINS 'Pump')", cypher)
+
+    def test_lang_string_pairs_use_per_language_properties(self):
+        ast = parse_aasql_query({"$condition": {"$match": [
+            {"$eq": [_field("$sme.Name#language"), {"$strVal": "nl"}]},
+            {"$eq": [_field("$sme.Name#value"), {"$strVal": "Naam"}]},
+        ]}})
+        self.assertIn("WHERE sme0.`value_text__nl` = 'Naam'\n", converter(ast, per_language=True))
+        self.assertIn("WHERE 'nl' IN sme0.value_language AND ", converter(ast))
+
+        # The language of the value says nothing about the language of the description
+        ast = parse_aasql_query({"$condition": {"$match": [
+            {"$eq": [_field("$sme.X#language"), {"$strVal": "de"}]},
+            {"$eq": [_field("$sme.X#description"), {"$strVal": "foo"}]},
+        ]}})
+        self.assertEqual(converter(ast), converter(ast, per_language=True))
+        self.assertNotIn("__de", converter(ast, per_language=True))
+
+    def test_batch_with_shared_match_clauses(self):
+        asts = [
+            parse_aasql_query({"$condition": {"$eq": [_field("$sm#idShort"), {"$strVal": "A"}]}}),
+            parse_aasql_query({"$condition": {"$eq": [_field("$sme.X#value"), {"$strVal": "A"}]}}),
+            parse_aasql_query({"$select": "id", "$condition": {"$eq": [_field("$sm#idShort"), {"$strVal": "B"}]}}),
+        ]
+        parameters = {}
+        cypher = batch_converter(asts, parameters=parameters, share_match_clauses=True)
+        self.assertEqual(2, cypher.count("CALL {"))
+        self.assertIn("collect(DISTINCT CASE WHEN sm.idShort = $p0 THEN sm END) AS q0", cypher)
+        self.assertIn("collect(DISTINCT CASE WHEN sm.idShort = $p2 THEN sm.id END) AS q2", cypher)
+        self.assertIn("RETURN collect(DISTINCT sm) AS q1", cypher)
+        self.assertTrue(cypher.endswith("\nRETURN q0, q1, q2"))
+        self.assertEqual(3, batch_converter(asts).count("CALL {"))
+        # Conditions only sharing a prefix of their MATCH clauses are evaluated separately
+        asts.append(parse_aasql_query({"$condition": {"$and": [
+            {"$eq": [_field("$sme.X#value"), {"$strVal": "A"}]},
+            {"$eq": [_field("$sme.Y#value"), {"$strVal": "B"}]},
+        ]}}))
+        self.assertEqual(3, batch_converter(asts, share_match_clauses=True).count("CALL {"))
+
+
+if __name__ == '__main__':
+    unittest.main()
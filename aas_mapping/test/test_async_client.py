@@ -0,0 +1,59 @@
+import asyncio
+import json
+import unittest
+
+from aas_mapping.aas_neo4j_adapter.async_aas_neo4j_client import AsyncAASNeo4JClient
+from aas_mapping.aas_neo4j_adapter.aas_neo4j_client import AAS_NEO4J_MODEL_CONFIG
+from aas_mapping.test.fakes import FakeAsyncDriver, FakeResult, subgraph, submodel
+
+
+class SubgraphsDriver(FakeAsyncDriver):
+    """Async driver of a database without Identifiables for the uploads, which reads the given subgraphs."""
+
+    def __init__(self, subgraphs):
+        super().__init__()
+        self.subgraphs = subgraphs
+
+    def respond(self, clause, parameters):
+        if "found" in clause:
+            return FakeResult([{"found": False}])
+        if "ORDER BY id" in clause:
+            return FakeResult({"id": identifier} for identifier in self.subgraphs)
+        if "parent_id" in parameters:
+            subgraph = self.subgraphs.get(parameters["parent_id"])
+            return FakeResult([{"json": json.dumps(subgraph)}] if subgraph else [])
+        return FakeResult()
+
+
+class TestAsyncClient(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.client = AsyncAASNeo4JClient(uri=None, user=None, model_config=AAS_NEO4J_MODEL_CONFIG)
+        self.client.mapper.resolve_model_references_on_upload = False
+        self.client.mapper.track_cache_versions = False
+        self.objects = [submodel(i) for i in range(12)]
+        self.subgraphs = {obj["id"]: subgraph(self.client.mapper, obj) for obj in self.objects}
+        self.client.driver = SubgraphsDriver(self.subgraphs)
+
+    async def test_get_identifiable_reconstructs_the_subgraph(self):
+        identifier = self.objects[3]["id"]
+        expected = self.client.mapper.convert_subgraph_to_data_dict(self.subgraphs[identifier])
+        self.assertEqual(expected, await self.client.get_identifiable(identifier))
+        with self.assertRaises(KeyError):
+            await self.client.get_identifiable("https://example.com/unknown")
+
+    async def test_iter_identifiables_keeps_order(self):
+        ids = [data["id"] async for data in self.client.iter_identifiables(prefetch=4)]
+        self.assertEqual(list(self.subgraphs), ids)
+
+    async def test_concurrent_adds(self):
+        stats = await asyncio.gather(*(self.client.add_identifiable(obj) for obj in self.objects))
+        created = self.client.driver.created_uids
+        self.assertEqual(len(created), len(set(created)))
+        # The shared semanticId Reference is only created by one of the uploads
+        self.assertEqual(12 * 21 + 1, sum(s.total_nodes_created for s in stats))
+        self.assertEqual(sum(s.dedup_relationships_seen - s.dedup_relationships_removed for s in stats),
+                         sum(s.total_relationships_created for s in stats))
+
+
+if __name__ == '__main__':
+    unittest.main()
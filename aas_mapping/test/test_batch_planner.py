@@ -0,0 +1,44 @@
+import unittest
+
+from aas_mapping.aas_neo4j_adapter.aas_neo4j_client import AASNeo4JClient, AAS_NEO4J_MODEL_CONFIG
+from aas_mapping.aas_neo4j_adapter.jsonification.batch_planner import BatchPlanner, MiB
+
+
+class TestBatchPlanner(unittest.TestCase):
+    def test_packs_files_by_nodes(self):
+        planner = BatchPlanner(max_batch_nodes=100, nodes_per_byte=1 / 10)
+        batches = list(planner.plan([("a", 500), ("b", 400), ("c", 200), ("d", 10)]))
+        self.assertEqual([["a", "b"], ["c", "d"]], [batch.files for batch in batches])
+        self.assertEqual([90, 21], [batch.estimated_nodes for batch in batches])
+        self.assertFalse(any(batch.split for batch in batches))
+
+    def test_packs_files_by_memory_and_count(self):
+        planner = BatchPlanner(max_batch_memory=4 * MiB, max_batch_files=2, nodes_per_byte=1 / 100,
+                               bytes_per_node=1024, parsed_bytes_per_byte=0)
+        files = [("a", 200_000), ("b", 200_000), ("c", 10), ("d", 10), ("e", 10)]
+        self.assertEqual([["a", "b"], ["c", "d"], ["e"]], [batch.files for batch in planner.plan(files)])
+
+    def test_oversized_file_is_split(self):
+        planner = BatchPlanner(max_batch_nodes=100, nodes_per_byte=1 / 10)
+        batches = list(planner.plan([("a", 100), ("huge", 5000), ("b", 100)]))
+        self.assertEqual([(["a"], False), (["huge"], True), (["b"], False)],
+                         [(batch.files, batch.split) for batch in batches])
+
+    def test_observe_calibrates_later_batches(self):
+        planner = BatchPlanner(max_batch_nodes=100, nodes_per_byte=1 / 10)
+        batches = planner.plan([("a", 600), ("b", 600), ("c", 600)])
+        self.assertEqual(["a"], next(batches).files)
+        planner.observe(600, 6)
+        self.assertEqual(["b", "c"], next(batches).files)
+
+    def test_split_json_data_yields_single_identifiables(self):
+        client = AASNeo4JClient(uri=None, user=None, model_config=AAS_NEO4J_MODEL_CONFIG)
+        env = {"submodels": [{"id": "a"}, {"id": "b"}], "conceptDescriptions": [{"id": "c"}]}
+        parts = list(client._split_json_data(env))
+        self.assertEqual(3, len(parts))
+        self.assertIn({"submodels": [{"id": "b"}]}, parts)
+        self.assertIn({"conceptDescriptions": [{"id": "c"}]}, parts)
+
+
+if __name__ == '__main__':
+    unittest.main()
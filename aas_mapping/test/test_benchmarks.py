@@ -0,0 +1,41 @@
+import unittest
+
+from aas_mapping.benchmarks.common import compare_to_baseline, percentile, summarize
+from aas_mapping.benchmarks.ingest import run_ingest_benchmark
+from aas_mapping.benchmarks.roundtrip import run_roundtrip_benchmark
+from aas_mapping.benchmarks.workload import WorkloadSpec, generate_workload
+
+
+class TestBenchmarks(unittest.TestCase):
+    def test_workload_is_reproducible(self):
+        spec = WorkloadSpec(instances=3, depth=2, list_width=2)
+        workload = list(generate_workload(spec))
+        self.assertEqual(workload, list(generate_workload(spec)))
+        self.assertEqual(3, len({env["submodels"][0]["id"] for env in workload}))
+        self.assertNotEqual(workload, list(generate_workload(WorkloadSpec(instances=3, depth=2, list_width=2, seed=1))))
+
+    def test_duplication_ratio_controls_deduplication(self):
+        def node_dedup_ratio(duplication_ratio: float) -> float:
+            spec = WorkloadSpec(instances=4, depth=2, list_width=5, duplication_ratio=duplication_ratio)
+            return run_ingest_benchmark(spec, repeat=1)["workload"]["node_dedup_ratio"]
+
+        self.assertGreater(node_dedup_ratio(1.0), node_dedup_ratio(0.0))
+
+    def test_roundtrip_benchmark(self):
+        results = run_roundtrip_benchmark(repeat=2, subgraph_sizes=(2,))
+        self.assertEqual({"parse", "compile", "export"}, set(results["stages"]))
+        self.assertIn("generated_and_or_depth_8", results["queries"])
+        self.assertGreater(results["subgraphs"]["generated_list_width_2"]["items"], 0)
+
+    def test_compare_to_baseline(self):
+        self.assertEqual(2.5, percentile([1, 2, 3, 4], 50))
+        baseline = {"stages": {"flatten": summarize([1.0], 1000), "group": summarize([1.0], 1000)}}
+        results = {"stages": {"flatten": summarize([1.3], 1000), "group": summarize([1.05], 1000),
+                              "deduplicate": summarize([1.0], 1000)}}
+        regressions = compare_to_baseline(results, baseline, max_regression=0.1)
+        self.assertEqual(1, len(regressions))
+        self.assertTrue(regressions[0].startswith("flatten:"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,145 @@
+import copy
+import unittest
+
+from aas_mapping.aas_neo4j_adapter.aas_neo4j_client import AASNeo4JClient, AAS_NEO4J_MODEL_CONFIG
+from aas_mapping.test.fakes import FakeDriver, FakeResult
+
+SUBMODEL = {
+    "modelType": "Submodel",
+    "id": "https://example.com/sm/1",
+    "idShort": "TestSubmodel",
+    "submodelElements": [
+        {
+            "modelType": "SubmodelElementCollection",
+            "idShort": "Collection",
+            "value": [
+                {"modelType": "Property", "idShort": "Prop", "valueType": "xs:string", "value": "a"},
+                {
+                    "modelType": "SubmodelElementList",
+                    "idShort": "List",
+                    "value": [
+                        {"modelType": "Property", "valueType": "xs:int", "value": "1"},
+                        {
+                            "modelType": "SubmodelElementCollection",
+                            "value": [
+                                {"modelType": "Property", "idShort": "Inner", "valueType": "xs:int", "value": "2"},
+                            ]
+                        },
+                    ]
+                },
+            ]
+        },
+    ]
+}
+
+
+def _below(path: str, prefix: str) -> bool:
+    return path == prefix or path.startswith(prefix + ".") or path.startswith(prefix + "[")
+
+
+class PathDriver(FakeDriver):
+    """Driver of a database holding the idShortPaths of one Submodel, which removes and shifts them."""
+
+    def __init__(self, paths):
+        super().__init__()
+        self.paths = set(paths)
+
+    def respond(self, clause, parameters):
+        if "DETACH DELETE" in clause:
+            removed = {path for path in self.paths if _below(path, parameters["id_short_path"])}
+            self.paths -= removed
+            return FakeResult([{"deletedNodes": len(removed)}])
+        if "renamedNodes" in clause:
+            # Mirrors the renames of the shift clause: following items in ascending order, with their descendants
+            list_path, renamed = parameters["list_path"], 0
+            indexes = sorted(index for index in range(len(self.paths))
+                             if f"{list_path}[{index}]" in self.paths and index > parameters["removed_index"])
+            for index in indexes:
+                old_path, new_path = f"{list_path}[{index}]", f"{list_path}[{index - 1}]"
+                renamed += sum(_below(path, old_path) for path in self.paths)
+                self.paths = {new_path + path[len(old_path):] if _below(path, old_path) else path
+                              for path in self.paths}
+            return FakeResult([{"renamedNodes": renamed}])
+        return FakeResult()
+
+
+class TestIdShortPaths(unittest.TestCase):
+    def setUp(self):
+        self.client = AASNeo4JClient(uri=None, user=None, model_config=AAS_NEO4J_MODEL_CONFIG)
+
+    def test_canonical_id_short_path(self):
+        self.assertEqual("A.B[0][1].C", self.client.canonical_id_short_path("A.B[0][1].C"))
+        self.assertEqual("A.B[0][1].C", self.client.canonical_id_short_path("A.B.[0] [1].C"))
+        # Hyphens are allowed in idShorts since AAS v3
+        self.assertEqual(["Motor-1", "Speed-Max", 2], self.client.itemize_id_short_path("Motor-1.Speed-Max[2]"))
+        self.assertEqual("Motor-1.Speed", self.client.canonical_id_short_path("Motor-1.Speed"))
+
+    def test_hyphenated_id_shorts_are_found_by_their_stored_path(self):
+        submodel = {"modelType": "Submodel", "id": "https://example.com/sm/2", "submodelElements": [
+            {"modelType": "SubmodelElementCollection", "idShort": "Motor-1", "value": [
+                {"modelType": "Property", "idShort": "Speed", "valueType": "xs:int", "value": "1"}]}]}
+        nodes, _ = self.client._process_identifiable(submodel)
+        stored_paths = {node["idShortPath"] for node in nodes if "Referable" in node["labels"]}
+        _, _, parameters = self.client._find_node_clause(submodel["id"], "Motor-1.Speed")
+        self.assertIn(parameters["id_short_path"], stored_paths)
+
+    def test_identifiable_is_processed_with_id_short_paths(self):
+        nodes, _ = self.client._process_identifiable(SUBMODEL)
+        paths = {node['idShortPath'] for node in nodes if "Referable" in node['labels']}
+        self.assertEqual({"", "Collection", "Collection.Prop", "Collection.List", "Collection.List[0]",
+                          "Collection.List[1]", "Collection.List[1].Inner"}, paths)
+        for node in nodes:
+            if "Referable" in node['labels']:
+                self.assertEqual(SUBMODEL["id"], node['identifiableId'])
+
+    def test_model_references_know_their_target(self):
+        shell = {"modelType": "AssetAdministrationShell", "id": "https://example.com/aas/1", "submodels": [
+            {"type": "ModelReference", "keys": [{"type": "Submodel", "value": SUBMODEL["id"]}]}]}
+        nodes, _ = self.client._process_identifiable(shell)
+        self.assertEqual([SUBMODEL["id"]], [node["targetId"] for node in nodes if "targetId" in node])
+
+    def test_find_node_clause_uses_materialized_path(self):
+        clause, found_node, parameters = self.client._find_node_clause("https://example.com/sm/1", "List[1].Inner")
+        self.assertIn(f"({found_node}:Referable {{identifiableId: $parent_id, idShortPath: $id_short_path}})", clause)
+        self.assertEqual({"parent_id": "https://example.com/sm/1", "id_short_path": "List[1].Inner"}, parameters)
+
+    def test_refresh_id_short_paths_of_existing_referables(self):
+        self.client.driver = FakeDriver()
+        self.client.refresh_id_short_paths(batch_size=10)
+        with self.client.transaction():
+            self.client.refresh_id_short_paths()
+        (_, clause), (_, clause_in_transaction) = self.client.driver.clauses
+        self.assertTrue(clause.endswith("} IN TRANSACTIONS OF 10 ROWS"))
+        self.assertTrue(clause_in_transaction.endswith("}"))
+        self.assertIn("SET i.identifiableId = i.id, i.idShortPath = ''", clause)
+        self.assertIn("WHERE NONE(rel IN rels WHERE type(rel) IN $virtual_relationships)", clause)
+        self.assertIn("THEN path + '[' + toString(rel.list_index) + ']'", clause)
+        self.assertIn("ELSE path + '.' + endNode(rel).idShort", clause)
+
+    def test_removing_a_list_item_shifts_the_following_items(self):
+        items = [{"modelType": "SubmodelElementCollection", "value": [
+            {"modelType": "Property", "idShort": "Inner", "valueType": "xs:int", "value": str(i)},
+            {"modelType": "SubmodelElementList", "idShort": "Sub", "value": [
+                {"modelType": "Property", "valueType": "xs:int", "value": str(i)}]},
+        ]} for i in range(4)]
+        submodel = copy.deepcopy(SUBMODEL)
+        submodel["submodelElements"][0]["value"][1]["value"] = items
+
+        def paths(obj):
+            nodes, _ = self.client._process_identifiable(obj)
+            return {node["idShortPath"] for node in nodes if "Referable" in node["labels"]}
+
+        self.client.driver = PathDriver(paths(submodel))
+        self.client.remove_referable(submodel["id"], "Collection.List[1]")
+        del submodel["submodelElements"][0]["value"][1]["value"][1]
+        self.assertEqual(paths(submodel), self.client.driver.paths)
+        self.assertIn("Collection.List[2].Sub[0]", self.client.driver.paths)
+        # The removal, the shift and the bump of the cache versions are committed together
+        self.assertEqual(["committed"], self.client.driver.states)
+        shift = next(clause for _, clause in self.client.driver.clauses if "renamedNodes" in clause)
+        self.assertIn("STARTS WITH rename.old_path + '.'", shift)
+        self.assertIn("STARTS WITH rename.old_path + '['", shift)
+
+
+if __name__ == '__main__':
+    unittest.main()
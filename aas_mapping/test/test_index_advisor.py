@@ -0,0 +1,56 @@
+import unittest
+
+from aas_mapping.aas_neo4j_adapter.aas_neo4j_client import AAS_NEO4J_MODEL_CONFIG
+from aas_mapping.aas_neo4j_adapter.querification.aasql_to_cypher import compile_aasql_query
+from aas_mapping.aas_neo4j_adapter.querification.index_advisor import IndexAdvisor, PropertyAccess, \
+    analyze_cypher, unused_indexes
+
+
+def _query(*conditions: dict) -> str:
+    return compile_aasql_query({"$select": "id", "$condition": {"$and": list(conditions)}})[0]
+
+
+WEIGHT = {"$gt": [{"$field": "$sme.Weight#value"}, {"$numVal": 100}]}
+SUBMODEL_ID = {"$eq": [{"$field": "$sm#id"}, {"$strVal": "sm/1"}]}
+SUBMODEL_ID_SHORT = {"$contains": [{"$field": "$sm#idShort"}, {"$strVal": "Tech"}]}
+
+
+class TestIndexAdvisor(unittest.TestCase):
+    def test_analyze_cypher(self):
+        accesses = analyze_cypher(_query(WEIGHT, SUBMODEL_ID, SUBMODEL_ID_SHORT))
+        self.assertIn(PropertyAccess("SubmodelElement", ("idShort",), "equality"), accesses)
+        self.assertIn(PropertyAccess("SubmodelElement", ("value_num",), "range"), accesses)
+        self.assertIn(PropertyAccess("Submodel", ("id",), "equality"), accesses)
+        self.assertIn(PropertyAccess("Submodel", ("idShort",), "text"), accesses)
+
+    def test_composite_lookup(self):
+        accesses = analyze_cypher("MATCH (sm:Submodel) WHERE sm.idShort = $p0 AND sm.`version` = $p1 RETURN sm")
+        self.assertIn(PropertyAccess("Submodel", ("idShort", "version"), "equality"), accesses)
+
+    def test_recommend_missing_indexes(self):
+        advisor = IndexAdvisor(AAS_NEO4J_MODEL_CONFIG.default_optimization_clauses)
+        advisor.observe(_query(WEIGHT, SUBMODEL_ID), count=5)
+        advisor.observe(_query(SUBMODEL_ID_SHORT))
+        recommendations = advisor.recommend()
+        clauses = [recommendation.clause for recommendation in recommendations]
+        # value_num of SubmodelElements is indexed by default
+        self.assertNotIn("CREATE INDEX FOR (n:SubmodelElement) ON (n.value_num);", clauses)
+        self.assertIn("CREATE TEXT INDEX FOR (n:Submodel) ON (n.idShort);", clauses)
+        self.assertEqual(("SubmodelElement", ("idShort",), 5), (
+            recommendations[0].label, recommendations[0].properties, recommendations[0].uses))
+        self.assertEqual(clauses[:2], [r.clause for r in advisor.recommend(min_uses=2)])
+
+    def test_unused_indexes(self):
+        rows = [
+            {"name": "lookup", "type": "LOOKUP", "labelsOrTypes": None, "properties": None, "readCount": 0},
+            {"name": "unique", "type": "RANGE", "labelsOrTypes": ["AASQLCacheVersion"], "properties": ["label"],
+             "readCount": 0, "owningConstraint": "constraint"},
+            {"name": "used", "type": "RANGE", "labelsOrTypes": ["Identifiable"], "properties": ["id"], "readCount": 3},
+            {"name": "unused", "type": "TEXT", "labelsOrTypes": ["Referable"], "properties": ["idShort"],
+             "readCount": 0},
+        ]
+        self.assertEqual(["unused"], [index["name"] for index in unused_indexes(rows)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,38 @@
+import time
+import unittest
+
+from aas_mapping.aas_neo4j_adapter.querification.aasql_to_cypher import compile_aasql_query
+from aas_mapping.aas_neo4j_adapter.querification.query_cache import QueryResultCache, query_dependencies
+
+
+class TestQueryResultCache(unittest.TestCase):
+    def test_entries_are_invalidated_by_versions(self):
+        cache = QueryResultCache()
+        key = cache.make_key("MATCH (sm:Submodel) RETURN sm", {"p0": "a"})
+        cache.put(key, ["sm1"], {"Submodel": 1})
+        self.assertEqual((True, ["sm1"]), cache.get(key, {"Submodel": 1}))
+        self.assertEqual((False, None), cache.get(key, {"Submodel": 2}))
+        self.assertEqual(0, len(cache))
+
+    def test_size_and_ttl_bounds(self):
+        cache = QueryResultCache(max_size=2, ttl=60)
+        for i in range(3):
+            cache.put(i, i, {})
+        self.assertEqual((False, None), cache.get(0, {}))
+        self.assertEqual((True, 2), cache.get(2, {}))
+
+        cache = QueryResultCache(ttl=0)
+        cache.put("key", "value", {})
+        time.sleep(0.001)
+        self.assertEqual((False, None), cache.get("key", {}))
+
+    def test_query_dependencies(self):
+        cypher, _ = compile_aasql_query({"$condition": {"$and": [
+            {"$eq": [{"$field": "$aas#idShort"}, {"$strVal": "Shell"}]},
+            {"$eq": [{"$field": "$sme.Weight#value"}, {"$strVal": "80"}]},
+        ]}})
+        self.assertEqual({"AssetAdministrationShell", "Submodel"}, query_dependencies(cypher))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+import unittest
+
+from aas_mapping.aas_neo4j_adapter.querification.aasql_to_ast import parse_aasql_query
+from aas_mapping.aas_neo4j_adapter.querification.query_cost import QueryCostPolicy, QueryRejectedError, estimate_cost
+
+
+def _cost(condition: dict) -> float:
+    return estimate_cost(parse_aasql_query({"$condition": condition})).score
+
+
+class TestQueryCost(unittest.TestCase):
+    def test_anchored_queries_are_cheaper(self):
+        anchored = _cost({"$eq": [{"$field": "$sme.Serial#value"}, {"$strVal": "SN1"}]})
+        expanded = _cost({"$eq": [{"$field": "$sme.Documents[].Class#value"}, {"$strVal": "03-01"}]})
+        unanchored_regex = _cost({"$regex": [{"$field": "$sme#value"}, {"$strVal": ".*SN.*"}]})
+        prefixed_regex = _cost({"$regex": [{"$field": "$sme#value"}, {"$strVal": "SN.*"}]})
+        self.assertLess(anchored, expanded)
+        self.assertLess(expanded, prefixed_regex)
+        self.assertLess(prefixed_regex, unanchored_regex)
+        self.assertLess(_cost({"$eq": [{"$field": "$sm#id"}, {"$strVal": "x"}]}),
+                        _cost({"$not": {"$eq": [{"$field": "$sm#id"}, {"$strVal": "x"}]}}))
+
+    def test_policy(self):
+        cost = estimate_cost(parse_aasql_query({"$condition": {
+            "$regex": [{"$field": "$sme#value"}, {"$strVal": ".*SN.*"}]}}))
+        policy = QueryCostPolicy(reject_above=100_000, limit_above=1000, forced_limit=10, timeout_above=0.0,
+                                 timeout=5.0)
+        self.assertEqual((10, 5.0), policy.apply(cost))
+        self.assertEqual((None, None), QueryCostPolicy().apply(cost))
+        with self.assertRaises(ValueError):
+            QueryCostPolicy(timeout=5.0)
+        with self.assertRaises(QueryRejectedError) as context:
+            QueryCostPolicy(reject_above=1000).apply(cost)
+        explanation = context.exception.explanation
+        self.assertEqual("query_too_expensive", explanation["error"])
+        self.assertEqual("submodel_element_scan", explanation["reasons"][0]["code"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,34 @@
+import unittest
+from types import SimpleNamespace
+
+from aas_mapping.aas_neo4j_adapter.querification.query_profiler import QueryProfiler, query_shape
+
+PROFILE = {
+    "operatorType": "ProduceResults@neo4j", "dbHits": 0, "rows": 2, "children": [
+        {"operatorType": "Filter@neo4j", "dbHits": 40, "rows": 2, "children": [
+            {"operatorType": "NodeByLabelScan@neo4j", "dbHits": 21, "rows": 20, "children": []}]}]
+}
+
+
+class TestQueryProfiler(unittest.TestCase):
+    def test_statistics_are_aggregated_per_shape(self):
+        profiler = QueryProfiler(sample_rate=1.0)
+        scan = "MATCH (sm:Submodel) WHERE sm.idShort = $p0 RETURN sm"
+        seek = "MATCH (sm:Submodel {id: $p0}) RETURN sm"
+        profiled = SimpleNamespace(result_available_after=3, result_consumed_after=1, profile=PROFILE)
+        timed = SimpleNamespace(result_available_after=2, result_consumed_after=1, profile=None)
+        profiler.record(scan, 5.0, 2, profiled)
+        profiler.record(scan, 3.0, 2, timed)
+        profiler.record(seek, 1.0, 1, timed)
+
+        top = profiler.top_shapes(1)
+        self.assertEqual([query_shape(scan)], [statistics.shape for statistics in top])
+        self.assertEqual((2, 1, 61, 7), (top[0].executions, top[0].profiled_executions, top[0].db_hits,
+                                         top[0].server_time))
+        self.assertEqual(4.0, top[0].mean_client_time)
+        self.assertEqual(21, top[0].operators["NodeByLabelScan"].db_hits)
+        self.assertEqual(query_shape(seek), profiler.dump(2, order="executions")[1]["shape"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import json
+import os
+import tempfile
+import unittest
+
+import neo4j
+
+from aas_mapping.aas_neo4j_adapter.aas_neo4j_client import AASNeo4JClient, AAS_NEO4J_MODEL_CONFIG
+from aas_mapping.test.fakes import FakeDriver, FakeResult, LazyResult
+
+
+class StreamingDriver(FakeDriver):
+    """Driver of a database, which streams the ids of 2500 Submodels and records which ids were streamed."""
+
+    def __init__(self):
+        super().__init__()
+        self.streamed = []
+
+    def respond(self, clause, parameters):
+        if "Submodel" not in clause:
+            return FakeResult()
+        return LazyResult(self.streamed.append(i) or {"id": f"https://example.com/submodel/{i}"} for i in range(2500))
+
+
+class TestStreaming(unittest.TestCase):
+    def setUp(self):
+        self.client = AASNeo4JClient(uri=None, user=None, model_config=AAS_NEO4J_MODEL_CONFIG)
+        self.client.driver = StreamingDriver()
+        self.client.get_identifiable = lambda identifier: {"id": identifier, "modelType": "Submodel"}
+
+    def test_stopping_early_rolls_back(self):
+        records = self.client.stream_clause("MATCH (n:Submodel) RETURN n.id AS id", fetch_size=10)
+        self.assertEqual("https://example.com/submodel/0", next(records)["id"])
+        records.close()
+        self.assertEqual([10], self.client.driver.fetch_sizes)
+        self.assertEqual(1, len(self.client.driver.streamed))
+        self.assertEqual("rolled back", self.client.driver.transactions[0].state)
+
+    def test_stopping_a_profiled_query_early_rolls_back(self):
+        profiler = self.client.enable_query_profiler(sample_rate=1.0)
+        records = self.client._run_query("MATCH (sm:Submodel) RETURN sm.id AS id", {}, fetch_size=10)
+        next(records)
+        records.close()
+        self.assertEqual(1, len(self.client.driver.streamed))
+        self.assertEqual("rolled back", self.client.driver.transactions[0].state)
+        statistics = profiler.top_shapes(1)[0]
+        self.assertEqual((1, 1, 0), (statistics.executions, statistics.rows, statistics.server_time))
+
+        self.assertEqual(2500, len(list(self.client._run_query("MATCH (sm:Submodel) RETURN sm.id AS id", {}, 10))))
+        self.assertEqual("committed", self.client.driver.transactions[1].state)
+        self.assertEqual((2, 2501, 3), (statistics.executions, statistics.rows, statistics.server_time))
+
+    def test_timeout_in_a_transaction_is_reported(self):
+        with self.client.transaction(), self.assertLogs("aas_mapping.aas_neo4j_adapter.base", "WARNING") as logs:
+            records = self.client.stream_clause(neo4j.Query("MATCH (n:Submodel) RETURN n.id AS id", timeout=1.0))
+            self.assertEqual(2500, len(list(records)))
+        self.assertIn("timeout of 1.0 s cannot be applied", logs.output[0])
+
+    def test_export_json_file_streams_all_identifiables(self):
+        with tempfile.TemporaryDirectory() as directory:
+            file_path = os.path.join(directory, "export.json")
+            self.assertEqual(2500, self.client.export_json_file(file_path))
+            with open(file_path, encoding="utf-8") as f:
+                environment = json.load(f)
+        self.assertEqual([], environment["assetAdministrationShells"])
+        self.assertEqual(2500, len(environment["submodels"]))
+        self.assertEqual(self.client.default_fetch_size, self.client.driver.fetch_sizes[0])
+        self.assertTrue(all(transaction.state == "committed" for transaction in self.client.driver.transactions))
+
+
+if __name__ == '__main__':
+    unittest.main()
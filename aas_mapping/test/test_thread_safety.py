@@ -0,0 +1,71 @@
+import dataclasses
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from aas_mapping.aas_neo4j_adapter.aas_neo4j_client import AASNeo4JClient, AAS_NEO4J_MODEL_CONFIG
+from aas_mapping.aas_neo4j_adapter.utils import UploadStats
+from aas_mapping.test.fakes import FakeDriver, submodel
+
+THREADS = 8
+
+
+class TestThreadSafety(unittest.TestCase):
+    def setUp(self):
+        self.client = AASNeo4JClient(uri=None, user=None, model_config=AAS_NEO4J_MODEL_CONFIG)
+        self.client.driver = FakeDriver()
+        self.client.resolve_model_references_on_upload = False
+        self.client.track_cache_versions = False
+
+    def test_model_config_is_immutable(self):
+        with self.assertRaises(dataclasses.FrozenInstanceError):
+            AAS_NEO4J_MODEL_CONFIG.keys_to_ignore = ("id",)
+        with self.assertRaises(TypeError):
+            AAS_NEO4J_MODEL_CONFIG.list_of_dicts_prop_as_multiple_list_props["Reference"] = []
+        self.assertIsInstance(AAS_NEO4J_MODEL_CONFIG.deduplicated_object_types, frozenset)
+
+    def test_concurrent_flattening_generates_unique_uids(self):
+        with ThreadPoolExecutor(THREADS) as executor:
+            results = list(executor.map(self.client._process_identifiable, [submodel(i) for i in range(64)]))
+        uids = [node["uid"] for nodes, _ in results for node in nodes]
+        self.assertEqual(len(uids), len(set(uids)))
+
+    def test_concurrent_uploads_deduplicate_once(self):
+        with ThreadPoolExecutor(THREADS) as executor:
+            stats = list(executor.map(lambda i: self.client._upload_nodes_and_relationships(
+                *self.client._process_identifiable(submodel(i)), UploadStats()), range(64)))
+        created = self.client.driver.created_uids
+        self.assertEqual(len(created), len(set(created)))
+        # The shared semanticId Reference is only created by one of the uploads
+        self.assertEqual(64 * 21 + 1, sum(s.total_nodes_created for s in stats))
+        self.assertEqual(set(), self.client._pending_uids)
+        # No relationship was skipped for a missing uid mapping
+        self.assertEqual(sum(s.dedup_relationships_seen - s.dedup_relationships_removed for s in stats),
+                         sum(s.total_relationships_created for s in stats))
+
+    def test_failed_upload_hands_deduplicated_nodes_over(self):
+        failed_grouped_nodes, _ = self.client._prepare_upload(*self.client._process_identifiable(submodel(0)),
+                                                              UploadStats())
+        reference_uid, = self.client._pending_uids
+        upload = threading.Thread(target=lambda: stats.append(self.client._upload_nodes_and_relationships(
+            *self.client._process_identifiable(submodel(1)), UploadStats())))
+        stats = []
+        upload.start()
+        # The node creation of the first upload fails, while the second one is waiting for its semanticId Reference
+        self.client._release_pending_nodes(failed_grouped_nodes, None)
+        upload.join()
+        self.assertIn(reference_uid, self.client.driver.created_uids)
+        self.assertEqual(22, stats[0].total_nodes_created)
+        self.assertEqual(stats[0].dedup_relationships_seen - stats[0].dedup_relationships_removed,
+                         stats[0].total_relationships_created)
+        self.assertEqual({}, self.client._unclaimed_nodes)
+
+    def test_waiting_for_deduplicated_nodes_times_out(self):
+        self.client.dedup_wait_timeout = 0.01
+        self.client._prepare_upload(*self.client._process_identifiable(submodel(0)), UploadStats())
+        with self.assertRaises(TimeoutError):
+            self.client._upload_nodes_and_relationships(*self.client._process_identifiable(submodel(1)))
+
+
+if __name__ == '__main__':
+    unittest.main()
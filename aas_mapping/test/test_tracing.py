@@ -0,0 +1,77 @@
+import unittest
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+from aas_mapping.aas_neo4j_adapter.base import BaseNeo4JClient
+from aas_mapping.aas_neo4j_adapter.tracing import NO_OP_TRACER, Tracer, traced
+from aas_mapping.test.fakes import FakeDriver, FakeResult
+
+
+@dataclass
+class RecordedSpan:
+    name: str
+    attributes: Dict[str, Any]
+    parent: Optional[str]
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+
+@dataclass
+class RecordingTracer(Tracer):
+    enabled = True
+    spans: list = field(default_factory=list)
+    stack: list = field(default_factory=list)
+
+    @contextmanager
+    def start_span(self, name, attributes=None, current=True):
+        span = RecordedSpan(name, dict(attributes or {}), self.stack[-1].name if self.stack else None)
+        self.spans.append(span)
+        if current:
+            self.stack.append(span)
+        try:
+            yield span
+        finally:
+            if current:
+                self.stack.pop()
+
+
+class NumbersDriver(FakeDriver):
+    """Driver of a database, which answers every clause with the numbers 1 to 3."""
+
+    def respond(self, clause, parameters):
+        return FakeResult([{"n": 1}, {"n": 2}, {"n": 3}])
+
+
+class TracedClient(BaseNeo4JClient):
+    @traced()
+    def get_numbers(self):
+        return [record["n"] for record in self.stream_clause("MATCH (n) RETURN n.n AS n", {"p0": 1})]
+
+
+class TestTracing(unittest.TestCase):
+    def setUp(self):
+        self.client = TracedClient(uri=None, user=None)
+        self.client.driver = NumbersDriver()
+
+    def test_disabled_by_default(self):
+        self.assertIs(NO_OP_TRACER, self.client.tracer)
+        self.assertEqual([1, 2, 3], self.client.get_numbers())
+
+    def test_database_spans_nest_under_operations(self):
+        tracer = self.client.enable_tracing(RecordingTracer())
+        self.assertEqual([1, 2, 3], self.client.get_numbers())
+        self.assertEqual(3, len(self.client.execute_clause("MATCH (n) RETURN n")))
+        operation, stream, execute = tracer.spans
+        self.assertEqual(("TracedClient.get_numbers", None), (operation.name, operation.parent))
+        self.assertEqual(("neo4j.stream_clause", "TracedClient.get_numbers"), (stream.name, stream.parent))
+        self.assertEqual(1, stream.attributes["db.query.parameter_count"])
+        self.assertEqual(3, stream.attributes["db.response.returned_rows"])
+        self.assertLessEqual(stream.attributes["db.time_to_first_record_ms"], stream.attributes["db.total_time_ms"])
+        self.assertIsNone(execute.parent)
+        self.assertEqual(16, len(execute.attributes["db.query.shape"]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import unittest
+
+from aas_mapping.aas_neo4j_adapter.aas_neo4j_client import AASNeo4JClient, AAS_NEO4J_MODEL_CONFIG
+from aas_mapping.test.fakes import FakeDriver, FakeResult, FakeSession, submodel
+
+
+class RetryingSession(FakeSession):
+    def execute_write(self, work):
+        # The first attempt fails on commit with a transient error, the driver retries it
+        transaction = self.begin_transaction()
+        work(transaction)
+        transaction.close()
+        return super().execute_write(work)
+
+
+class RecordingDriver(FakeDriver):
+    """Driver of a database without Identifiables, whose write transactions are retried once."""
+
+    def session(self, **kwargs):
+        return RetryingSession(self)
+
+    def respond(self, clause, parameters):
+        if "count(n)>0" in clause:
+            return FakeResult([[False]])
+        return FakeResult()
+
+
+class TestTransactions(unittest.TestCase):
+    def setUp(self):
+        self.client = AASNeo4JClient(uri=None, user=None, model_config=AAS_NEO4J_MODEL_CONFIG)
+        self.client.driver = RecordingDriver()
+
+    def add(self, i: int):
+        if not self.client.identifiable_exists(f"https://example.com/submodel/{i}"):
+            self.client.add_identifiable(submodel(i))
+
+    def test_operations_run_in_one_transaction(self):
+        with self.client.transaction():
+            self.assertTrue(self.client.in_transaction)
+            self.add(0)
+            self.add(1)
+        self.assertFalse(self.client.in_transaction)
+        self.assertEqual(["committed"], self.client.driver.states)
+        outside = [clause for name, clause in self.client.driver.clauses if name == "session"]
+        self.assertTrue(outside and all(clause.startswith("CREATE INDEX IF NOT EXISTS") for clause in outside))
+        self.assertFalse(any("IN TRANSACTIONS" in clause for _, clause in self.client.driver.clauses))
+        self.assertTrue(self.client.uid_to_internal_id)
+
+    def test_rollback_unclaims_deduplicated_nodes(self):
+        with self.assertRaises(RuntimeError):
+            with self.client.transaction():
+                self.add(0)
+                raise RuntimeError("handler failed")
+        self.assertEqual(["rolled back"], self.client.driver.states)
+        # The next upload which needs the semanticId Reference creates it
+        self.assertEqual(set(self.client.deduplicated_nodes.values()), set(self.client._unclaimed_nodes))
+        self.assertEqual(set(), self.client.deduplicated_rels)
+        self.assertEqual({}, self.client.uid_to_internal_id)
+        self.assertEqual(set(), self.client._pending_uids)
+
+    def test_cache_versions_are_bumped_in_the_write_transaction(self):
+        self.client.add_identifiable(submodel(0))
+        self.client.update_property_values({("https://example.com/submodel/0", "P1"): "1"})
+        self.assertEqual(["committed", "committed"], self.client.driver.states)
+        written = [(name, clause) for name, clause in self.client.driver.clauses
+                   if not clause.startswith("CREATE INDEX IF NOT EXISTS")]
+        self.assertTrue(all(name == "transaction" for name, _ in written))
+        bumps = [i for i, (_, clause) in enumerate(written) if "AASQLCacheVersion" in clause]
+        self.assertEqual(2, len(bumps))
+        self.assertEqual(len(written) - 1, bumps[-1])
+
+    def test_retried_work_recreates_deduplicated_nodes(self):
+        stats = self.client.execute_in_transaction(self.client.add_identifiable, submodel(0))
+        self.assertEqual(["rolled back", "committed"], self.client.driver.states)
+        # The shared semanticId Reference of the failed attempt was claimed and created again
+        self.assertEqual(22, stats.total_nodes_created)
+        self.assertEqual(stats.dedup_relationships_seen - stats.dedup_relationships_removed,
+                         stats.total_relationships_created)
+        self.assertTrue(set(self.client.deduplicated_nodes.values()) <= set(self.client.uid_to_internal_id))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+from datetime import datetime, timedelta, timezone
+
+from aas_mapping.aas_neo4j_adapter.aas_neo4j_client import AASNeo4JClient, AAS_NEO4J_MODEL_CONFIG
+from aas_mapping.test.fakes import FakeDriver, FakeResult
+
+
+class ElementsDriver(FakeDriver):
+    """Driver of a database with Properties and Ranges imported without typed shadow properties."""
+
+    def __init__(self, elements):
+        super().__init__()
+        self.elements = elements
+        self.updates = []
+
+    def respond(self, clause, parameters):
+        if clause.startswith("MATCH (n:SubmodelElement)"):
+            return FakeResult({"id": f"4:{i}", **element} for i, element in enumerate(self.elements))
+        if "nodes" in parameters:
+            self.updates.append(parameters["nodes"])
+        return FakeResult()
+
+
+class TestTypedValueProperties(unittest.TestCase):
+    def test_numbers(self):
+        self.assertEqual({"value_num": 80}, AASNeo4JClient.typed_value_properties("value", "xs:int", "80"))
+        self.assertEqual({"value_num": 1.5}, AASNeo4JClient.typed_value_properties("value", "xs:double", "1.5"))
+        for value in ("NaN", "INF", "-INF", "abc"):
+            self.assertEqual({}, AASNeo4JClient.typed_value_properties("value", "xs:double", value))
+
+    def test_dates_with_timezones(self):
+        plus_one = timezone(timedelta(hours=1))
+        self.assertEqual({"value_datetime": datetime(2024, 1, 1, tzinfo=plus_one)},
+                         AASNeo4JClient.typed_value_properties("value", "xs:date", "2024-01-01+01:00"))
+        self.assertEqual({"value_datetime": datetime(2024, 1, 1, tzinfo=timezone.utc)},
+                         AASNeo4JClient.typed_value_properties("value", "xs:date", "2024-01-01Z"))
+        self.assertEqual({"value_datetime": datetime(2024, 1, 1, tzinfo=timezone.utc)},
+                         AASNeo4JClient.typed_value_properties("value", "xs:date", "2024-01-01"))
+        self.assertEqual({"value_datetime": datetime(2024, 1, 1, 12, tzinfo=plus_one)},
+                         AASNeo4JClient.typed_value_properties("value", "xs:dateTime", "2024-01-01T12:00:00+01:00"))
+        self.assertEqual({}, AASNeo4JClient.typed_value_properties("value", "xs:date", "2024-01-01T12:00:00"))
+
+
+    def test_refresh_typed_values_of_existing_elements(self):
+        client = AASNeo4JClient(uri=None, user=None, model_config=AAS_NEO4J_MODEL_CONFIG)
+        client.driver = ElementsDriver([
+            {"valueType": "xs:int", "value": "80", "min": None, "max": None},
+            {"valueType": "xs:double", "value": None, "min": "1.5", "max": "abc"},
+            {"valueType": "xs:boolean", "value": "true", "min": None, "max": None},
+        ])
+        client.refresh_typed_values(batch_size=2)
+        self.assertEqual([[{"id": "4:0", "properties": {"value_num": 80}},
+                           {"id": "4:1", "properties": {"min_num": 1.5}}],
+                          [{"id": "4:2", "properties": {"value_bool": True}}]], client.driver.updates)
+        update = client.driver.clauses[-1][1]
+        self.assertIn("REMOVE n.value_num, n.value_datetime, n.value_bool, n.min_num", update)
+        self.assertTrue(update.endswith("SET n += node.properties"))
+
+
+if __name__ == '__main__':
+    unittest.main()
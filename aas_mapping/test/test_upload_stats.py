@@ -0,0 +1,60 @@
+import os
+import unittest
+
+from aas_mapping.aas_neo4j_adapter.aas_neo4j_client import AASNeo4JClient, AAS_NEO4J_MODEL_CONFIG
+from aas_mapping.aas_neo4j_adapter.jsonification.batch_planner import BatchPlanner
+from aas_mapping.aas_neo4j_adapter.utils import UploadStats
+from aas_mapping.test.fakes import FakeDriver
+
+SUBMODELS_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "examples", "submodels")
+
+
+class TestUploadStats(unittest.TestCase):
+    def test_defaults_are_not_shared(self):
+        first, second = UploadStats(), UploadStats()
+        first.count_nodes(("Submodel", "Identifiable"), 2)
+        first.observe_phase("parse", 0.02)
+        self.assertEqual({}, second.nodes_per_labels)
+        self.assertEqual(0, second.phase_latencies["parse"].count)
+        self.assertEqual({("Identifiable", "Submodel"): 2}, first.nodes_per_labels)
+        with self.assertRaises(KeyError):
+            first.observe_phase("unknown", 1.0)
+
+    def test_process_json_file_records_parse_and_flatten(self):
+        client = AASNeo4JClient(uri=None, user=None, model_config=AAS_NEO4J_MODEL_CONFIG)
+        file_path = os.path.join(SUBMODELS_DIR, sorted(os.listdir(SUBMODELS_DIR))[0])
+        stats = UploadStats()
+        client._process_json_file(file_path, stats)
+        self.assertEqual(os.path.getsize(file_path), stats.total_bytes_read)
+        self.assertEqual(1, stats.phase_latencies["parse"].count)
+        self.assertEqual(1, stats.phase_latencies["flatten"].count)
+
+    def test_sub_batches_record_processing_time(self):
+        client = AASNeo4JClient(uri=None, user=None, model_config=AAS_NEO4J_MODEL_CONFIG)
+        client.driver = FakeDriver()
+        file_path = os.path.join(SUBMODELS_DIR, sorted(os.listdir(SUBMODELS_DIR))[0])
+        stats = UploadStats()
+        client._upload_json_file_in_sub_batches(file_path, BatchPlanner(max_batch_nodes=10), stats, 10000)
+        self.assertGreater(stats.total_processing_time, 0)
+        self.assertEqual(1, stats.phase_latencies["parse"].count)
+        self.assertTrue(client.driver.created_uids)
+
+    def test_openmetrics(self):
+        stats = UploadStats(total_files=3, dedup_nodes_seen=10, dedup_nodes_removed=4)
+        stats.observe_phase("rel_write", 0.003)
+        stats.observe_phase("rel_write", 2.0)
+        stats.count_relationships("child", 7)
+        stats.count_nodes(("Property", "SubmodelElement"), 5)
+        text = stats.to_openmetrics()
+        self.assertIn('aas_ingest_phase_seconds_bucket{phase="rel_write",le="0.005"} 1\n', text)
+        self.assertIn('aas_ingest_phase_seconds_bucket{phase="rel_write",le="+Inf"} 2\n', text)
+        self.assertIn('aas_ingest_relationships_total{type="child"} 7\n', text)
+        self.assertIn('aas_ingest_nodes_total{labels="Property,SubmodelElement"} 5\n', text)
+        self.assertIn('aas_ingest_dedup_ratio{kind="node"} 0.4\n', text)
+        self.assertIn("aas_ingest_files_total 3\n", text)
+        self.assertTrue(text.endswith("# EOF\n"))
+        self.assertEqual(0.4, stats.to_dict()["node_dedup_ratio"])
+
+
+if __name__ == '__main__':
+    unittest.main()
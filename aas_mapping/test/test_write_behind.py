@@ -0,0 +1,148 @@
+import json
+import unittest
+
+from neo4j.exceptions import ClientError, ServiceUnavailable
+
+from aas_mapping.aas_neo4j_adapter.aas_neo4j_client import AASNeo4JClient, AAS_NEO4J_MODEL_CONFIG
+from aas_mapping.aas_neo4j_adapter.write_behind import WriteBehindBuffer
+from aas_mapping.test.fakes import FakeDriver, FakeResult, subgraph, submodel
+
+SUBMODEL_ID = "https://example.com/submodel/0"
+
+
+class SubmodelDriver(FakeDriver):
+    """Driver of a database with one Submodel, which records the updated values."""
+
+    def __init__(self, subgraph):
+        super().__init__()
+        self.subgraph = subgraph
+        self.updates = []
+        self.error = None
+
+    @property
+    def commits(self) -> int:
+        return self.states.count("committed")
+
+    def respond(self, clause, parameters):
+        if self.error is not None and "$updates" in clause:
+            raise self.error
+        if "keys" in parameters:
+            return FakeResult({"i": i, "found_nodes": [[f"4:{key['id_short_path']}", ["SubmodelElementCollection"], 0]]}
+                              for i, key in enumerate(parameters["keys"]))
+        if "updates" in parameters:
+            self.updates.extend(parameters["updates"])
+            return FakeResult([{"updated": len(parameters["updates"])}])
+        if "json" in clause and parameters.get("parent_id") == SUBMODEL_ID and "id_short_path" not in parameters:
+            return FakeResult([{"json": json.dumps(self.subgraph)}])
+        return FakeResult()
+
+
+def element(id_short: str, value: str = "0"):
+    return {"modelType": "Property", "idShort": id_short, "valueType": "xs:int", "value": value}
+
+
+class TestWriteBehindBuffer(unittest.TestCase):
+    def setUp(self):
+        self.client = AASNeo4JClient(uri=None, user=None, model_config=AAS_NEO4J_MODEL_CONFIG)
+        self.client.resolve_model_references_on_upload = False
+        self.client.track_cache_versions = False
+        self.client.driver = SubmodelDriver(subgraph(self.client, submodel(0)))
+        self.flushed = []
+        self.buffer = WriteBehindBuffer(self.client, max_writes=10, max_delay=None,
+                                        on_flush=lambda writes, stats: self.flushed.append(writes))
+
+    def test_coalesces_writes_into_one_batch(self):
+        collection = {"modelType": "SubmodelElementCollection", "idShort": "Collection", "value": []}
+        self.buffer.add_submodel_element(collection, SUBMODEL_ID)
+        self.buffer.add_submodel_element(element("A"), SUBMODEL_ID, "Collection")
+        self.buffer.update_value(SUBMODEL_ID, "Collection.A", "2")
+        self.buffer.add_submodel_element(element("B"), SUBMODEL_ID, "Existing")
+        self.buffer.add_submodel_element(element("C"), SUBMODEL_ID, "Existing")
+        for value in ("1", "2", "3"):
+            self.buffer.update_value(SUBMODEL_ID, "P1", value)
+        self.assertEqual(5, self.buffer.pending_writes)
+        self.assertEqual([], self.client.driver.clauses)
+
+        stats = self.buffer.flush()
+        self.assertEqual(1, self.client.driver.commits)
+        self.assertEqual(1, sum("UNWIND range(0, size($keys)" in clause for _, clause in self.client.driver.clauses))
+        # The collection with its merged element and the two elements of the existing collection
+        self.assertEqual(4, stats.total_nodes_created)
+        self.assertEqual([{"parent_id": SUBMODEL_ID, "id_short_path": "P1", "value": "3", "value_num": 3}],
+                         self.client.driver.updates)
+        self.assertEqual(8, len(self.flushed[0]))
+        self.assertEqual(0, self.buffer.pending_writes)
+        self.assertIsNone(self.buffer.flush())
+
+    def test_flushes_on_max_writes(self):
+        for i in range(25):
+            self.buffer.update_value(SUBMODEL_ID, f"P{i % 20}", str(i))
+        self.assertEqual([10, 10], [len(writes) for writes in self.flushed])
+        self.assertEqual(5, self.buffer.pending_writes)
+
+    def test_reads_see_pending_writes(self):
+        self.buffer.update_value(SUBMODEL_ID, "P3", "42")
+        self.buffer.add_submodel_element(element("New", "7"), SUBMODEL_ID)
+        self.buffer.update_value(SUBMODEL_ID, "New", "8")
+        data = self.buffer.get_identifiable(SUBMODEL_ID)
+        values = {child["idShort"]: child["value"] for child in data["submodelElements"]}
+        self.assertEqual("42", values["P3"])
+        self.assertEqual("8", values["New"])
+        self.assertEqual(element("New", "8"), self.buffer.get_referable(SUBMODEL_ID, "New"))
+        self.assertEqual("3", self.client.get_identifiable(SUBMODEL_ID)["submodelElements"][3]["value"])
+
+    def test_failed_flush(self):
+        errors = []
+        self.buffer.on_error = lambda writes, e: errors.append((writes, e))
+        self.buffer.update_value(SUBMODEL_ID, "P1", "1")
+
+        self.client.driver.error = ServiceUnavailable("connection lost")
+        with self.assertRaises(ServiceUnavailable):
+            self.buffer.flush()
+        self.assertEqual(1, self.buffer.pending_writes)
+        self.assertEqual([], errors)
+
+        self.client.driver.error = ClientError("invalid")
+        with self.assertRaises(ClientError):
+            self.buffer.flush()
+        self.assertEqual(0, self.buffer.pending_writes)
+        self.assertEqual(1, len(errors[0][0]))
+
+        self.client.driver.error = None
+        self.buffer.replay(errors[0][0])
+        self.buffer.flush()
+        self.assertEqual("1", self.client.driver.updates[-1]["value"])
+
+    def test_retryable_error_of_a_full_buffer_is_not_raised(self):
+        self.client.driver.error = ServiceUnavailable("connection lost")
+        for i in range(10):
+            self.buffer.update_value(SUBMODEL_ID, f"P{i}", str(i))
+        self.assertEqual(10, self.buffer.pending_writes)
+
+        self.client.driver.error = None
+        self.buffer.update_value(SUBMODEL_ID, "P10", "10")
+        self.assertEqual(0, self.buffer.pending_writes)
+        self.assertEqual(11, len(self.client.driver.updates))
+
+    def test_flush_in_a_transaction_completes_with_it(self):
+        with self.client.transaction():
+            self.buffer.update_value(SUBMODEL_ID, "P1", "1")
+            self.buffer.flush()
+            self.assertEqual([], self.flushed)
+        self.assertEqual(1, len(self.flushed))
+
+        with self.assertRaises(RuntimeError):
+            with self.client.transaction():
+                self.buffer.update_value(SUBMODEL_ID, "P1", "2")
+                self.buffer.flush()
+                self.buffer.update_value(SUBMODEL_ID, "P2", "3")
+                raise RuntimeError("handler failed")
+        self.assertEqual(1, len(self.flushed))
+        self.assertEqual(2, self.buffer.pending_writes)
+        self.buffer.flush()
+        self.assertEqual({"P1": "2", "P2": "3"},
+                         {update["id_short_path"]: update["value"] for update in self.client.driver.updates[-2:]})
+
+
+if __name__ == '__main__':
+    unittest.main()